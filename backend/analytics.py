@@ -0,0 +1,292 @@
+# backend/analytics.py
+"""Turnaround and staff-efficiency reporting from pre-aggregated rollups.
+
+Every completed cleaning task and recorded checkout is folded into an
+hourly and a daily Rollup row per (floor, housekeeper) in the same
+transaction as the change itself. Each row keeps a count, a sum of
+minutes, a fixed-bin histogram and the shortest and longest observation,
+so reports merge a handful of rows per day instead of scanning tasks,
+and p50/p90 come from the merged histograms.
+
+Metrics:
+- cleaning: started_at -> completed_at of a task
+- turnaround: the room's actual checkout -> completed_at of its cleaning
+- checkouts: number of checkouts recorded (no duration)
+
+rebuild() recomputes a time range from the raw rows. It is the catch-up
+job for anything written without going through the API.
+"""
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import timedelta
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+
+from models import db, Room, Checkout, CleaningTask, Rollup, room_floor
+
+GRANULARITIES = ('hour', 'day')
+
+# Upper edges (minutes) of the histogram bins; one more bin holds everything above the last edge
+BIN_EDGES = (
+    list(range(5, 121, 5))  # 5 minute bins up to 2 hours
+    + list(range(135, 241, 15))  # 15 minute bins up to 4 hours
+    + list(range(270, 481, 30))  # 30 minute bins up to 8 hours
+    + list(range(540, 1441, 60))  # hourly bins up to a day
+)
+BIN_COUNT = len(BIN_EDGES) + 1
+
+
+# --- Histograms ---
+
+def empty_histogram():
+    return [0] * BIN_COUNT
+
+def parse_histogram(text):
+    if not text:
+        return empty_histogram()
+    return [int(value) for value in text.split(',')]
+
+def format_histogram(counts):
+    return ','.join(str(value) for value in counts)
+
+def bin_index(minutes):
+    return bisect_right(BIN_EDGES, minutes)
+
+def widen(low, high, other_low, other_high):
+    """The smallest (low, high) range covering both; None ends mean an empty range."""
+    if other_low is None:
+        return low, high
+    if low is None:
+        return other_low, other_high
+    return min(low, other_low), max(high, other_high)
+
+def percentile(counts, fraction, low=None, high=None):
+    """Estimate a percentile from histogram counts by interpolating inside the bin.
+
+    low and high, the observed extremes when known, narrow the first and last
+    bins so that e.g. a single 10 second task does not report 2.5 minutes.
+    """
+    total = sum(counts)
+    if not total:
+        return None
+    rank = fraction * total
+    seen = 0
+    for index, count in enumerate(counts):
+        if count and seen + count >= rank:
+            lower = BIN_EDGES[index - 1] if index else 0
+            upper = BIN_EDGES[index] if index < len(BIN_EDGES) else None  # The last bin is open-ended
+            if low is not None:
+                lower, upper = max(lower, low), high if upper is None else min(upper, high)
+            elif upper is None:
+                return float(lower)
+            return round(lower + (upper - lower) * (rank - seen) / count, 1)
+        seen += count
+    return float(BIN_EDGES[-1])
+
+
+# --- Incremental updates ---
+
+def bucket_start(ts, granularity):
+    if granularity == 'hour':
+        return ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def aggregate(observations):
+    """Group (metric, ts, floor, housekeeper_id, minutes) observations by rollup key."""
+    buckets = {}
+    for metric, ts, floor, housekeeper_id, minutes in observations:
+        for granularity in GRANULARITIES:
+            key = (metric, granularity, bucket_start(ts, granularity), floor, housekeeper_id or 0)
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = [0, 0.0, empty_histogram(), None, None]
+            bucket[0] += 1
+            if minutes is not None:
+                bucket[1] += minutes
+                bucket[2][bin_index(minutes)] += 1
+                bucket[3], bucket[4] = widen(bucket[3], bucket[4], minutes, minutes)
+    return buckets
+
+def apply_buckets(buckets):
+    """Add aggregated buckets to their Rollup rows. Runs in the caller's transaction."""
+    for (metric, granularity, start, floor, housekeeper_id), (count, minutes, counts, low, high) in buckets.items():
+        filters = dict(metric=metric, granularity=granularity, bucket_start=start,
+                       floor=floor, housekeeper_id=housekeeper_id)
+        rollup = Rollup.query.filter_by(**filters).first()
+        if rollup is None:
+            try:
+                with db.session.begin_nested():
+                    db.session.add(Rollup(count=count, total_minutes=minutes, histogram=format_histogram(counts),
+                                          min_minutes=low, max_minutes=high, **filters))
+                continue
+            except IntegrityError:
+                # Another transaction created the bucket first; add to that row instead
+                rollup = Rollup.query.filter_by(**filters).one()
+        rollup.count += count
+        rollup.total_minutes += minutes
+        merged = parse_histogram(rollup.histogram)
+        if rollup.min_minutes is not None or not any(merged):  # Extremes of older rows stay unknown
+            rollup.min_minutes, rollup.max_minutes = widen(rollup.min_minutes, rollup.max_minutes, low, high)
+        rollup.histogram = format_histogram([a + b for a, b in zip(merged, counts)])
+
+def task_observations(task, room_number, actual_checkout=None):
+    """Observations for a completed task.
+
+    actual_checkout is looked up when None; pass False when the caller
+    already knows the room has no recorded checkout.
+    """
+    floor = room_floor(room_number)
+    observations = []
+    if task.started_at and task.completed_at >= task.started_at:
+        observations.append(('cleaning', task.completed_at, floor, task.housekeeper_id,
+                             (task.completed_at - task.started_at).total_seconds() / 60))
+    if actual_checkout is False:
+        actual_checkout = None  # Caller already looked it up and there is none
+    elif actual_checkout is None:
+        actual_checkout = db.session.query(func.max(Checkout.actual_checkout)).filter(
+            Checkout.room_id == task.room_id,
+            Checkout.actual_checkout <= task.completed_at
+        ).scalar()
+    if actual_checkout is not None:
+        observations.append(('turnaround', task.completed_at, floor, task.housekeeper_id,
+                             (task.completed_at - actual_checkout).total_seconds() / 60))
+    return observations
+
+def record_task_completion(task, room_number):
+    """Fold a newly completed task into the rollups. Call before committing the task."""
+    apply_buckets(aggregate(task_observations(task, room_number)))
+
+def record_checkouts(checkouts):
+    """Fold recorded checkouts, given as (actual_checkout, room_number) pairs, into the rollups."""
+    apply_buckets(aggregate(
+        ('checkouts', actual_checkout, room_floor(room_number), 0, None)
+        for actual_checkout, room_number in checkouts
+    ))
+
+
+# --- Catch-up ---
+
+def rebuild(start, end, chunk_size=5000):
+    """Recompute all rollups for [start, end) from raw rows. Caller commits.
+
+    start and end are rounded out to whole days so daily buckets stay complete.
+    """
+    start = bucket_start(start, 'day')
+    end = bucket_start(end, 'day') + (timedelta(days=1) if end != bucket_start(end, 'day') else timedelta())
+    Rollup.query.filter(Rollup.bucket_start >= start, Rollup.bucket_start < end).delete(synchronize_session=False)
+
+    buckets = defaultdict(lambda: [0, 0.0, empty_histogram(), None, None])
+
+    def merge(chunk):
+        for key, (count, minutes, counts, low, high) in aggregate(chunk).items():
+            bucket = buckets[key]
+            bucket[0] += count
+            bucket[1] += minutes
+            bucket[2] = [a + b for a, b in zip(bucket[2], counts)]
+            bucket[3], bucket[4] = widen(bucket[3], bucket[4], low, high)
+
+    # Keyset scans keep memory flat however long the range is
+    last_id = 0
+    while True:
+        rows = db.session.query(Checkout.id, Checkout.actual_checkout, Room.room_number).join(
+            Room, Room.id == Checkout.room_id
+        ).filter(
+            Checkout.id > last_id, Checkout.actual_checkout >= start, Checkout.actual_checkout < end
+        ).order_by(Checkout.id).limit(chunk_size).all()
+        if not rows:
+            break
+        merge(('checkouts', actual, room_floor(number), 0, None) for _, actual, number in rows)
+        last_id = rows[-1][0]
+
+    actual_checkout = select(func.max(Checkout.actual_checkout)).where(
+        Checkout.room_id == CleaningTask.room_id,
+        Checkout.actual_checkout <= CleaningTask.completed_at
+    ).scalar_subquery()
+    last_id = 0
+    while True:
+        tasks = db.session.query(
+            CleaningTask.id, CleaningTask.room_id, CleaningTask.housekeeper_id, CleaningTask.started_at,
+            CleaningTask.completed_at, Room.room_number, actual_checkout.label('actual_checkout')
+        ).join(Room, Room.id == CleaningTask.room_id).filter(
+            CleaningTask.id > last_id, CleaningTask.status == 'completed',
+            CleaningTask.completed_at >= start, CleaningTask.completed_at < end
+        ).order_by(CleaningTask.id).limit(chunk_size).all()
+        if not tasks:
+            break
+        observations = []
+        for task in tasks:
+            # Rows carry the same attribute names as CleaningTask, plus the checkout time
+            observations.extend(task_observations(task, task.room_number, task.actual_checkout or False))
+        merge(observations)
+        last_id = tasks[-1].id
+
+    apply_buckets(buckets)
+    return len(buckets)
+
+
+# --- Reports ---
+
+def load_rollups(metric, granularity, start, end):
+    """Rollups of the buckets overlapping [start, end), including the partial ones at either end."""
+    return Rollup.query.filter(
+        Rollup.metric == metric,
+        Rollup.granularity == granularity,
+        Rollup.bucket_start >= bucket_start(start, granularity),
+        Rollup.bucket_start < end
+    ).all()
+
+def summarize(rollups):
+    """Merge rollup rows into count / average / p50 / p90."""
+    count = sum(r.count for r in rollups)
+    counts = empty_histogram()
+    total = 0.0
+    low = high = None
+    known = True  # Rows written before the extremes were kept have none
+    for rollup in rollups:
+        total += rollup.total_minutes
+        histogram = parse_histogram(rollup.histogram)
+        counts = [a + b for a, b in zip(counts, histogram)]
+        if any(histogram):
+            known = known and rollup.min_minutes is not None
+            low, high = widen(low, high, rollup.min_minutes, rollup.max_minutes)
+    if not known:
+        low = high = None
+    timed = sum(counts)
+    return {
+        'count': count,
+        'avg_minutes': round(total / timed, 1) if timed else None,
+        'p50_minutes': percentile(counts, 0.5, low, high),
+        'p90_minutes': percentile(counts, 0.9, low, high),
+    }
+
+def grouped(rollups, key):
+    groups = defaultdict(list)
+    for rollup in rollups:
+        groups[key(rollup)].append(rollup)
+    return groups
+
+def turnaround_report(start, end, granularity='day'):
+    rollups = load_rollups('turnaround', granularity, start, end)
+    series = [
+        dict(bucket_start=bucket.isoformat(), **summarize(rows))
+        for bucket, rows in sorted(grouped(rollups, lambda r: r.bucket_start).items())
+    ]
+    checkouts = sum(r.count for r in load_rollups('checkouts', 'day', start, end))
+    return {'overall': summarize(rollups), 'checkouts': checkouts, 'series': series}
+
+def housekeeper_report(start, end):
+    cleaning = grouped(load_rollups('cleaning', 'day', start, end), lambda r: r.housekeeper_id)
+    turnaround = grouped(load_rollups('turnaround', 'day', start, end), lambda r: r.housekeeper_id)
+    output = []
+    for housekeeper_id in sorted(set(cleaning) | set(turnaround)):
+        output.append({
+            'housekeeper_id': housekeeper_id,
+            'cleaning': summarize(cleaning.get(housekeeper_id, [])),
+            'turnaround': summarize(turnaround.get(housekeeper_id, [])),
+        })
+    return output
+
+def floor_report(start, end, metric='turnaround'):
+    groups = grouped(load_rollups(metric, 'day', start, end), lambda r: r.floor)
+    return [dict(floor=floor, **summarize(rows)) for floor, rows in sorted(groups.items())]
@@ -1,42 +1,89 @@
 # backend/app.py
-from flask import Flask, request, jsonify
+import asyncio
+import signal
+import threading
+
+import click
+from flask import Blueprint, Flask, Response, current_app, request, jsonify, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
-from models import db, Room, Checkout, Housekeeper, CleaningTask  # Import the models
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm.exc import StaleDataError
+from datetime import datetime, timedelta
+import json
+import os
+import time
+from urllib.parse import urlencode
+from models import db, Property, Room, Checkout, Housekeeper, CleaningTask, Reservation, RoomEvent  # Import the models
+from models import current_property_id, room_floor
+import migrate
+import db_profiles
+import tenancy
+import dispatcher
+import sync
+import history
+import outbox
+import transitions
+import serializers
+import workload
+import analytics
+import export
+from late_checkout import BudgetExceeded, LateCheckoutEngine
+import metrics
+from events import bus, format_event, format_resync, parse_event_id
+from cache import create_room_cache
+
+api = Blueprint('api', __name__, cli_group=None)  # Every route and command; see create_app()
+# Room ids and versions are per property, so each property gets its own cache and interval indexes.
+# They are created on first use and kept in the app's extensions, so every create_app() starts clean.
+room_cache = tenancy.PerProperty(
+    'room_cache', lambda app, hotel: create_room_cache(app.config['ROOM_CACHE_REDIS_URL'], hotel.code))
+late_checkouts = tenancy.PerProperty(
+    'late_checkouts', lambda app, hotel: LateCheckoutEngine(app.config['LATE_CHECKOUT_POLICY'], app.logger))
+walking_routes = tenancy.PerProperty('walking_routes', lambda app, hotel: workload.WalkingRoute())
 
-app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///hotel.db'  # Example SQLite database (for development)
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False  # To suppress a warning
-db.init_app(app)  # Initialize SQLAlchemy with the app
+EVENT_KEEPALIVE_SECONDS = 15  # Comment line sent to idle event streams so proxies keep them open
+MAX_SYNC_WAIT_SECONDS = 60  # Longest GET /sync?wait= long poll
+SYNC_WAIT_POLL_SECONDS = 5  # Long polls re-check the version this often (events from other workers don't wake them)
+DEFAULT_PAGE_SIZE = 100  # Page size for endpoints that always paginate
+MAX_PAGE_SIZE = 1000
+MAX_BATCH_SIZE = 5000  # Records accepted by one POST /checkouts/batch
+IN_CLAUSE_CHUNK = 500  # Keeps IN (...) lists under SQLite's bound parameter limit
 
 # --- Helper Functions ---
 
-def get_room_data(room):
-    """Helper function to format room data for API responses."""
+def get_room_summary_data(row):
+    """Helper function to format a (id, room_number, status, last_cleaned) row."""
+    room_id, room_number, status, last_cleaned = row
     return {
-        'id': room.id,
-        'room_number': room.room_number,
-        'status': room.status,
-        'last_cleaned': room.last_cleaned.isoformat() if room.last_cleaned else None,
-        'checkouts': [get_checkout_data(co) for co in room.checkouts],
-        'cleaning_tasks': [get_cleaning_task_data(ct) for ct in room.cleaning_tasks] #Added
+        'id': room_id,
+        'room_number': room_number,
+        'status': status,
+        'last_cleaned': last_cleaned.isoformat() if last_cleaned else None,
     }
 
-def get_checkout_data(checkout):
-    """Helper function to format checkout data."""
+def get_reservation_data(reservation):
+    """Helper function to format reservation data."""
     return {
-        'id': checkout.id,
-        'scheduled_checkout': checkout.scheduled_checkout.isoformat(),
-        'actual_checkout': checkout.actual_checkout.isoformat() if checkout.actual_checkout else None,
-        'late_checkout_approved': checkout.late_checkout_approved,
-        'late_checkout_time': checkout.late_checkout_time.isoformat() if checkout.late_checkout_time else None,
+        'id': reservation.id,
+        'room_id': reservation.room_id,
+        'guest_name': reservation.guest_name,
+        'arrival_time': reservation.arrival_time.isoformat(),
+        'departure_time': reservation.departure_time.isoformat() if reservation.departure_time else None,
+        'vip': reservation.vip,
     }
 
-def get_housekeeper_data(housekeeper):
-    """Helper function to format housekeeper data."""
+def get_assignment_data(assignment, housekeeper_names):
+    """Helper function to format a dispatcher assignment."""
     return {
-        'id': housekeeper.id,
-        'name': housekeeper.name,
+        'room_id': assignment.room_id,
+        'room_number': assignment.room_number,
+        'floor': assignment.floor,
+        'housekeeper_id': assignment.housekeeper_id,
+        'housekeeper_name': housekeeper_names.get(assignment.housekeeper_id),
+        'priority': assignment.priority,
+        'next_arrival': assignment.next_arrival.isoformat() if assignment.next_arrival else None,
+        'vip': assignment.vip,
     }
 
 def get_cleaning_task_data(cleaning_task):
@@ -48,44 +95,312 @@ def get_cleaning_task_data(cleaning_task):
         'status': cleaning_task.status,
         'started_at': cleaning_task.started_at.isoformat() if cleaning_task.started_at else None,
         'completed_at': cleaning_task.completed_at.isoformat() if cleaning_task.completed_at else None,
+        'version': cleaning_task.sync_version,
     }
 
+def load_rooms(query):
+    """Helper function to build full room rows (with checkouts and cleaning tasks) from a ROOM_FIELDS query."""
+    return serializers.full_rooms(serializers.rows(serializers.ROOM_FIELDS, query))
+
+def load_room_board():
+    """Load every room's serialized data for the room cache, keyed by id."""
+    rooms = load_rooms(serializers.query(serializers.ROOM_FIELDS).order_by(Room.id))
+    return {row['id']: row for row in rooms}
+
+def encode_room_board(view, rooms):
+    """Encode cached room dicts as a GET /rooms body for the given view."""
+    if view == 'summary':
+        output = [{key: data[key] for key in serializers.ROOM_SUMMARY_FIELDS} for data in rooms.values()]
+    else:
+        output = list(rooms.values())
+    return serializers.dumps({'rooms': output})
+
+def cache_room(room):
+    """Helper function to write a changed room through to the room cache."""
+    room_cache.write_through(room.id, serializers.room)
+
+def room_etag(version):
+    return f'rooms-v{version}'
+
+def not_modified(version):
+    """Return a 304 response if the client already has this cache version (in any coding), else None."""
+    tag = serializers.matching_etag(request.if_none_match, room_etag(version))
+    if tag is not None:
+        response = Response(status=304)
+        response.set_etag(tag)  # The tag of the representation the client holds
+        response.vary.add('Accept-Encoding')
+        return response
+    return None
+
+def entity_etag(kind, entity_id, version):
+    """ETag of one room or task; it changes with the row's sync_version."""
+    return f'{kind}-{entity_id}-v{version}'
+
+def room_detail_etag(room_id, version, board_version):
+    """ETag of GET /rooms/<id>: the room's own ETag, plus the board version that covers its checkouts and tasks."""
+    return f"{entity_etag('room', room_id, version)}.{board_version}"
+
+def precondition_failed(etag):
+    """Return a 412 response if the request's If-Match does not match the current ETag, else None.
+
+    An ETag from GET /rooms/<id> matches as long as its room part does, whatever its content-coding.
+    """
+    tags = {serializers.base_etag(tag) for tag in request.if_match.as_set()}
+    if request.if_match and not request.if_match.star_tag and not any(
+        tag == etag or tag.startswith(etag + '.') for tag in tags
+    ):
+        response = jsonify({'error': 'Precondition failed: changed since you read it', 'etag': etag})
+        response.status_code = 412
+        response.set_etag(etag)
+        return response
+    return None
+
+def cached_json_response(version, body):
+    """Build a JSON response tagged with the room cache version as a strong ETag."""
+    response = Response(body, mimetype='application/json')
+    response.set_etag(room_etag(version))
+    response.headers['Cache-Control'] = 'no-cache'  # Clients must revalidate, which is cheap
+    return response
+
+def publish_room_change(room):
+    """Helper function to publish a room's new state on the event bus."""
+    bus.publish(
+        'room',
+        property_id=room.property_id,
+        room_id=room.id,
+        room_number=room.room_number,
+        floor=room.floor,
+        status=room.status,
+        last_cleaned=room.last_cleaned.isoformat() if room.last_cleaned else None,
+    )
+
+def publish_checkout_change(checkout):
+    """Helper function to publish a checkout's new state on the event bus."""
+    bus.publish(
+        'checkout',
+        property_id=checkout.property_id,
+        checkout_id=checkout.id,
+        room_id=checkout.room_id,
+        room_number=checkout.room.room_number,
+        floor=checkout.room.floor,
+        actual_checkout=checkout.actual_checkout.isoformat() if checkout.actual_checkout else None,
+        late_checkout_time=checkout.late_checkout_time.isoformat() if checkout.late_checkout_time else None,
+        late_checkout_approved=checkout.late_checkout_approved,
+    )
+
+def publish_task_change(task, status=None):
+    """Helper function to publish a cleaning task's new state on the event bus."""
+    bus.publish(
+        'task',
+        property_id=task.property_id,
+        task_id=task.id,
+        room_id=task.room_id,
+        room_number=task.room.room_number,
+        floor=task.room.floor,
+        housekeeper_id=task.housekeeper_id,
+        status=status or task.status,
+    )
+
+def parse_int_arg(name):
+    """Helper function to read an optional integer query string argument."""
+    value = request.args.get(name)
+    if value is None or value == '':
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f'Invalid {name}: {value}. Must be an integer')
+
+def parse_datetime_arg(name):
+    """Helper function to read an optional ISO datetime query string argument."""
+    value = request.args.get(name)
+    if value is None or value == '':
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'Invalid date format for {name}.  Use ISO format (e.g., 2024-08-01T10:00:00)')
+
+def parse_page_args(default_limit=None):
+    """Helper function to read the limit/after keyset cursor from the query string.
+
+    Returns (limit, after). limit is None when the endpoint is not paginated.
+    """
+    limit = parse_int_arg('limit')
+    after = parse_int_arg('after')
+    if limit is None and after is not None:
+        limit = DEFAULT_PAGE_SIZE
+    if limit is None:
+        limit = default_limit
+    if limit is not None and not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f'limit must be between 1 and {MAX_PAGE_SIZE}')
+    return limit, after
+
+def paginate(query, id_column, limit, after):
+    """Helper function to apply keyset pagination on a primary key column.
+
+    Returns (items, next_cursor). next_cursor is the id to pass as ?after= for
+    the next page, or None on the last page.
+    """
+    if after is not None:
+        query = query.filter(id_column > after)
+    query = query.order_by(id_column)
+    if limit is None:
+        return query.all(), None
+    items = query.limit(limit + 1).all()  # One extra row tells us if there is a next page
+    if len(items) <= limit:
+        return items, None
+    items = items[:limit]
+    return items, items[-1].id
+
+def page_response(key, output, limit, next_cursor):
+    """Helper function to build a list response, adding the cursor when paginated.
+
+    A page that is not the last says so three ways: truncated is true, next
+    is the URL of the following page, and a Link: rel="next" header carries
+    the same URL, so clients that expect the whole list cannot miss the cut.
+    """
+    body = {key: output}
+    next_url = None
+    if next_cursor is not None:
+        args = [(name, value) for name, value in request.args.items(multi=True) if name not in ('after', 'limit')]
+        next_url = f"{request.path}?{urlencode(args + [('limit', limit), ('after', next_cursor)])}"
+    if limit is not None:
+        body.update(next_cursor=next_cursor, truncated=next_url is not None, next=next_url)
+    response = serializers.json_response(body)
+    if next_url is not None:
+        response.headers['Link'] = f'<{next_url}>; rel="next"'
+    return response
+
 # --- API Endpoints ---
 
+# Another request changed the row between our read and our UPDATE ... WHERE sync_version = <read>
+@api.app_errorhandler(StaleDataError)
+def handle_stale_data(error):
+    db.session.rollback()
+    return jsonify({'error': 'Changed by another request meanwhile; reload and retry'}), 409
+
+# A late checkout decision ran over LATE_CHECKOUT_POLICY['budget_ms']; the room's index is loaded by now
+@api.app_errorhandler(BudgetExceeded)
+def handle_budget_exceeded(error):
+    db.session.rollback()
+    response = jsonify({'error': str(error)})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
 # Get all rooms and their status
-@app.route('/rooms', methods=['GET'])
+# ?view=summary returns only id/room_number/status/last_cleaned for polling boards
+# ?status= filters, ?limit=&after= pages through rooms by id
+@api.route('/rooms', methods=['GET'])
 def get_rooms():
-    rooms = Room.query.all()
-    output = [get_room_data(room) for room in rooms]
-    return jsonify({'rooms': output})
+    view = request.args.get('view', 'full')
+    if view not in ('full', 'summary'):
+        return jsonify({'error': f'Invalid view: {view}'}), 400
+    try:
+        limit, after = parse_page_args()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    status = request.args.get('status')
+    try:
+        as_of = parse_datetime_arg('as_of')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if as_of is not None:
+        # Rebuilt from the room history; see history.py
+        if limit is not None:
+            return jsonify({'error': 'as_of cannot be combined with limit or after'}), 400
+        rooms = history.board_at(as_of, status.split(',') if status else None)
+        return serializers.json_response({'as_of': as_of, 'rooms': rooms})
+
+    if limit is None and not status:
+        # The whole board is served from the room cache
+        response = not_modified(room_cache.version())
+        if response:
+            return response
+        version, body = room_cache.board(view, load_room_board, encode_room_board)
+        return cached_json_response(version, body)
+
+    fields = serializers.ROOM_SUMMARY_FIELDS if view == 'summary' else serializers.ROOM_FIELDS
+    query = serializers.query(fields)
+    if status:
+        query = query.filter(Room.status.in_(status.split(',')))
+
+    rooms, next_cursor = paginate(query, Room.id, limit, after)
+    output = serializers.rows(fields, rooms)
+    if view != 'summary':
+        output = serializers.full_rooms(output)  # Checkouts and cleaning tasks with one IN query each
+    return page_response('rooms', output, limit, next_cursor)
 
 # Get a specific room's details
-@app.route('/rooms/<int:room_id>', methods=['GET'])
+@api.route('/rooms/<int:room_id>', methods=['GET'])
 def get_room(room_id):
-    room = Room.query.get_or_404(room_id)
-    return jsonify(get_room_data(room))
+    board_version, data = room_cache.room(room_id)
+    if data is None:
+        data = serializers.room(room_id)
+        if data is None:
+            return jsonify({'error': f'Room {room_id} not found'}), 404
+    # Usable in If-Match: PUT /rooms/<id> checks the room part
+    etag = room_detail_etag(room_id, data['version'], board_version)
+    tag = serializers.matching_etag(request.if_none_match, etag)
+    if tag is not None:
+        response = Response(status=304)
+        response.set_etag(tag)
+        response.vary.add('Accept-Encoding')
+        return response
+    response = serializers.json_response(data)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.set_etag(etag)  # Plus the content-coding, when compressed
+    return response
+
+# Transitions of one room, its checkouts and its cleaning tasks, oldest first
+@api.route('/rooms/<int:room_id>/history', methods=['GET'])
+def get_room_history(room_id):
+    try:
+        start = parse_datetime_arg('start')
+        end = parse_datetime_arg('end')
+        limit, after = parse_page_args(default_limit=DEFAULT_PAGE_SIZE)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if not db.session.query(Room.id).filter(Room.id == room_id).first():
+        return jsonify({'error': f'Room {room_id} not found'}), 404
+    events, next_cursor = paginate(history.events_query(room_id, start, end), RoomEvent.id, limit, after)
+    return page_response('events', [history.event_data(*event) for event in events], limit, next_cursor)
 
 # Update room status (e.g., checked_out, cleaning, clean)
-@app.route('/rooms/<int:room_id>', methods=['PUT'])
+@api.route('/rooms/<int:room_id>', methods=['PUT'])
 def update_room_status(room_id):
     room = Room.query.get_or_404(room_id)
+    response = precondition_failed(entity_etag('room', room.id, room.sync_version))
+    if response:
+        return response
     data = request.get_json()
     if 'status' not in data:
         return jsonify({'error': 'Missing status in request'}), 400
 
     new_status = data['status']
-    allowed_statuses = ['occupied', 'checked_out', 'cleaning', 'clean'] #Added
-    if new_status not in allowed_statuses:
+    if new_status not in transitions.ROOM_TRANSITIONS:
         return jsonify({'error': f'Invalid status: {new_status}'}), 400
+    try:
+        transitions.check_room(room.status, new_status)
+    except transitions.InvalidTransition as e:
+        return jsonify({'error': str(e), 'status': room.status}), 409
 
+    became_clean = new_status == 'clean' and room.status != 'clean'
     room.status = new_status
     if room.status == 'clean':
         room.last_cleaned = datetime.utcnow()
-    db.session.commit()
-    return jsonify({'message': f'Room {room.room_number} status updated to {room.status}'})
+    if became_clean:
+        outbox.room_ready(room)
+    db.session.commit()  # UPDATE ... WHERE sync_version = <read>; a lost race is a 409 (see handle_stale_data)
+    cache_room(room)
+    publish_room_change(room)
+    response = jsonify({'message': f'Room {room.room_number} status updated to {room.status}'})
+    response.set_etag(entity_etag('room', room.id, room.sync_version))
+    return response
 
 # Record a checkout
-@app.route('/checkouts', methods=['POST'])
+@api.route('/checkouts', methods=['POST'])
 def record_checkout():
     data = request.get_json()
     room_number = data.get('room_number')
@@ -109,11 +424,128 @@ def record_checkout():
 
     checkout.actual_checkout = actual_checkout
     room.status = 'checked_out'
+    analytics.record_checkouts([(actual_checkout, room.room_number)])
+    outbox.checkout_recorded(checkout, room)
     db.session.commit()
+    cache_room(room)
+    publish_room_change(room)
+    publish_checkout_change(checkout)
     return jsonify({'message': f'Checkout recorded for room {room_number}'})
 
+def parse_batch_records():
+    """Helper function to read batch records from a JSON array or an NDJSON body."""
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        records = []
+        for line_number, line in enumerate(request.get_data(as_text=True).splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                raise ValueError(f'Invalid JSON on line {line_number}')
+        return records
+
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get('checkouts')
+    if not isinstance(data, list):
+        raise ValueError('Expected a JSON array of checkouts or an NDJSON body')
+    return data
+
+def chunked(values, size=IN_CLAUSE_CHUNK):
+    """Helper function to split a list into IN-clause sized chunks."""
+    values = list(values)
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+def latest_checkouts_for_rooms(room_ids):
+    """Return {room_id: latest scheduled Checkout} using one grouped query per chunk."""
+    latest = {}
+    for chunk in chunked(room_ids):
+        newest = db.session.query(
+            Checkout.room_id,
+            func.max(Checkout.scheduled_checkout).label('scheduled_checkout')
+        ).filter(Checkout.room_id.in_(chunk)).group_by(Checkout.room_id).subquery()
+        checkouts = Checkout.query.join(
+            newest,
+            (Checkout.room_id == newest.c.room_id) & (Checkout.scheduled_checkout == newest.c.scheduled_checkout)
+        ).all()
+        for checkout in checkouts:
+            # Two checkouts scheduled at the same time: keep the newest row, like .first() on id order would
+            current = latest.get(checkout.room_id)
+            if current is None or checkout.id > current.id:
+                latest[checkout.room_id] = checkout
+    return latest
+
+# Record many checkouts in one transaction (PMS night-audit / morning-rush feeds)
+# Body: JSON array (or {"checkouts": [...]}) or NDJSON of {room_number, actual_checkout}
+@api.route('/checkouts/batch', methods=['POST'])
+def record_checkouts_batch():
+    try:
+        records = parse_batch_records()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if len(records) > MAX_BATCH_SIZE:
+        return jsonify({'error': f'Batch too large: {len(records)} records (max {MAX_BATCH_SIZE})'}), 413
+
+    results = [None] * len(records)
+    changed = []  # (room, checkout) pairs to publish after the commit
+    parsed = []  # (index, room_number, actual_checkout)
+    for index, record in enumerate(records):
+        if not isinstance(record, dict):
+            results[index] = {'index': index, 'status': 400, 'error': 'Record must be an object'}
+            continue
+        room_number = record.get('room_number')
+        actual_checkout_str = record.get('actual_checkout')
+        if not room_number or not actual_checkout_str:
+            results[index] = {'index': index, 'room_number': room_number, 'status': 400,
+                              'error': 'Missing room_number or actual_checkout'}
+            continue
+        try:
+            actual_checkout = datetime.fromisoformat(actual_checkout_str)
+        except (TypeError, ValueError):
+            results[index] = {'index': index, 'room_number': room_number, 'status': 400,
+                              'error': 'Invalid date format for actual_checkout.  Use ISO format (e.g., 2024-08-01T10:00:00)'}
+            continue
+        parsed.append((index, str(room_number), actual_checkout))
+
+    rooms = {}
+    for chunk in chunked({room_number for _, room_number, _ in parsed}):
+        for room in Room.query.filter(Room.room_number.in_(chunk)).all():
+            rooms[room.room_number] = room
+    checkouts = latest_checkouts_for_rooms(room.id for room in rooms.values())
+
+    for index, room_number, actual_checkout in parsed:
+        room = rooms.get(room_number)
+        if not room:
+            results[index] = {'index': index, 'room_number': room_number, 'status': 404,
+                              'error': f'Room {room_number} not found'}
+            continue
+        checkout = checkouts.get(room.id)
+        if not checkout:
+            results[index] = {'index': index, 'room_number': room_number, 'status': 404,
+                              'error': f'No scheduled checkout found for room {room_number}'}
+            continue
+        checkout.actual_checkout = actual_checkout
+        room.status = 'checked_out'
+        changed.append((room, checkout))
+        results[index] = {'index': index, 'room_number': room_number, 'status': 200, 'checkout_id': checkout.id}
+
+    analytics.record_checkouts((checkout.actual_checkout, room.room_number) for room, checkout in changed)
+    for room, checkout in changed:
+        outbox.checkout_recorded(checkout, room)
+    db.session.commit()
+    if changed:
+        room_cache.invalidate()  # Cheaper than re-serializing every room in a large batch
+    for room, checkout in changed:
+        publish_room_change(room)
+        publish_checkout_change(checkout)
+    failed = sum(1 for result in results if result['status'] != 200)
+    body = {'recorded': len(results) - failed, 'failed': failed, 'results': results}
+    return jsonify(body), 207 if failed else 200
+
 # Request a late checkout
-@app.route('/checkouts/<int:checkout_id>/late', methods=['PUT'])
+@api.route('/checkouts/<int:checkout_id>/late', methods=['PUT'])
 def request_late_checkout(checkout_id):
     checkout = Checkout.query.get_or_404(checkout_id)
     data = request.get_json()
@@ -130,15 +562,38 @@ def request_late_checkout(checkout_id):
     if requested_time <= checkout.scheduled_checkout:
         return jsonify({'error': 'requested_time must be after the scheduled checkout'}), 400
 
+    decision = late_checkouts.check(checkout, requested_time)
+    if not decision.feasible:
+        return jsonify(dict(error=f'Late checkout until {requested_time} is not available: {decision.reason}',
+                            **decision.to_dict())), 409
 
     checkout.late_checkout_time = requested_time
-    # In a real application, you'd implement logic to check availability and potentially calculate fees
+    checkout.late_checkout_fee = decision.fee
     checkout.late_checkout_approved = False  # Initially set to false, to be approved by staff
+    sync.touch(checkout.room)  # Its checkouts are part of the room's row
     db.session.commit()
-    return jsonify({'message': f'Late checkout requested for room {checkout.room.room_number} until {checkout.late_checkout_time}'})
+    late_checkouts.note_approval(checkout)  # Drops a previously approved window
+    cache_room(checkout.room)
+    publish_checkout_change(checkout)
+    return jsonify({
+        'message': f'Late checkout requested for room {checkout.room.room_number} until {checkout.late_checkout_time}',
+        'fee': decision.fee,
+    })
+
+# Quote a late checkout without requesting it: availability, latest feasible time and fee
+@api.route('/checkouts/<int:checkout_id>/late', methods=['GET'])
+def quote_late_checkout(checkout_id):
+    checkout = Checkout.query.get_or_404(checkout_id)
+    try:
+        requested_time = parse_datetime_arg('requested_time')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if requested_time is None:
+        return jsonify({'error': 'Missing requested_time'}), 400
+    return jsonify(late_checkouts.check(checkout, requested_time).to_dict())
 
 # Approve or deny a late checkout request
-@app.route('/checkouts/<int:checkout_id>/approve_late', methods=['PUT'])
+@api.route('/checkouts/<int:checkout_id>/approve_late', methods=['PUT'])
 def approve_late_checkout(checkout_id):
     checkout = Checkout.query.get_or_404(checkout_id)
     data = request.get_json()
@@ -147,19 +602,63 @@ def approve_late_checkout(checkout_id):
     if approved is None:
         return jsonify({'error': 'Missing approval status'}), 400
 
+    if approved and not checkout.late_checkout_time:
+        return jsonify({'error': 'No late checkout has been requested'}), 400
+    if approved:
+        # Re-check: a reservation may have arrived since the request was made
+        decision = late_checkouts.check(checkout, checkout.late_checkout_time)
+        if not decision.feasible:
+            return jsonify(dict(error=f'Late checkout can no longer be approved: {decision.reason}',
+                                **decision.to_dict())), 409
+
     checkout.late_checkout_approved = bool(approved)
+    outbox.late_checkout_decided(checkout)
+    sync.touch(checkout.room)
     db.session.commit()
+    late_checkouts.note_approval(checkout)
+    cache_room(checkout.room)
+    publish_checkout_change(checkout)
     return jsonify({'message': f'Late checkout for room {checkout.room.room_number} {"approved" if checkout.late_checkout_approved else "denied"}'})
 
 # Get all housekeepers
-@app.route('/housekeepers', methods=['GET'])
+@api.route('/housekeepers', methods=['GET'])
 def get_housekeepers():
-    housekeepers = Housekeeper.query.all()
-    output = [get_housekeeper_data(housekeeper) for housekeeper in housekeepers]
-    return jsonify({'housekeepers': output})
+    try:
+        limit, after = parse_page_args()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    fields = serializers.HOUSEKEEPER_FIELDS
+    housekeepers, next_cursor = paginate(serializers.query(fields), Housekeeper.id, limit, after)
+    return page_response('housekeepers', serializers.rows(fields, housekeepers), limit, next_cursor)
+
+# One housekeeper's tasks in walking order, with their workload counters
+@api.route('/housekeepers/<int:housekeeper_id>/tasks', methods=['GET'])
+def get_housekeeper_tasks(housekeeper_id):
+    housekeeper = Housekeeper.query.get_or_404(housekeeper_id)
+    statuses = request.args.get('status', ','.join(transitions.OPEN_TASK_STATUSES)).split(',')
+    invalid = [status for status in statuses if status not in transitions.TASK_TRANSITIONS]
+    if invalid:
+        return jsonify({'error': f'Invalid status: {invalid[0]}'}), 400
+
+    now = datetime.utcnow()
+    fields = serializers.ROUTE_TASK_FIELDS
+    query = serializers.query(fields).join(Room, Room.id == CleaningTask.room_id).filter(
+        CleaningTask.housekeeper_id == housekeeper_id, CleaningTask.status.in_(statuses))
+    if 'completed' in statuses:
+        # Only today's; the rest of the history is in GET /cleaning_tasks
+        query = query.filter((CleaningTask.status != 'completed')
+                             | (CleaningTask.completed_at >= now.replace(hour=0, minute=0, second=0, microsecond=0)))
+    tasks = serializers.rows(fields, query)
+    for task in tasks:
+        task['floor'] = room_floor(task['room_number'])
+    return serializers.json_response({
+        'housekeeper': {'id': housekeeper.id, 'name': housekeeper.name},
+        'workload': workload.workload(housekeeper, now),
+        'tasks': walking_routes.order(tasks),
+    })
 
 # Assign a cleaning task to a housekeeper
-@app.route('/cleaning_tasks', methods=['POST'])
+@api.route('/cleaning_tasks', methods=['POST'])
 def assign_cleaning_task():
     data = request.get_json()
     room_number = data.get('room_number')
@@ -189,69 +688,672 @@ def assign_cleaning_task():
     new_task = CleaningTask(room_id=room.id, housekeeper_id=housekeeper.id)
     db.session.add(new_task)
     room.status = 'cleaning'
-    db.session.commit()
+    try:
+        db.session.commit()
+    except IntegrityError:  # A concurrent request assigned the room first (uq_cleaning_tasks_open_room_id)
+        db.session.rollback()
+        return jsonify({'error': f'Room {room_number} already has a cleaning task in progress or pending'}), 409
+    cache_room(room)
+    publish_task_change(new_task)
+    publish_room_change(room)
     return jsonify({'message': f'Cleaning task assigned to {housekeeper.name} for room {room_number}'}), 201
 
 # Update the status of a cleaning task
-@app.route('/cleaning_tasks/<int:task_id>', methods=['PUT'])
+@api.route('/cleaning_tasks/<int:task_id>', methods=['PUT'])
 def update_cleaning_task_status(task_id):
     task = CleaningTask.query.get_or_404(task_id)
+    response = precondition_failed(entity_etag('task', task.id, task.sync_version))
+    if response:
+        return response
     data = request.get_json()
     status = data.get('status')
 
     if not status:
         return jsonify({'error': 'Missing status'}), 400
 
-    allowed_statuses = ['pending', 'in_progress', 'completed'] #Added
-    if status not in allowed_statuses:
+    if status not in transitions.TASK_TRANSITIONS:
         return jsonify({'error': f'Invalid status: {status}'}), 400
+    try:
+        transitions.check_task(task.status, status)
+    except transitions.InvalidTransition as e:
+        return jsonify({'error': str(e), 'status': task.status}), 409
     task.status = status
+    room = None
     if status == 'in_progress' and not task.started_at:
         task.started_at = datetime.utcnow()
     elif status == 'completed' and not task.completed_at:
         task.completed_at = datetime.utcnow()
         room = Room.query.get(task.room_id)
         if room:
-            room.status = 'clean'
             room.last_cleaned = task.completed_at
+            if room.status != 'clean' and transitions.room_allows(room.status, 'clean'):  # Not if a guest moved in
+                room.status = 'clean'
+                outbox.room_ready(room)
+        analytics.record_task_completion(task, task.room.room_number)
+    sync.touch(task.room)  # Its tasks are part of the room's row
     db.session.commit()
-    return jsonify({'message': f'Cleaning task for room {task.room.room_number} updated to {status}'})
+    cache_room(task.room)
+    publish_task_change(task)
+    if room:
+        publish_room_change(room)
+    response = jsonify({'message': f'Cleaning task for room {task.room.room_number} updated to {status}'})
+    response.set_etag(entity_etag('task', task.id, task.sync_version))
+    return response
 
-# Get all cleaning tasks
-@app.route('/cleaning_tasks', methods=['GET'])
+# Get cleaning tasks, one page at a time
+# Filters: ?status=, ?housekeeper_id=, ?room_id=, ?completed_after=, ?completed_before=
+@api.route('/cleaning_tasks', methods=['GET'])
 def get_cleaning_tasks():
-    tasks = CleaningTask.query.all()
-    output = [get_cleaning_task_data(task) for task in tasks]
-    return jsonify({'cleaning_tasks': output})
+    try:
+        limit, after = parse_page_args(default_limit=DEFAULT_PAGE_SIZE)
+        housekeeper_id = parse_int_arg('housekeeper_id')
+        room_id = parse_int_arg('room_id')
+        completed_after = parse_datetime_arg('completed_after')
+        completed_before = parse_datetime_arg('completed_before')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    fields = serializers.CLEANING_TASK_FIELDS
+    query = serializers.query(fields)
+    status = request.args.get('status')
+    if status:
+        query = query.filter(CleaningTask.status.in_(status.split(',')))
+    if housekeeper_id is not None:
+        query = query.filter(CleaningTask.housekeeper_id == housekeeper_id)
+    if room_id is not None:
+        query = query.filter(CleaningTask.room_id == room_id)
+    if completed_after is not None:
+        query = query.filter(CleaningTask.completed_at >= completed_after)
+    if completed_before is not None:
+        query = query.filter(CleaningTask.completed_at < completed_before)
+
+    tasks, next_cursor = paginate(query, CleaningTask.id, limit, after)
+    return page_response('cleaning_tasks', serializers.rows(fields, tasks), limit, next_cursor)
 
 # Delete a cleaning task
-@app.route('/cleaning_tasks/<int:task_id>', methods=['DELETE'])
+@api.route('/cleaning_tasks/<int:task_id>', methods=['DELETE'])
 def delete_cleaning_task(task_id):
     task = CleaningTask.query.get_or_404(task_id)
+    response = precondition_failed(entity_etag('task', task.id, task.sync_version))
+    if response:
+        return response
+    task.room  # Load the room now; the event below is published after the row is gone
     db.session.delete(task)
+    sync.touch(task.room)
     db.session.commit()
+    cache_room(task.room)
+    publish_task_change(task, status='deleted')
     return jsonify({'message': f'Cleaning task {task_id} deleted'})
 
+# Create a reservation (an incoming arrival used to prioritise cleaning)
+@api.route('/reservations', methods=['POST'])
+def create_reservation():
+    data = request.get_json()
+    room_number = data.get('room_number')
+    arrival_time_str = data.get('arrival_time')
+
+    if not room_number or not arrival_time_str:
+        return jsonify({'error': 'Missing room_number or arrival_time'}), 400
+
+    room = Room.query.filter_by(room_number=room_number).first()
+    if not room:
+        return jsonify({'error': f'Room {room_number} not found'}), 404
+
+    try:
+        arrival_time = datetime.fromisoformat(arrival_time_str)
+        departure_time = datetime.fromisoformat(data['departure_time']) if data.get('departure_time') else None
+    except ValueError:
+        return jsonify({'error': 'Invalid date format for arrival_time or departure_time.  Use ISO format (e.g., 2024-08-01T15:00:00)'}), 400
+    if departure_time is not None and departure_time <= arrival_time:
+        return jsonify({'error': 'departure_time must be after arrival_time'}), 400
+
+    reservation = Reservation(
+        room_id=room.id,
+        guest_name=data.get('guest_name'),
+        arrival_time=arrival_time,
+        departure_time=departure_time,
+        vip=bool(data.get('vip', False)),
+    )
+    db.session.add(reservation)
+    db.session.commit()
+    late_checkouts.note_reservation(reservation)
+    return jsonify(get_reservation_data(reservation)), 201
+
+# Get reservations, optionally for one room (?room_id=) and arriving from ?arriving_after=
+@api.route('/reservations', methods=['GET'])
+def get_reservations():
+    try:
+        limit, after = parse_page_args(default_limit=DEFAULT_PAGE_SIZE)
+        room_id = parse_int_arg('room_id')
+        arriving_after = parse_datetime_arg('arriving_after')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    query = Reservation.query
+    if room_id is not None:
+        query = query.filter(Reservation.room_id == room_id)
+    if arriving_after is not None:
+        query = query.filter(Reservation.arrival_time >= arriving_after)
+    reservations, next_cursor = paginate(query, Reservation.id, limit, after)
+    output = [get_reservation_data(reservation) for reservation in reservations]
+    return page_response('reservations', output, limit, next_cursor)
+
+def run_dispatcher(dry_run, housekeeper_ids=None):
+    """Plan (and unless dry_run, create) cleaning tasks for every waiting room."""
+    started = time.perf_counter()
+    staff = dispatcher.load_staff(housekeeper_ids)
+    assignments, unassigned = dispatcher.plan(dispatcher.load_candidates(), staff)
+    planning_ms = (time.perf_counter() - started) * 1000
+
+    skipped = []
+    if not dry_run and assignments:
+        assignments, tasks, skipped = dispatcher.apply(assignments)
+        try:
+            db.session.commit()
+        except IntegrityError:  # A room was assigned concurrently; nothing was created
+            db.session.rollback()
+            return jsonify({'error': 'Rooms were assigned by another request meanwhile; run the dispatcher again'}), 409
+        room_cache.invalidate()
+        for assignment, task in zip(assignments, tasks):
+            bus.publish('task', property_id=task.property_id, task_id=task.id, room_id=assignment.room_id,
+                        room_number=assignment.room_number, floor=assignment.floor,
+                        housekeeper_id=assignment.housekeeper_id, status='pending')
+            bus.publish('room', property_id=task.property_id, room_id=assignment.room_id,
+                        room_number=assignment.room_number, floor=assignment.floor, status='cleaning')
+
+    names = {member.housekeeper_id: member.name for member in staff}
+    return jsonify({
+        'dry_run': dry_run,
+        'assignments': [get_assignment_data(assignment, names) for assignment in assignments],
+        'unassigned': [{'room_id': c.room_id, 'room_number': c.room_number} for c in unassigned],
+        # Planned rooms that changed state before they could be claimed
+        'skipped': [{'room_id': a.room_id, 'room_number': a.room_number} for a in skipped],
+        'planning_ms': round(planning_ms, 2),
+    }), 200 if dry_run else 201
+
+# Automatically assign every checked-out room; {"dry_run": true} only returns the plan
+# Optional "housekeeper_ids" limits dispatch to the staff on shift
+@api.route('/dispatch/run', methods=['POST'])
+def dispatch_run():
+    data = request.get_json(silent=True) or {}
+    housekeeper_ids = data.get('housekeeper_ids')
+    if housekeeper_ids is not None and not (
+        isinstance(housekeeper_ids, list) and all(isinstance(i, int) for i in housekeeper_ids)
+    ):
+        return jsonify({'error': 'housekeeper_ids must be a list of integers'}), 400
+    return run_dispatcher(bool(data.get('dry_run', False)), housekeeper_ids)
+
+# Preview what /dispatch/run would assign, without changing anything
+@api.route('/dispatch/preview', methods=['GET'])
+def dispatch_preview():
+    housekeeper_ids = request.args.get('housekeeper_ids')
+    try:
+        housekeeper_ids = [int(i) for i in housekeeper_ids.split(',')] if housekeeper_ids else None
+    except ValueError:
+        return jsonify({'error': 'housekeeper_ids must be a comma separated list of integers'}), 400
+    return run_dispatcher(True, housekeeper_ids)
+
+def parse_report_range():
+    """Helper function to read ?start=&end= for reports (default: the last 7 days)."""
+    end = parse_datetime_arg('end') or datetime.utcnow()
+    start = parse_datetime_arg('start') or end - timedelta(days=7)
+    if start >= end:
+        raise ValueError('start must be before end')
+    return start, end
+
+# Room turnaround (checkout -> clean) per day or ?granularity=hour, with p50/p90
+@api.route('/reports/turnaround', methods=['GET'])
+def report_turnaround():
+    granularity = request.args.get('granularity', 'day')
+    if granularity not in analytics.GRANULARITIES:
+        return jsonify({'error': f'Invalid granularity: {granularity}'}), 400
+    try:
+        start, end = parse_report_range()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    report = analytics.turnaround_report(start, end, granularity)
+    return jsonify(dict(start=start.isoformat(), end=end.isoformat(), **report))
+
+# Cleaning time and turnaround per housekeeper
+@api.route('/reports/housekeepers', methods=['GET'])
+def report_housekeepers():
+    try:
+        start, end = parse_report_range()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    output = analytics.housekeeper_report(start, end)
+    names = dict(db.session.query(Housekeeper.id, Housekeeper.name).filter(
+        Housekeeper.id.in_([row['housekeeper_id'] for row in output])
+    ).all())
+    for row in output:
+        row['name'] = names.get(row['housekeeper_id'])
+    return jsonify({'start': start.isoformat(), 'end': end.isoformat(), 'housekeepers': output})
+
+# p50/p90 per floor for ?metric=turnaround (default) or cleaning
+@api.route('/reports/floors', methods=['GET'])
+def report_floors():
+    metric = request.args.get('metric', 'turnaround')
+    if metric not in ('turnaround', 'cleaning'):
+        return jsonify({'error': f'Invalid metric: {metric}'}), 400
+    try:
+        start, end = parse_report_range()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    output = analytics.floor_report(start, end, metric)
+    return jsonify({'start': start.isoformat(), 'end': end.isoformat(), 'metric': metric, 'floors': output})
+
+# Export checkouts or cleaning tasks as CSV (default), Arrow IPC or Parquet
+# ?format=csv|arrow|parquet, ?start=&end= on scheduled_checkout / completed_at
+@api.route('/exports/<dataset>', methods=['GET'])
+def export_dataset(dataset):
+    fmt = request.args.get('format', 'csv')
+    try:
+        start = parse_datetime_arg('start')
+        end = parse_datetime_arg('end')
+        pieces = export.stream(dataset, fmt, start, end)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except export.MissingDependency as e:
+        return jsonify({'error': str(e)}), 501
+
+    mimetype, extension = export.FORMATS[fmt]
+    # No Content-Length: the body is sent with chunked transfer encoding as rows are read
+    response = Response(stream_with_context(pieces), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename={dataset}.{extension}'
+    return response
+
+# Stream change events (Server-Sent Events)
+# Filters: ?floor=, ?room_id=, ?housekeeper_id=. Resume with the Last-Event-ID header or ?since=<seq>
+@api.route('/events', methods=['GET'])
+def stream_events():
+    try:
+        room_id = parse_int_arg('room_id')
+        housekeeper_id = parse_int_arg('housekeeper_id')
+        since = parse_int_arg('since')
+        last_event_id = parse_event_id(request.headers.get('Last-Event-ID'))
+        if last_event_id is not None:
+            since = last_event_id
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    subscription, backlog, complete = bus.subscribe(
+        since=since,
+        property_id=current_property_id(),
+        floor=request.args.get('floor') or None,
+        room_id=room_id,
+        housekeeper_id=housekeeper_id,
+    )
+
+    def generate():
+        try:
+            yield 'retry: 3000\n\n'
+            if not complete:
+                # Missed events are no longer in history: the client must reload GET /rooms
+                yield format_resync(bus.last_seq)
+            for event in backlog:
+                yield format_event(event)
+            while not subscription.overflowed:
+                event = subscription.get(timeout=EVENT_KEEPALIVE_SECONDS)
+                yield format_event(event) if event else ': keepalive\n\n'
+            yield format_resync(bus.last_seq)
+        finally:
+            subscription.close()
+
+    response = Response(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # Disable nginx response buffering
+    return response
+
+# --- Offline Sync ---
+
+def get_sync_room_data(room):
+    """Helper function to format a room for handsets: no history, plus its sync version."""
+    return dict(get_room_summary_data((room.id, room.room_number, room.status, room.last_cleaned)),
+                version=room.sync_version)
+
+def get_sync_data(delta):
+    """Helper function to format a sync.pull() result."""
+    return {
+        'version': delta['version'],
+        'reset': delta['reset'],
+        'has_more': delta['has_more'],
+        'rooms': [get_sync_room_data(room) for room in delta['rooms']],
+        'cleaning_tasks': [get_cleaning_task_data(task) for task in delta['cleaning_tasks']],
+        'deleted': delta['deleted'],
+    }
+
+def wait_for_sync_change(since, seconds):
+    """Helper function to block until the current property's sync version passes `since`, or `seconds` pass."""
+    subscription, _, _ = bus.subscribe(property_id=current_property_id())
+    try:
+        deadline = time.monotonic() + seconds
+        while True:
+            version = sync.current_version()
+            db.session.rollback()  # End the read transaction so the next read sees later commits
+            remaining = deadline - time.monotonic()
+            if version > since or remaining <= 0:
+                return
+            subscription.get(timeout=min(remaining, SYNC_WAIT_POLL_SECONDS))
+    finally:
+        subscription.close()
+
+# Pull what changed since ?since=<version> (0 or absent: a full snapshot)
+# ?housekeeper_id= limits tasks to one housekeeper's; ?limit= change log entries per page
+# ?wait=<seconds> long-polls until something changed after `since` (at most MAX_SYNC_WAIT_SECONDS)
+@api.route('/sync', methods=['GET'])
+def sync_pull():
+    try:
+        since = parse_int_arg('since') or 0
+        limit = parse_int_arg('limit') or sync.DEFAULT_PULL_LIMIT
+        wait = parse_int_arg('wait')
+        if wait and since:
+            wait_for_sync_change(since, min(wait, MAX_SYNC_WAIT_SECONDS))
+        delta = sync.pull(since, limit, parse_int_arg('housekeeper_id'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(get_sync_data(delta))
+
+# Push a handset's queued offline changes in one transaction
+# Body: {housekeeper_id, base_version, since, changes: [{op_id, type, task_id|room_id, status, at, base_version}]}
+# Returns a result per change, then the changes since `since` so the handset is current in one round trip
+@api.route('/sync', methods=['POST'])
+def sync_push():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Body must be a JSON object'}), 400
+    housekeeper_id = data.get('housekeeper_id')
+    base_version = data.get('base_version', 0)
+    since = data.get('since', base_version)
+    if not all(isinstance(value, int) for value in (base_version, since)) or \
+            not isinstance(housekeeper_id, (int, type(None))):
+        return jsonify({'error': 'housekeeper_id, base_version and since must be integers'}), 400
+    try:
+        results, rooms, tasks = sync.apply_batch(data.get('changes'), base_version, housekeeper_id)
+    except sync.SyncError as e:
+        return jsonify({'error': str(e)}), 400
+    db.session.commit()
+    for room in rooms:
+        publish_room_change(room)
+    for room in {room.id: room for room in rooms + [task.room for task in tasks]}.values():
+        cache_room(room)
+    for task in tasks:
+        publish_task_change(task)
+    return jsonify(dict(get_sync_data(sync.pull(since, housekeeper_id=housekeeper_id)), results=results))
+
+# --- Properties ---
+
+def get_property_data(hotel):
+    """Helper function to format property data for API responses."""
+    return {'id': hotel.id, 'code': hotel.code, 'name': hotel.name}
+
+# List the properties served by this deployment
+@api.route('/properties', methods=['GET'])
+def get_properties():
+    return jsonify([get_property_data(p) for p in Property.query.order_by(Property.id)])
+
+# Add a property; its routes are then available under /properties/<code>/...
+@api.route('/properties', methods=['POST'])
+def create_property():
+    data = request.get_json()
+    code = data.get('code', '')
+    name = data.get('name')
+    if not tenancy.CODE_PATTERN.match(code) or not name:
+        return jsonify({'error': 'code (lowercase letters, digits and dashes, up to 20) and name are required'}), 400
+    if Property.query.filter_by(code=code).first():
+        return jsonify({'error': f'Property {code} already exists'}), 409
+    hotel = Property(code=code, name=name)
+    db.session.add(hotel)
+    db.session.commit()
+    return jsonify(get_property_data(hotel)), 201
+
 # --- Database Initialization ---
 
-@app.before_first_request
-def create_tables():
-    """Create database tables before the first request."""
-    with app.app_context():
-        db.create_all()
-        #Check if there are rooms, if not add default
-        if not Room.query.first():
-            for i in range(1, 11):  # Create 10 rooms for example
-                room = Room(room_number=f"10{i}")
-                db.session.add(room)
+def init_db():
+    """Validate the database profile and apply pending migrations. Returns (settings, applied revisions)."""
+    settings = db_profiles.validate(db.engine, current_app.config)  # Fail fast on a misconfigured database
+    return settings, migrate.upgrade(db.engine)  # Versioned migrations (see migrations/) in place of db.create_all()
+
+def seed_db():
+    """Add example rooms and housekeepers to an empty property. Returns True if anything was added."""
+    added = False
+    #Check if there are rooms, if not add default
+    if not Room.query.first():
+        for i in range(1, 11):  # Create 10 rooms for example
+            db.session.add(Room(room_number=f"10{i}"))
+        added = True
+    if not Housekeeper.query.first():
+        db.session.add(Housekeeper(name="Alice"))
+        db.session.add(Housekeeper(name="Bob"))
+        added = True
+    db.session.commit()
+    return added
+
+@api.cli.command('init-db')
+@click.option('--seed', is_flag=True, help='Also add example rooms and housekeepers to an empty database')
+def init_db_command(seed):
+    """Validate the database and bring its schema up to date; run once per deploy, before starting workers."""
+    try:
+        settings, applied = init_db()
+    except db_profiles.DatabaseConfigError as error:
+        raise click.ClickException(str(error))
+    print(f"Database profile: {', '.join(f'{key}={value}' for key, value in settings.items())}")
+    print(f"Applied migrations: {', '.join(applied) if applied else 'none'}")
+    if current_app.config['PROPERTY_PARTITIONING']:
+        for hotel in tenancy.registry.all():  # Opening a partition migrates it
+            print(f'Property {hotel.code}: up to date')
+    if seed:
+        print('Added example data' if seed_db() else 'Database already has data; nothing seeded')
+
+@api.cli.command('seed')
+def seed_command():
+    """Add example rooms and housekeepers to an empty database."""
+    print('Added example data' if seed_db() else 'Database already has data; nothing seeded')
+
+# --- Readiness ---
+
+def warm_up():
+    """Do this process's one-time work before it takes traffic, and report whether it is ready.
+
+    Checks the database profile and that the schema is at the latest
+    migration, then loads the default property's room board into the room
+    cache. Steps that succeeded are not repeated; a failed one is retried on
+    the next call.
+    """
+    warm, lock = current_app.extensions['warm_up']
+    with lock:
+        try:
+            if 'database' not in warm:
+                warm['database'] = db_profiles.validate(db.engine, current_app.config)['profile']
+            if 'schema' not in warm:
+                head = migrate.load_migrations()[-1].revision
+                current = migrate.current_revision(db.engine)
+                if current != head:
+                    raise db_profiles.DatabaseConfigError(
+                        f'Schema is at {current or "nothing"}, expected {head}; run flask init-db')
+                warm['schema'] = current
+            if 'room_board' not in warm:
+                with tenancy.use_property(tenancy.registry.default()):
+                    version, _ = room_cache.board('full', load_room_board, encode_room_board)
+                warm['room_board'] = version
+        except (db_profiles.DatabaseConfigError, SQLAlchemyError) as error:
+            db.session.rollback()
+            return {'ready': False, 'warm': dict(warm), 'error': str(error)}
+        return {'ready': True, 'warm': dict(warm)}
+
+# Readiness probe: 503 until this worker has warmed up (the first call does it)
+@api.route('/ready', methods=['GET'])
+def ready():
+    report = warm_up()
+    return jsonify(report), 200 if report['ready'] else 503
+
+@api.cli.command('db-upgrade')
+def db_upgrade():
+    """Apply pending schema migrations."""
+    applied = migrate.upgrade(db.engine)
+    print(f"Applied migrations: {', '.join(applied) if applied else 'none'}")
+    if current_app.config['PROPERTY_PARTITIONING']:
+        for hotel in tenancy.registry.all():  # Opening a partition migrates it
+            print(f'Property {hotel.code}: up to date')
+
+@api.cli.command('db-check')
+def db_check():
+    """Validate the database profile and print the live settings."""
+    try:
+        settings = db_profiles.validate(db.engine, current_app.config)
+    except db_profiles.DatabaseConfigError as error:
+        raise click.ClickException(str(error))
+    for key, value in settings.items():
+        print(f'{key}: {value}')
+
+@api.cli.command('rollups-rebuild')
+@click.option('--since', help='ISO date to rebuild from (default: start of yesterday)')
+@click.option('--until', help='ISO date to rebuild up to (default: now)')
+def rollups_rebuild(since, until):
+    """Recompute report rollups from raw checkouts and cleaning tasks."""
+    until = datetime.fromisoformat(until) if until else datetime.utcnow()
+    since = datetime.fromisoformat(since) if since else analytics.bucket_start(until, 'day') - timedelta(days=1)
+    for hotel in tenancy.registry.all():
+        with tenancy.use_property(hotel):
+            buckets = analytics.rebuild(since, until)
+            db.session.commit()
+        print(f'{hotel.code}: rebuilt {buckets} rollup buckets from {since.isoformat()} to {until.isoformat()}')
+
+@api.cli.command('workload-rebuild')
+def workload_rebuild():
+    """Recount every housekeeper's open and in progress tasks."""
+    for hotel in tenancy.registry.all():
+        with tenancy.use_property(hotel):
+            fixed = workload.rebuild()
+            db.session.commit()
+        print(f'{hotel.code}: corrected the task counts of {fixed} housekeepers')
+
+@api.cli.command('sync-prune')
+@click.option('--days', type=int, default=30, help='Keep this many days of changes')
+def sync_prune(days):
+    """Delete old sync change log entries; handsets further behind get a full snapshot."""
+    before = datetime.utcnow() - timedelta(days=days)
+    for hotel in tenancy.registry.all():
+        with tenancy.use_property(hotel):
+            deleted = sync.prune(before)
             db.session.commit()
-        if not Housekeeper.query.first():
-            h1 = Housekeeper(name="Alice")
-            h2 = Housekeeper(name="Bob")
-            db.session.add(h1)
-            db.session.add(h2)
+        print(f'{hotel.code}: pruned {deleted} change log entries before {before.isoformat()}')
+
+@api.cli.command('history-compact')
+@click.option('--days', type=int, help='Keep this many days of room events (default: HISTORY_RETENTION_DAYS)')
+@click.option('--snapshot-days', type=int, help='Keep this many days of daily snapshots (default: HISTORY_SNAPSHOT_DAYS)')
+def history_compact(days, snapshot_days):
+    """Snapshot room history daily and delete the events and snapshots the retention periods no longer need."""
+    days = current_app.config['HISTORY_RETENTION_DAYS'] if days is None else days
+    snapshot_days = current_app.config['HISTORY_SNAPSHOT_DAYS'] if snapshot_days is None else snapshot_days
+    if snapshot_days < days:
+        raise click.BadParameter('must be at least --days', param_hint='--snapshot-days')
+    now = datetime.utcnow()
+    for hotel in tenancy.registry.all():
+        with tenancy.use_property(hotel):
+            written, events, snapshots = history.compact(now, days, snapshot_days)
             db.session.commit()
+        print(f'{hotel.code}: wrote {written} snapshot rows, deleted {events} events and {snapshots} snapshot rows')
+
+@api.cli.command('outbox-worker')
+def outbox_worker():
+    """Deliver queued PMS messages until stopped (Ctrl-C or SIGTERM)."""
+    if not current_app.config['PMS_ADAPTER']:
+        raise click.ClickException('Set PMS_URL or PMS_ADAPTER to deliver outbox messages')
+    worker = outbox.OutboxWorker(current_app._get_current_object())
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, worker.stop)
+        await worker.run()
+
+    print(f"Delivering outbox messages with the {current_app.config['PMS_ADAPTER']} adapter")
+    asyncio.run(main())
+
+@api.cli.command('outbox-status')
+@click.option('--retry-failed', is_flag=True, help='Queue failed messages again')
+@click.option('--prune-days', type=int, help='Delete messages sent more than this many days ago')
+def outbox_status(retry_failed, prune_days):
+    """Show queued PMS messages per property."""
+    for hotel in tenancy.registry.all():
+        with tenancy.use_property(hotel):
+            if retry_failed:
+                print(f'{hotel.code}: requeued {outbox.retry_failed()} failed messages')
+            if prune_days is not None:
+                pruned = outbox.prune(datetime.utcnow() - timedelta(days=prune_days))
+                print(f'{hotel.code}: pruned {pruned} sent messages')
+            db.session.commit()
+            counts, oldest = outbox.status_counts()
+        lag = f', oldest pending {oldest.total_seconds():.0f}s' if oldest else ''
+        print(f"{hotel.code}: {', '.join(f'{n} {status}' for status, n in sorted(counts.items())) or 'empty'}{lag}")
+
+@api.cli.command('export')
+@click.argument('dataset', type=click.Choice(sorted(export.DATASETS)))
+@click.option('--format', 'fmt', type=click.Choice(sorted(export.FORMATS)), default='csv')
+@click.option('--start', help='ISO datetime, inclusive')
+@click.option('--end', help='ISO datetime, exclusive')
+@click.option('--out', type=click.File('wb'), default='-', help='Output file (default: stdout)')
+@click.option('--property', 'property_code', help='Property code (default: the default property)')
+def export_command(dataset, fmt, start, end, out, property_code):
+    """Stream a dataset export to a file."""
+    start = datetime.fromisoformat(start) if start else None
+    end = datetime.fromisoformat(end) if end else None
+    hotel = tenancy.registry.get(property_code) if property_code else tenancy.registry.default()
+    if hotel is None:
+        raise click.ClickException(f'Property {property_code} not found')
+    with tenancy.use_property(hotel):
+        for piece in export.stream(dataset, fmt, start, end):
+            out.write(piece.encode() if isinstance(piece, str) else piece)
+
+# --- Application ---
+
+def create_app(config=None):
+    """Build the app from the environment, with `config` overriding it (e.g. for tests).
+
+    Nothing here connects to the database: engines connect on first use,
+    `flask init-db` migrates the schema once per deploy, and GET /ready warms
+    a worker up before it takes traffic.
+    """
+    app = Flask(__name__)
+    app.config.update(config or {})
+    # DATABASE_URL (default sqlite:///hotel.db); pool and timeouts per db_profiles.DEFAULTS
+    db_profiles.configure(app, app.config.get('DATABASE_URL'))
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False  # To suppress a warning
+    app.config.setdefault('ROOM_CACHE_REDIS_URL', os.environ.get('ROOM_CACHE_REDIS_URL'))  # Share the room cache version between workers
+    app.config.setdefault('LATE_CHECKOUT_POLICY', {})  # Overrides for late_checkout.DEFAULT_POLICY (fee tiers, buffer, budget)
+    app.config.setdefault('SLOW_REQUEST_SECONDS', 0.5)  # Requests slower than this are logged with their SQL
+    app.config.setdefault('PROPERTY_PARTITIONING', os.environ.get('PROPERTY_PARTITIONING') or None)  # None, 'database' or 'schema'
+    app.config.setdefault('PROPERTY_DATABASE_URL', os.environ.get('PROPERTY_DATABASE_URL'))  # e.g. sqlite:///hotel_{code}.db
+    app.config.setdefault('HISTORY_RETENTION_DAYS', int(os.environ.get('HISTORY_RETENTION_DAYS') or 30))  # Room events kept in full
+    app.config.setdefault('HISTORY_SNAPSHOT_DAYS', int(os.environ.get('HISTORY_SNAPSHOT_DAYS') or 730))  # Daily snapshots kept
+    db.init_app(app)  # Initialize SQLAlchemy with the app
+    db_profiles.init_app(app, db)  # WAL pragmas and the writer lock for SQLite
+    tenancy.init_app(app)  # Scopes every request to one property (see tenancy.py)
+    outbox.init_app(app)  # PMS_ADAPTER / PMS_URL; nothing is queued for the PMS without one
+    metrics.init_app(app)  # Per-route latency and SQL counts, exposed at /metrics
+    serializers.init_app(app)  # gzip/brotli for large bodies (COMPRESS_MIN_BYTES)
+    app.extensions['warm_up'] = ({}, threading.Lock())  # What warm_up() has done for this app
+    app.register_blueprint(api)
+    tenancy.add_property_routes(app)  # After every per-property route is defined
+    return app
+
+_app = None
+_app_lock = threading.Lock()
+
+def __getattr__(name):
+    """`app`: the app built from the environment on first use, for `gunicorn app:app` and `from app import app`."""
+    global _app
+    if name != 'app':
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    with _app_lock:
+        if _app is None:
+            _app = create_app()
+    return _app
 
 # --- Main ---
 if __name__ == '__main__':
+    app = create_app()
+    with app.app_context():
+        init_db()  # Deployments run `flask init-db` instead
+        seed_db()
     app.run(debug=True)
@@ -0,0 +1,385 @@
+# backend/asgi.py
+"""ASGI entry point: hot read paths as async handlers, the rest through the Flask app.
+
+    uvicorn asgi:app --app-dir backend --port 5000
+
+The WSGI app in app.py keeps working as before (gunicorn app:app). Under
+ASGI the requests that spend most of their life waiting no longer hold a
+thread each:
+
+- GET /events streams from the event bus on the event loop, so an idle
+  handset costs a socket and a queue instead of a worker thread.
+- GET /sync?since=<version>&wait=<seconds> long-polls on the event loop
+  until the property's version moves past since, then hands the request
+  to Flask to build the delta.
+- GET /rooms (the whole board) and GET /rooms/<id> are answered from the
+  room cache, which is loaded through an async SQLAlchemy session on a miss.
+
+The same paths under /properties/<code>/ are handled too. Every other
+request, including all writes, runs on the Flask app in a pool of
+ASGI_WSGI_THREADS threads (a2wsgi). Both halves share the process's room
+cache and event bus, so a write through Flask reaches async subscribers
+at once. Needs an ASGI server (uvicorn), a2wsgi, greenlet and the
+profile's async driver (aiosqlite or asyncpg).
+"""
+import asyncio
+import os
+import re
+import time
+from collections import defaultdict
+from urllib.parse import parse_qs
+
+from a2wsgi import WSGIMiddleware
+from sqlalchemy.ext.asyncio import AsyncSession
+from werkzeug.datastructures import Accept
+from werkzeug.http import parse_accept_header, parse_etags
+
+import app as wsgi  # The Flask app and its room cache
+import db_profiles
+import metrics
+import serializers
+import sync
+import tenancy
+from events import bus, format_event, format_resync, parse_event_id
+from models import current_property, Checkout, CleaningTask, Room
+
+WSGI_THREADS = int(os.environ.get('ASGI_WSGI_THREADS', 20))  # Flask requests in flight; keep within the DB pool
+PROPERTY_PREFIX = re.compile(r'^/properties/(?P<code>[^/]+)(?P<path>/.*)$')
+
+flask_app = WSGIMiddleware(wsgi.app, workers=WSGI_THREADS)
+
+
+class Request:
+    """The parts of an ASGI HTTP scope the handlers read."""
+
+    def __init__(self, scope, receive):
+        self.scope = scope
+        self.receive = receive
+        self.args = {key: values[-1] for key, values in
+                     parse_qs(scope['query_string'].decode('latin-1'), keep_blank_values=True).items()}
+        self.headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']}
+
+    def int_arg(self, name):
+        """Same rules and message as app.parse_int_arg()."""
+        value = self.args.get(name)
+        if value is None or value == '':
+            return None
+        try:
+            return int(value)
+        except ValueError:
+            raise ValueError(f'Invalid {name}: {value}. Must be an integer')
+
+    def if_none_match(self, etag):
+        """The If-None-Match tag naming any content-coding of `etag`, or None."""
+        return serializers.matching_etag(parse_etags(self.headers.get('if-none-match')), etag)
+
+
+def encode_headers(headers):
+    return [(name.encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+
+
+async def respond(request, send, status, body=b'', headers=(), etag=None):
+    """Send a whole response, compressed like the Flask app's (serializers.init_app)."""
+    headers = list(headers)
+    encoding = None
+    config = wsgi.app.config
+    if status == 200 and len(body) >= config['COMPRESS_MIN_BYTES']:
+        headers.append(('Vary', 'Accept-Encoding'))
+        encoding = serializers.accepted_encoding(parse_accept_header(request.headers.get('accept-encoding'), Accept))
+        if encoding is not None:
+            key = (request.scope['path'], request.scope['query_string'], etag, encoding) if etag else None
+            body = serializers.compressed(wsgi.app, body, encoding, key)
+            headers.append(('Content-Encoding', encoding))
+    if etag is not None:
+        headers.append(('ETag', f'"{serializers.coded_etag(etag, encoding)}"'))
+    headers.append(('Content-Length', str(len(body))))
+    await send({'type': 'http.response.start', 'status': status, 'headers': encode_headers(headers)})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def respond_json(request, send, status, value, headers=(), etag=None):
+    await respond(request, send, status, serializers.dumps(value),
+                  [('Content-Type', 'application/json'), *headers], etag)
+
+
+async def not_modified(send, tag):
+    """304 carrying the client's own tag, i.e. the content-coding it holds."""
+    headers = [('ETag', f'"{tag}"'), ('Vary', 'Accept-Encoding')]
+    await send({'type': 'http.response.start', 'status': 304, 'headers': encode_headers(headers)})
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+# --- Async database access ---
+
+class AsyncEngines:
+    """Async engines: the main database's, plus one per partitioned property."""
+
+    def __init__(self):
+        self._engines = {}
+
+    def get(self, hotel):
+        key = hotel.id if hotel.engine is not None else None  # Shared properties use the main database
+        engine = self._engines.get(key)
+        if engine is None:
+            config = wsgi.app.config
+            url, schema = config['SQLALCHEMY_DATABASE_URI'], None
+            if key is not None:
+                url, schema = tenancy.registry_for(wsgi.app).location(hotel.code)
+            engine = self._engines[key] = db_profiles.create_async_engine(url, config, schema)
+        return engine
+
+    async def dispose(self):
+        for engine in self._engines.values():
+            await engine.dispose()
+        self._engines.clear()
+
+
+engines = AsyncEngines()
+
+
+def session(hotel):
+    """An AsyncSession for a property; PropertyScoped queries are filtered as usual (see tenancy.py)."""
+    return AsyncSession(engines.get(hotel), expire_on_commit=False)
+
+
+async def grouped_by_room(db_session, fields, model, room_ids):
+    groups = defaultdict(list)
+    for chunk in serializers.chunks(room_ids):
+        serializers.group_by_room(fields, await db_session.execute(serializers.children(fields, model, chunk)), groups)
+    return groups
+
+
+async def load_rooms(hotel, room_id=None):
+    """Full room rows (serializers.ROOM_FIELDS plus checkouts and tasks), of one room or all."""
+    statement = serializers.select(serializers.ROOM_FIELDS).order_by(Room.id)
+    if room_id is not None:
+        statement = statement.where(Room.id == room_id)
+    async with session(hotel) as db_session:
+        rows = serializers.rows(serializers.ROOM_FIELDS, await db_session.execute(statement))
+        room_ids = [row['id'] for row in rows]
+        return serializers.attach_children(
+            rows,
+            await grouped_by_room(db_session, serializers.CHECKOUT_FIELDS, Checkout, room_ids),
+            await grouped_by_room(db_session, serializers.CLEANING_TASK_FIELDS, CleaningTask, room_ids),
+        )
+
+
+async def current_version(hotel):
+    """sync.current_version() for the async side."""
+    async with session(hotel) as db_session:
+        result = await db_session.execute(sync.VISIBLE_VERSION, sync.visible_version_params(hotel.id))
+        return result.scalar() or 0
+
+
+# --- Handlers ---
+# Each returns None once it has responded, or the scope to hand on to the Flask app.
+
+async def get_rooms(request, hotel, send):
+    view = request.args.get('view', 'full')
+    if view not in ('full', 'summary') or request.args.keys() - {'view'}:
+        return request.scope  # Filtered, paged or invalid: not served from the cache
+    cache = wsgi.room_cache.get(wsgi.app)
+    version = cache.version()
+    tag = request.if_none_match(wsgi.room_etag(version))
+    if tag is not None:
+        return await not_modified(send, tag)
+    version, body = cache.cached_board(view, wsgi.encode_room_board)
+    if body is None:
+        rooms = {row['id']: row for row in await load_rooms(hotel)}
+        if cache.fill(version, rooms):
+            version, body = cache.cached_board(view, wsgi.encode_room_board)
+        if body is None:  # A write came in while loading; serve what was read without caching it
+            body = wsgi.encode_room_board(view, rooms)
+    await respond(request, send, 200, body, [('Content-Type', 'application/json'), ('Cache-Control', 'no-cache')],
+                  etag=wsgi.room_etag(version))
+
+
+async def get_room(request, hotel, send, room_id):
+    room_id = int(room_id)
+    board_version, data = wsgi.room_cache.get(wsgi.app).room(room_id)
+    if data is None:
+        found = await load_rooms(hotel, room_id)
+        if not found:
+            return await respond_json(request, send, 404, {'error': f'Room {room_id} not found'})
+        data = found[0]
+    etag = wsgi.room_detail_etag(room_id, data['version'], board_version)
+    tag = request.if_none_match(etag)
+    if tag is not None:
+        return await not_modified(send, tag)
+    await respond_json(request, send, 200, data, [('Cache-Control', 'no-cache')], etag=etag)
+
+
+async def wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def stream_events(request, hotel, send):
+    try:
+        room_id = request.int_arg('room_id')
+        housekeeper_id = request.int_arg('housekeeper_id')
+        since = request.int_arg('since')
+        last_event_id = parse_event_id(request.headers.get('last-event-id'))
+        if last_event_id is not None:
+            since = last_event_id
+    except ValueError as e:
+        return await respond_json(request, send, 400, {'error': str(e)})
+
+    subscription, backlog, complete = bus.subscribe(
+        since=since,
+        loop=asyncio.get_running_loop(),
+        property_id=hotel.id,
+        floor=request.args.get('floor') or None,
+        room_id=room_id,
+        housekeeper_id=housekeeper_id,
+    )
+    disconnected = asyncio.ensure_future(wait_for_disconnect(request.receive))
+    next_event = None
+
+    async def write(text):
+        await send({'type': 'http.response.body', 'body': text.encode(), 'more_body': True})
+
+    try:
+        await send({'type': 'http.response.start', 'status': 200, 'headers': encode_headers([
+            ('Content-Type', 'text/event-stream; charset=utf-8'),
+            ('Cache-Control', 'no-cache'),
+            ('X-Accel-Buffering', 'no'),
+        ])})
+        await write('retry: 3000\n\n')
+        if not complete:
+            await write(format_resync(bus.last_seq))
+        for event in backlog:
+            await write(format_event(event))
+        while not subscription.overflowed:
+            if next_event is None:
+                next_event = asyncio.ensure_future(subscription.get())
+            done, _ = await asyncio.wait((next_event, disconnected), timeout=wsgi.EVENT_KEEPALIVE_SECONDS,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if disconnected in done:
+                return
+            if next_event in done:
+                await write(format_event(next_event.result()))
+                next_event = None
+            else:
+                await write(': keepalive\n\n')
+        await write(format_resync(bus.last_seq))
+        await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        for task in (next_event, disconnected):
+            if task is not None:
+                task.cancel()
+        subscription.close()
+
+
+async def sync_pull(request, hotel, send):
+    try:
+        since = request.int_arg('since') or 0
+        wait = request.int_arg('wait')
+    except ValueError:
+        return request.scope  # Flask reports the error
+    if not wait or not since:
+        return request.scope
+    loop = asyncio.get_running_loop()
+    subscription, _, _ = bus.subscribe(loop=loop, property_id=hotel.id)  # Before reading, so no change is missed
+    try:
+        deadline = loop.time() + min(wait, wsgi.MAX_SYNC_WAIT_SECONDS)
+        while await current_version(hotel) <= since:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                await asyncio.wait_for(subscription.get(), min(remaining, wsgi.SYNC_WAIT_POLL_SECONDS))
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        subscription.close()
+    # Flask builds the delta; without ?wait it does not wait again on a thread
+    query = '&'.join(part for part in request.scope['query_string'].decode('latin-1').split('&')
+                     if part.split('=', 1)[0] != 'wait')
+    return dict(request.scope, query_string=query.encode('latin-1'))
+
+
+ROUTES = (
+    (re.compile(r'^/rooms$'), '/rooms', get_rooms),
+    (re.compile(r'^/rooms/(?P<room_id>\d+)$'), '/rooms/<int:room_id>', get_room),
+    (re.compile(r'^/events$'), '/events', stream_events),
+    (re.compile(r'^/sync$'), '/sync', sync_pull),
+)
+
+
+def match(path):
+    """(handler, rule, property code or None, path parameters) for an async GET route, else None."""
+    code = None
+    prefixed = PROPERTY_PREFIX.match(path)
+    if prefixed:
+        code, path = prefixed.group('code'), prefixed.group('path')
+    for pattern, rule, handler in ROUTES:
+        found = pattern.match(path)
+        if found:
+            rule = tenancy.URL_PREFIX + rule if code else rule  # Same route labels as Flask's metrics
+            return handler, rule, code, found.groupdict()
+    return None
+
+
+def run_in_app(function, *args):
+    with wsgi.app.app_context():
+        return function(*args)
+
+
+async def find_property(code):
+    """The property a request is for; the catalog is only queried (on a thread) the first time."""
+    registry = tenancy.registry_for(wsgi.app)
+    hotel = registry.cached(code)
+    if hotel is None:
+        if code:
+            hotel = await asyncio.to_thread(run_in_app, registry.get, code)
+        else:
+            hotel = await asyncio.to_thread(run_in_app, registry.default)
+    return hotel
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            try:
+                # The same warm-up as GET /ready, so the first request finds a loaded room cache
+                report = await asyncio.to_thread(run_in_app, wsgi.warm_up)
+            except Exception as error:
+                await send({'type': 'lifespan.startup.failed', 'message': str(error)})
+                return
+            if not report['ready']:
+                wsgi.app.logger.warning('Not ready yet: %s', report['error'])  # GET /ready answers 503 meanwhile
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await engines.dispose()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    route = match(scope['path']) if scope['type'] == 'http' and scope['method'] == 'GET' else None
+    if route is None:
+        return await flask_app(scope, receive, send)
+
+    handler, rule, code, params = route
+    started = time.perf_counter()
+
+    async def send_and_record(message):
+        if message['type'] == 'http.response.start':
+            metrics.observe_request('GET', rule, message['status'], time.perf_counter() - started)
+        await send(message)
+
+    request = Request(scope, receive)
+    hotel = await find_property(code)
+    if hotel is None:
+        return await respond_json(request, send_and_record, 404, {'error': f'Property {code} not found'})
+    token = current_property.set(hotel)
+    try:
+        scope = await handler(request, hotel, send_and_record, **params)
+    finally:
+        current_property.reset(token)
+    if scope is not None:
+        await flask_app(scope, receive, send)
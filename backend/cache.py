@@ -0,0 +1,161 @@
+# backend/cache.py
+"""Process-level cache of the serialized room board.
+
+The cache keeps every room's serialized dict plus the encoded GET /rooms
+bodies, tagged with a version number. Writers update the room they changed
+(write-through) and bump the version; the version doubles as the ETag so
+pollers can be answered with 304 Not Modified without touching the
+database.
+
+The version lives in a version store. LocalVersionStore keeps it in the
+process; RedisVersionStore shares it between gunicorn workers, so a write
+in one worker makes every other worker drop its copy on the next read.
+"""
+import threading
+import time
+
+
+class LocalVersionStore:
+    """Version counter for a single process (also the stand-in for tests)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Start from the clock so a restarted process never reissues an ETag from its previous life
+        self._version = int(time.time() * 1000)
+
+    def get(self):
+        return self._version
+
+    def incr(self):
+        with self._lock:
+            self._version += 1
+            return self._version
+
+
+class RedisVersionStore:
+    """Version counter shared through Redis. Requires the redis package."""
+
+    def __init__(self, url, key='pms:rooms:version'):
+        import redis  # Optional dependency, only needed for multi-worker deployments
+        self._client = redis.Redis.from_url(url)
+        self._key = key
+
+    def get(self):
+        return int(self._client.get(self._key) or 0)
+
+    def incr(self):
+        return int(self._client.incr(self._key))
+
+
+class RoomCache:
+    """Serialized room board with write-through updates."""
+
+    def __init__(self, store=None):
+        self.store = store or LocalVersionStore()
+        self._lock = threading.Lock()
+        self._version = None  # Store version our entries belong to
+        self._rooms = None  # {room_id: room dict}, None while cold
+        self._bodies = {}  # view -> encoded GET /rooms body
+
+    def version(self):
+        return self.store.get()
+
+    def _sync(self):
+        """Drop local entries if another process bumped the version. Call with the lock held."""
+        version = self.store.get()
+        if version != self._version:
+            self._version = version
+            self._rooms = None
+            self._bodies = {}
+        return version
+
+    def board(self, view, load_rooms, encode):
+        """Return (version, body) for a board view, building it on a miss.
+
+        load_rooms() returns {room_id: room dict} from the database and
+        encode(view, rooms) turns those dicts into the response body.
+        """
+        with self._lock:
+            version = self._sync()
+            body = self._bodies.get(view)
+            if body is None:
+                if self._rooms is None:
+                    self._rooms = load_rooms()
+                body = self._bodies[view] = encode(view, self._rooms)
+            return version, body
+
+    def cached_board(self, view, encode):
+        """Return (version, body), or (version, None) while the rooms are not loaded. Never loads them.
+
+        For callers that load rooms themselves (asynchronously) and hand them to fill().
+        """
+        with self._lock:
+            version = self._sync()
+            if self._rooms is None:
+                return version, None
+            body = self._bodies.get(view)
+            if body is None:
+                body = self._bodies[view] = encode(view, self._rooms)
+            return version, body
+
+    def fill(self, version, rooms):
+        """Store rooms loaded while the cache was at `version`. Returns False if a write came in since."""
+        with self._lock:
+            if self._sync() != version:
+                return False
+            if self._rooms is None:
+                self._rooms = rooms
+            return True
+
+    def room(self, room_id):
+        """Return (version, room dict or None if not cached)."""
+        with self._lock:
+            version = self._sync()
+            return version, self._rooms.get(room_id) if self._rooms is not None else None
+
+    def write_through(self, room_id, load_room):
+        """Store a changed room and publish a new version. Returns the cache version.
+
+        load_room(room_id) serializes the committed row. It runs before the
+        lock is taken, so board reads never wait on the database; under the
+        lock the row only replaces an older version of itself. Every change
+        to a room, or to the checkouts and tasks serialized with it, gives
+        it a new version (see sync.touch), so a writer that finishes late
+        never overwrites a newer row, and one that read what is already
+        cached publishes nothing.
+        """
+        room_data = load_room(room_id)
+        with self._lock:
+            previous = self._sync()
+            cached = self._rooms.get(room_id) if self._rooms is not None else None
+            if room_data is not None and cached is not None and (
+                    room_data == cached or room_data['version'] < cached['version']):
+                return previous
+            version = self.store.incr()
+            if (self._rooms is not None and version == previous + 1 and room_data is not None
+                    and (cached is None or room_data['version'] > cached['version'])):
+                self._rooms[room_id] = room_data
+            else:
+                self._rooms = None  # Someone else wrote in between, or a row we cannot order; reload on next read
+            self._version = version
+            self._bodies = {}
+            return version
+
+    def invalidate(self):
+        """Drop everything, e.g. after a bulk update touching many rooms."""
+        with self._lock:
+            self._version = self.store.incr()
+            self._rooms = None
+            self._bodies = {}
+            return self._version
+
+
+def create_room_cache(redis_url=None, namespace=None):
+    """Build the room cache, shared through Redis when a URL is configured.
+
+    namespace keeps the versions of several caches (one per property) apart in Redis.
+    """
+    if not redis_url:
+        return RoomCache(LocalVersionStore())
+    key = f'pms:{namespace}:rooms:version' if namespace else 'pms:rooms:version'
+    return RoomCache(RedisVersionStore(redis_url, key))
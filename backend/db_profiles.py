@@ -0,0 +1,214 @@
+# backend/db_profiles.py
+"""Database profiles: engine settings for PostgreSQL and SQLite.
+
+configure() picks the profile from DATABASE_PROFILE, or from the scheme of
+DATABASE_URL, and fills in SQLALCHEMY_ENGINE_OPTIONS before db.init_app():
+
+- postgresql: a sized connection pool with pre-ping and recycling, and a
+  server-side statement_timeout so one runaway query cannot hold a worker.
+- sqlite: WAL journaling (readers never block the writer), synchronous=NORMAL
+  (safe with WAL, no fsync per commit) and a busy timeout. SQLite allows one
+  writer at a time, so init_app() also adds a per-process writer lock taken
+  on a connection's first write statement and released when its
+  transaction ends. Writers then wait their turn in the process instead of
+  spinning on the file lock and failing with "database is locked"; other
+  processes are covered by the busy timeout.
+
+Every setting can be overridden with an environment variable or app config
+key of the same name (see DEFAULTS). validate() checks that the database
+is reachable and that the settings took effect; it runs at startup.
+
+create_async_engine() opens the same database through the profile's
+asyncio driver (asyncpg, aiosqlite) for the ASGI handlers in asgi.py,
+which only read; writes keep going through the Flask app's engine.
+"""
+import os
+import sqlite3
+import threading
+
+from sqlalchemy import event
+from sqlalchemy.exc import DBAPIError
+
+PROFILES = ('postgresql', 'sqlite')
+DEFAULTS = {
+    'DB_POOL_SIZE': 10,  # Connections kept open per process (PostgreSQL)
+    'DB_MAX_OVERFLOW': 10,  # Extra connections allowed under bursts
+    'DB_POOL_TIMEOUT': 10,  # Seconds to wait for a free connection
+    'DB_POOL_RECYCLE': 1800,  # Seconds before a connection is replaced
+    'DB_STATEMENT_TIMEOUT_MS': 5000,  # PostgreSQL statement_timeout; 0 disables it
+    'SQLITE_JOURNAL_MODE': 'WAL',
+    'SQLITE_SYNCHRONOUS': 'NORMAL',
+    'SQLITE_BUSY_TIMEOUT_MS': 5000,  # How long a writer waits for the file lock
+}
+ASYNC_DRIVERS = {'postgresql': 'asyncpg', 'sqlite': 'aiosqlite'}
+MIN_SQLITE_VERSION = (3, 7, 0)  # First release with WAL
+MIN_POSTGRES_VERSION = 120000
+READ_PREFIXES = ('SELECT', 'PRAGMA', 'WITH', 'EXPLAIN')
+
+
+class DatabaseConfigError(Exception):
+    """Raised when the database profile is invalid or the database does not match it."""
+
+
+def profile_for(url):
+    scheme = url.split(':', 1)[0].split('+', 1)[0]
+    if scheme in ('postgresql', 'postgres'):
+        return 'postgresql'
+    if scheme == 'sqlite':
+        return 'sqlite'
+    raise DatabaseConfigError(f'Unsupported database URL scheme: {scheme}')
+
+
+def configure(app, url=None):
+    """Set the database URI and engine options for the chosen profile. Call before db.init_app()."""
+    url = url or os.environ.get('DATABASE_URL', 'sqlite:///hotel.db')
+    if url.startswith('postgres://'):
+        url = 'postgresql://' + url[len('postgres://'):]  # SQLAlchemy only accepts the long scheme
+    for key, default in DEFAULTS.items():
+        app.config.setdefault(key, type(default)(os.environ.get(key, default)))
+    profile = app.config.setdefault('DATABASE_PROFILE', os.environ.get('DATABASE_PROFILE') or profile_for(url))
+    if profile not in PROFILES:
+        raise DatabaseConfigError(f"Invalid DATABASE_PROFILE: {profile} (use {' or '.join(PROFILES)})")
+    if profile_for(url) != profile:
+        raise DatabaseConfigError(f'DATABASE_PROFILE is {profile} but DATABASE_URL is a {profile_for(url)} URL')
+
+    app.config['SQLALCHEMY_DATABASE_URI'] = url
+    if profile == 'postgresql':
+        connect_args = {'application_name': 'hotel-pms'}
+        if app.config['DB_STATEMENT_TIMEOUT_MS']:
+            connect_args['options'] = f"-c statement_timeout={app.config['DB_STATEMENT_TIMEOUT_MS']}"
+        options = {
+            'pool_size': app.config['DB_POOL_SIZE'],
+            'max_overflow': app.config['DB_MAX_OVERFLOW'],
+            'pool_timeout': app.config['DB_POOL_TIMEOUT'],
+            'pool_recycle': app.config['DB_POOL_RECYCLE'],
+            'pool_pre_ping': True,
+            'connect_args': connect_args,
+        }
+    else:
+        options = {'connect_args': {'timeout': app.config['SQLITE_BUSY_TIMEOUT_MS'] / 1000}}
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = dict(options, **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+    return profile
+
+
+# --- SQLite ---
+
+class WriterLock:
+    """One writing transaction per process, handed over when the transaction ends."""
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self._lock = threading.Lock()
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if conn.info.get('pms_writer') or statement.lstrip()[:7].upper().startswith(READ_PREFIXES):
+            return
+        # On timeout, carry on and let SQLite's busy handler decide rather than deadlock
+        conn.info['pms_writer'] = self._lock.acquire(timeout=self.timeout)
+
+    def release(self, info):
+        if info.pop('pms_writer', False):
+            self._lock.release()
+
+    def end_transaction(self, conn):
+        self.release(conn.info)
+
+    def reset(self, dbapi_connection, connection_record, reset_state):
+        self.release(connection_record.info)  # Returned to the pool without an explicit commit/rollback
+
+
+def sqlite_pragmas(config):
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA journal_mode={config['SQLITE_JOURNAL_MODE']}")
+        cursor.execute(f"PRAGMA synchronous={config['SQLITE_SYNCHRONOUS']}")
+        cursor.execute(f"PRAGMA busy_timeout={int(config['SQLITE_BUSY_TIMEOUT_MS'])}")
+        cursor.close()
+    return set_pragmas
+
+
+def install(engine, config):
+    """Attach the profile's connection hooks to an engine."""
+    if config['DATABASE_PROFILE'] != 'sqlite':
+        return
+    event.listen(engine, 'connect', sqlite_pragmas(config))
+    writer = WriterLock(config['SQLITE_BUSY_TIMEOUT_MS'] / 1000)
+    event.listen(engine, 'before_cursor_execute', writer.before_cursor_execute)
+    event.listen(engine, 'commit', writer.end_transaction)
+    event.listen(engine, 'rollback', writer.end_transaction)
+    event.listen(engine, 'reset', writer.reset)
+
+
+def init_app(app, db):
+    """Attach the profile's connection hooks to the app's engine. Call after db.init_app()."""
+    with app.app_context():
+        install(db.engine, app.config)
+
+
+# --- Async engines (ASGI mode) ---
+
+def async_url(url):
+    """The URL with the profile's asyncio driver, e.g. sqlite+aiosqlite:///hotel.db."""
+    scheme, rest = url.split(':', 1)
+    return f"{scheme.split('+', 1)[0]}+{ASYNC_DRIVERS[profile_for(url)]}:{rest}"
+
+
+def create_async_engine(url, config, schema=None):
+    """An asyncio engine for url with the profile's settings. Needs greenlet and the async driver."""
+    from sqlalchemy.ext.asyncio import create_async_engine  # Optional: only the ASGI entry point uses it
+
+    if config['DATABASE_PROFILE'] == 'postgresql':
+        server_settings = {'application_name': 'hotel-pms'}
+        if config['DB_STATEMENT_TIMEOUT_MS']:
+            server_settings['statement_timeout'] = str(config['DB_STATEMENT_TIMEOUT_MS'])
+        if schema:
+            server_settings['search_path'] = schema
+        engine = create_async_engine(
+            async_url(url),
+            pool_size=config['DB_POOL_SIZE'],
+            max_overflow=config['DB_MAX_OVERFLOW'],
+            pool_timeout=config['DB_POOL_TIMEOUT'],
+            pool_recycle=config['DB_POOL_RECYCLE'],
+            pool_pre_ping=True,
+            connect_args={'server_settings': server_settings},
+        )
+    else:
+        engine = create_async_engine(async_url(url),
+                                     connect_args={'timeout': config['SQLITE_BUSY_TIMEOUT_MS'] / 1000})
+        event.listen(engine.sync_engine, 'connect', sqlite_pragmas(config))  # Read-only: no writer lock needed
+    return engine
+
+
+# --- Startup validation ---
+
+def validate(engine, config):
+    """Check the database is reachable and matches the profile. Returns a summary of the live settings."""
+    try:
+        with engine.connect() as conn:
+            if config['DATABASE_PROFILE'] == 'sqlite':
+                if sqlite3.sqlite_version_info < MIN_SQLITE_VERSION:
+                    raise DatabaseConfigError(f'SQLite {sqlite3.sqlite_version} is too old (need 3.7 or later)')
+                settings = {
+                    'version': sqlite3.sqlite_version,
+                    'journal_mode': conn.exec_driver_sql('PRAGMA journal_mode').scalar(),
+                    'synchronous': conn.exec_driver_sql('PRAGMA synchronous').scalar(),
+                    'busy_timeout_ms': conn.exec_driver_sql('PRAGMA busy_timeout').scalar(),
+                }
+                expected = config['SQLITE_JOURNAL_MODE'].lower()
+                if settings['journal_mode'].lower() not in (expected, 'memory'):  # In-memory databases can't use WAL
+                    raise DatabaseConfigError(
+                        f"SQLite journal_mode is {settings['journal_mode']}, expected {expected}"
+                    )
+            else:
+                version = int(conn.exec_driver_sql('SHOW server_version_num').scalar())
+                if version < MIN_POSTGRES_VERSION:
+                    raise DatabaseConfigError(f'PostgreSQL {version} is too old (need 12 or later)')
+                settings = {
+                    'version': version,
+                    'statement_timeout': conn.exec_driver_sql('SHOW statement_timeout').scalar(),
+                    'pool_size': config['DB_POOL_SIZE'],
+                }
+    except DBAPIError as error:
+        raise DatabaseConfigError(f'Cannot use {engine.url.render_as_string(hide_password=True)}: {error.orig}')
+    settings['profile'] = config['DATABASE_PROFILE']
+    return settings
@@ -0,0 +1,178 @@
+# backend/dispatcher.py
+"""Automatic housekeeping dispatcher.
+
+Rooms waiting in ``checked_out`` state are ranked in a heap by how soon
+they are needed: the next arrival's time, pulled forward for VIP arrivals
+and for rooms whose approved late checkout has already eaten into the
+turnaround window. Rooms are then handed out in priority order to the
+least loaded housekeeper, preferring one who already works on the same
+floor when that does not unbalance the load by more than LOCALITY_SLACK.
+
+plan() is pure and works on plain tuples so a full re-plan stays cheap;
+load_candidates() and load_staff() fetch its inputs in a few grouped
+queries.
+"""
+import heapq
+from collections import defaultdict, namedtuple
+from datetime import datetime
+
+from sqlalchemy import func, select, update
+
+import history
+import sync
+from models import db, Room, Checkout, Housekeeper, CleaningTask, Reservation, room_floor
+
+NO_ARRIVAL_MINUTES = 24 * 60  # Rooms with no upcoming arrival rank as if one were due in a day
+VIP_BONUS_MINUTES = 120  # A VIP arrival ranks like a regular one two hours earlier
+LATE_CHECKOUT_BONUS_MINUTES = 60  # An approved late checkout leaves less turnaround time
+LOCALITY_SLACK = 1  # Extra rooms a same-floor housekeeper may carry over the least loaded one
+MAX_ROOMS_PER_HOUSEKEEPER = 16  # Open tasks per housekeeper per shift
+
+Candidate = namedtuple('Candidate', 'room_id room_number floor next_arrival vip late_checkout_time')
+Staff = namedtuple('Staff', 'housekeeper_id name open_tasks floors')
+Assignment = namedtuple('Assignment', 'room_id room_number floor housekeeper_id priority next_arrival vip')
+
+
+def priority(candidate, now):
+    """Minutes until the room is needed, adjusted for VIP and late checkouts. Lower is more urgent."""
+    if candidate.next_arrival is not None:
+        minutes = (candidate.next_arrival - now).total_seconds() / 60
+    else:
+        minutes = NO_ARRIVAL_MINUTES
+    if candidate.vip:
+        minutes -= VIP_BONUS_MINUTES
+    if candidate.late_checkout_time is not None:
+        minutes -= LATE_CHECKOUT_BONUS_MINUTES
+    return minutes
+
+
+def plan(candidates, staff, now=None, max_rooms=MAX_ROOMS_PER_HOUSEKEEPER):
+    """Assign candidate rooms to staff.
+
+    Returns (assignments in priority order, unassigned candidates).
+    """
+    now = now or datetime.utcnow()
+    rooms = [(priority(c, now), c.room_number, c) for c in candidates]
+    heapq.heapify(rooms)
+
+    loads = {}
+    floor_staff = defaultdict(set)
+    load_heap = []  # (load, housekeeper_id); stale entries are skipped lazily
+    for member in staff:
+        loads[member.housekeeper_id] = member.open_tasks
+        for floor in member.floors:
+            floor_staff[floor].add(member.housekeeper_id)
+        if member.open_tasks < max_rooms:
+            load_heap.append((member.open_tasks, member.housekeeper_id))
+    heapq.heapify(load_heap)
+
+    assignments = []
+    unassigned = []
+    while rooms:
+        score, _, candidate = heapq.heappop(rooms)
+        while load_heap and load_heap[0][0] != loads[load_heap[0][1]]:
+            heapq.heappop(load_heap)
+        if not load_heap:
+            unassigned.append(candidate)
+            unassigned.extend(c for _, _, c in sorted(rooms))
+            break
+        least_load, chosen = load_heap[0]
+
+        local = None
+        for housekeeper_id in floor_staff.get(candidate.floor, ()):
+            load = loads[housekeeper_id]
+            if load < max_rooms and (local is None or (load, housekeeper_id) < (loads[local], local)):
+                local = housekeeper_id
+        if local is not None and loads[local] <= least_load + LOCALITY_SLACK:
+            chosen = local
+
+        loads[chosen] += 1
+        floor_staff[candidate.floor].add(chosen)
+        if loads[chosen] < max_rooms:
+            heapq.heappush(load_heap, (loads[chosen], chosen))
+        assignments.append(Assignment(
+            candidate.room_id, candidate.room_number, candidate.floor, chosen,
+            round(score, 1), candidate.next_arrival, candidate.vip
+        ))
+    return assignments, unassigned
+
+
+def load_candidates(now=None):
+    """Checked-out rooms without an open task, with their next arrival and late checkout."""
+    now = now or datetime.utcnow()
+    open_task = select(CleaningTask.id).where(
+        CleaningTask.room_id == Room.id,
+        CleaningTask.status.in_(['pending', 'in_progress'])
+    ).exists()
+    waiting = select(Room.id).where(Room.status == 'checked_out', ~open_task)
+    rooms = db.session.query(Room.id, Room.room_number).filter(Room.id.in_(waiting)).all()
+    if not rooms:
+        return []
+
+    # First upcoming arrival per room; a VIP flag on any arrival at that time counts
+    next_arrival = db.session.query(
+        Reservation.room_id, func.min(Reservation.arrival_time).label('arrival_time')
+    ).filter(Reservation.room_id.in_(waiting), Reservation.arrival_time >= now).group_by(Reservation.room_id).subquery()
+    arrivals = {}
+    for room_id, arrival_time, vip in db.session.query(
+        Reservation.room_id, Reservation.arrival_time, Reservation.vip
+    ).join(next_arrival, (Reservation.room_id == next_arrival.c.room_id)
+           & (Reservation.arrival_time == next_arrival.c.arrival_time)):
+        previous = arrivals.get(room_id)
+        arrivals[room_id] = (arrival_time, bool(vip) or (previous is not None and previous[1]))
+
+    day_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    late = dict(db.session.query(Checkout.room_id, func.max(Checkout.late_checkout_time)).filter(
+        Checkout.room_id.in_(waiting),
+        Checkout.late_checkout_approved.is_(True),
+        Checkout.late_checkout_time >= day_start,
+    ).group_by(Checkout.room_id).all())
+
+    candidates = []
+    for room_id, room_number in rooms:
+        arrival_time, vip = arrivals.get(room_id, (None, False))
+        candidates.append(Candidate(room_id, room_number, room_floor(room_number), arrival_time, vip, late.get(room_id)))
+    return candidates
+
+
+def load_staff(housekeeper_ids=None):
+    """Housekeepers with their open task count and the floors they are working on."""
+    query = db.session.query(Housekeeper.id, Housekeeper.name)
+    if housekeeper_ids:
+        query = query.filter(Housekeeper.id.in_(housekeeper_ids))
+    housekeepers = query.order_by(Housekeeper.id).all()
+
+    open_tasks = defaultdict(int)
+    floors = defaultdict(set)
+    for housekeeper_id, room_number in db.session.query(CleaningTask.housekeeper_id, Room.room_number).join(
+        Room, Room.id == CleaningTask.room_id
+    ).filter(CleaningTask.status.in_(['pending', 'in_progress'])):
+        open_tasks[housekeeper_id] += 1
+        floors[housekeeper_id].add(room_floor(room_number))
+
+    return [Staff(housekeeper_id, name, open_tasks[housekeeper_id], frozenset(floors[housekeeper_id]))
+            for housekeeper_id, name in housekeepers]
+
+
+def apply(assignments):
+    """Claim the planned rooms and create their cleaning tasks. Caller commits.
+
+    Rooms are claimed with a conditional UPDATE (checked_out -> cleaning), so
+    a room that changed state since planning gets no task, version or event.
+    Returns (applied assignments, their tasks, skipped assignments).
+    """
+    room_ids = [a.room_id for a in assignments]
+    claimed = set()
+    for i in range(0, len(room_ids), 500):
+        claimed.update(db.session.execute(
+            update(Room).where(Room.id.in_(room_ids[i:i + 500]), Room.status == 'checked_out')
+            .values(status='cleaning').returning(Room.id),
+            execution_options={'synchronize_session': False},
+        ).scalars())
+    history.record_rooms(claimed, 'cleaning')
+    sync.record(Room, claimed)  # The bulk update bypasses the change log's and history's flush hooks
+    applied = [a for a in assignments if a.room_id in claimed]
+    skipped = [a for a in assignments if a.room_id not in claimed]
+    tasks = [CleaningTask(room_id=a.room_id, housekeeper_id=a.housekeeper_id, status='pending') for a in applied]
+    db.session.add_all(tasks)
+    return applied, tasks, skipped
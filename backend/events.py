@@ -0,0 +1,172 @@
+# backend/events.py
+"""In-process change-event bus for room and cleaning task updates.
+
+Mutating endpoints publish compact delta events after they commit. Each
+event gets a monotonically increasing sequence number and is kept in a
+bounded history, so a subscriber that reconnects with the last sequence it
+saw can replay what it missed before switching to live delivery.
+
+Events are published from request threads. Subscribers read them either
+from a thread (Subscription) or from an asyncio event loop
+(AsyncSubscription, used by the ASGI handlers in asgi.py).
+"""
+import asyncio
+import json
+import queue
+import threading
+import time
+from collections import deque
+
+HISTORY_SIZE = 10000  # Events kept for resuming subscribers
+SUBSCRIBER_QUEUE_SIZE = 1000  # Undelivered events before a slow subscriber is dropped
+
+
+class Subscription:
+    """A subscriber's filtered view of the bus."""
+
+    def __init__(self, bus, property_id=None, floor=None, room_id=None, housekeeper_id=None):
+        self.bus = bus
+        self.property_id = property_id
+        self.floor = floor
+        self.room_id = room_id
+        self.housekeeper_id = housekeeper_id
+        self.queue = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.overflowed = False
+
+    def matches(self, event):
+        if self.property_id is not None and event.get('property_id') != self.property_id:
+            return False
+        if self.floor is not None and event.get('floor') != self.floor:
+            return False
+        if self.room_id is not None and event.get('room_id') != self.room_id:
+            return False
+        if self.housekeeper_id is not None and event.get('housekeeper_id') != self.housekeeper_id:
+            return False
+        return True
+
+    def deliver(self, event):
+        if self.overflowed or not self.matches(event):
+            return
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            # The client has fallen too far behind; it must resync from GET /rooms
+            self.overflowed = True
+
+    def get(self, timeout=None):
+        """Return the next event, or None if nothing arrived within timeout."""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+
+class AsyncSubscription(Subscription):
+    """A subscription read from an event loop; events are handed over from the publishing thread."""
+
+    def __init__(self, bus, loop, **filters):
+        super().__init__(bus, **filters)
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def deliver(self, event):
+        if self.overflowed or not self.matches(event):
+            return
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            pass  # The loop has been closed
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    async def get(self):
+        """Wait for the next event (use asyncio.wait_for() for a timeout)."""
+        return await self.queue.get()
+
+
+class EventBus:
+    """Thread-safe publish/subscribe bus with sequence numbers and replay."""
+
+    def __init__(self, history_size=HISTORY_SIZE):
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._history = deque(maxlen=history_size)
+        self._subscribers = set()
+
+    @property
+    def last_seq(self):
+        return self._seq
+
+    def publish(self, event_type, **fields):
+        """Publish an event. Fields that are None are left out to keep events small."""
+        event = {key: value for key, value in fields.items() if value is not None}
+        event['type'] = event_type
+        event['ts'] = round(time.time(), 3)
+        with self._lock:
+            self._seq += 1
+            event['seq'] = self._seq
+            self._history.append(event)
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.deliver(event)
+        return event
+
+    def subscribe(self, since=None, loop=None, **filters):
+        """Register a subscriber, read from the given event loop if there is one.
+
+        Returns (subscription, backlog, complete). backlog holds the matching
+        events after ``since``; complete is False when some of them have
+        already been dropped from history and the client should resync.
+        """
+        if loop is not None:
+            subscription = AsyncSubscription(self, loop, **filters)
+        else:
+            subscription = Subscription(self, **filters)
+        with self._lock:
+            self._subscribers.add(subscription)
+            if since is None:
+                return subscription, [], True
+            history = list(self._history)
+            last_seq = self._seq
+        if since > last_seq:
+            complete = False  # The process restarted and sequence numbers began again
+        elif not history:
+            complete = since == last_seq
+        else:
+            complete = history[0]['seq'] <= since + 1
+        backlog = [event for event in history if event['seq'] > since and subscription.matches(event)]
+        return subscription, backlog, complete
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+
+def parse_event_id(value):
+    """The sequence number a reconnecting client sent as Last-Event-ID, or None if it sent none."""
+    if not value:
+        return None
+    if not (value.isascii() and value.isdigit()):
+        raise ValueError(f'Invalid Last-Event-ID: {value}. Must be the id of an event from this stream, '
+                         'a non-negative integer')
+    return int(value)
+
+
+def format_event(event):
+    """An event as a Server-Sent Events message."""
+    return f"id: {event['seq']}\nevent: {event['type']}\ndata: {json.dumps(event, separators=(',', ':'))}\n\n"
+
+
+def format_resync(seq):
+    """Tells an SSE client that it missed events and must reload GET /rooms."""
+    return f"event: resync\ndata: {json.dumps({'seq': seq})}\n\n"
+
+
+bus = EventBus()
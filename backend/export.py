@@ -0,0 +1,178 @@
+# backend/export.py
+"""Streaming bulk export of checkouts and cleaning tasks.
+
+Rows are read from SQL in keyset-paginated chunks as plain tuples (no ORM
+objects, no per-row dicts) and encoded chunk by chunk, so memory stays
+flat whatever the date range and the first bytes go out before the query
+has finished.
+
+CSV needs nothing extra. Arrow IPC and Parquet need pyarrow (and numpy),
+which are optional: datetime columns are converted a whole chunk at a
+time through numpy datetime64 arrays.
+"""
+import csv
+import io
+
+from sqlalchemy import select
+
+from models import db, Room, Checkout, CleaningTask
+
+CHUNK_SIZE = 10000
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrows'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+# name -> (model, columns, column the date range applies to)
+DATASETS = {
+    'checkouts': (
+        Checkout,
+        [Checkout.id, Checkout.room_id, Room.room_number, Checkout.scheduled_checkout,
+         Checkout.actual_checkout, Checkout.late_checkout_approved, Checkout.late_checkout_time],
+        Checkout.scheduled_checkout,
+    ),
+    'cleaning_tasks': (
+        CleaningTask,
+        [CleaningTask.id, CleaningTask.room_id, Room.room_number, CleaningTask.housekeeper_id,
+         CleaningTask.status, CleaningTask.started_at, CleaningTask.completed_at],
+        CleaningTask.completed_at,
+    ),
+}
+
+
+class MissingDependency(Exception):
+    """Raised when a format needs an optional package that is not installed."""
+
+
+def column_names(dataset):
+    return [column.key for column in DATASETS[dataset][1]]
+
+
+def iter_chunks(dataset, start=None, end=None, chunk_size=CHUNK_SIZE):
+    """Yield lists of row tuples for a dataset, chunk_size rows at a time."""
+    model, columns, time_column = DATASETS[dataset]
+    id_column = model.id
+    query = select(*columns).join(Room, Room.id == model.room_id)
+    if start is not None:
+        query = query.where(time_column >= start)
+    if end is not None:
+        query = query.where(time_column < end)
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            query.where(id_column > last_id).order_by(id_column).limit(chunk_size)
+        ).all()
+        if not rows:
+            return
+        yield [tuple(row) for row in rows]
+        last_id = rows[-1][0]
+        db.session.rollback()  # Don't hold a read transaction open between chunks
+
+
+def stream_csv(dataset, chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(column_names(dataset))
+    for chunk in chunks:
+        writer.writerows(
+            [value.isoformat() if hasattr(value, 'isoformat') else value for value in row]
+            for row in chunk
+        )
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+class ChunkSink(io.RawIOBase):
+    """Write-only file that hands out what was written since the last drain().
+
+    tell() keeps counting across drains, which Parquet needs for its offsets.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._parts = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+def import_arrow():
+    try:
+        import numpy as np
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise MissingDependency('Arrow and Parquet exports need the pyarrow and numpy packages')
+    return np, pa, pq
+
+
+def arrow_schema(pa, dataset):
+    types = {
+        'id': pa.int64(), 'room_id': pa.int64(), 'housekeeper_id': pa.int64(),
+        'room_number': pa.string(), 'status': pa.string(), 'late_checkout_approved': pa.bool_(),
+    }
+    return pa.schema([(name, types.get(name, pa.timestamp('us'))) for name in column_names(dataset)])
+
+
+def to_record_batch(np, pa, schema, chunk):
+    """Convert a chunk of row tuples to an Arrow record batch, one column at a time."""
+    arrays = []
+    for index, column in enumerate(zip(*chunk)):
+        field = schema.field(index)
+        if pa.types.is_timestamp(field.type):
+            # Whole-column conversion; None becomes NaT and then null
+            values = np.array(column, dtype='datetime64[us]')
+            arrays.append(pa.array(values, type=field.type, from_pandas=True))
+        else:
+            arrays.append(pa.array(column, type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def stream_arrow(dataset, chunks, fmt='arrow'):
+    np, pa, pq = import_arrow()
+    schema = arrow_schema(pa, dataset)
+    sink = ChunkSink()
+    writer = pq.ParquetWriter(pa.PythonFile(sink, mode='w'), schema) if fmt == 'parquet' \
+        else pa.ipc.new_stream(pa.PythonFile(sink, mode='w'), schema)
+    try:
+        for chunk in chunks:
+            batch = to_record_batch(np, pa, schema, chunk)
+            if fmt == 'parquet':
+                writer.write_table(pa.Table.from_batches([batch]))  # One row group per chunk
+            else:
+                writer.write_batch(batch)
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def stream(dataset, fmt, start=None, end=None, chunk_size=CHUNK_SIZE):
+    """Return a generator of encoded pieces for a dataset export."""
+    if fmt not in FORMATS:
+        raise ValueError(f'Invalid format: {fmt}')
+    if dataset not in DATASETS:
+        raise ValueError(f'Invalid dataset: {dataset}')
+    if fmt != 'csv':
+        import_arrow()  # Fail before the response starts rather than halfway through it
+    chunks = iter_chunks(dataset, start, end, chunk_size)
+    return stream_csv(dataset, chunks) if fmt == 'csv' else stream_arrow(dataset, chunks, fmt)
@@ -0,0 +1,313 @@
+# backend/history.py
+"""Room history: an append-only log of room, checkout and cleaning task
+transitions, and the room board as it was at any earlier time.
+
+Every flush that changes a Room, Checkout or CleaningTask appends one
+RoomEvent per transition, all of them in one multi-row INSERT. Events are
+small fixed-width rows: the kind and status are small integer codes (see
+KINDS and STATUSES, which may only ever be appended to) and everything
+else is an integer id or a timestamp.
+
+The state of the rooms at a time T is rebuilt from the latest snapshot at
+or before T plus the events after it, up to T. Migration 0010 takes the
+first snapshot, so history starts when it ran.
+
+compact() bounds storage: it snapshots every room at each midnight that
+had events, then deletes the events older than the retention period that a
+snapshot covers, and snapshots older than HISTORY_SNAPSHOT_DAYS that a
+later one replaces. For a compacted day, as-of queries answer with the
+state at the start of the day.
+
+Bulk updates that bypass the ORM must call record_rooms() themselves.
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, func, insert
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history
+
+from models import db, Room, Checkout, CleaningTask, RoomEvent, RoomSnapshot, current_property_id
+
+KINDS = (
+    'room_created', 'room_status', 'room_cleaned',
+    'checkout_scheduled', 'checkout', 'late_checkout_requested', 'late_checkout',
+    'task_created', 'task_status', 'task_reassigned', 'task_deleted',
+)
+STATUSES = (
+    'occupied', 'checked_out', 'cleaning', 'clean',  # Rooms
+    'pending', 'in_progress', 'completed',  # Cleaning tasks
+    'approved', 'denied',  # Late checkouts
+)
+KIND_CODES = {kind: code for code, kind in enumerate(KINDS, 1)}
+STATUS_CODES = {status: code for code, status in enumerate(STATUSES, 1)}
+REPLAY_BATCH = 1000  # Event rows fetched at a time while replaying
+
+
+def status_code(status):
+    return STATUS_CODES.get(status)
+
+
+def status_name(code):
+    return STATUSES[code - 1] if code else None
+
+
+# --- Recording ---
+
+def changed(obj, key):
+    """True if this flush sets a new value for the attribute."""
+    return bool(get_history(obj, key).added)
+
+
+def event_row(obj, room_id, now, kind, status=None, ref_id=None, housekeeper_id=None, last_cleaned=None):
+    return {'property_id': obj.property_id or current_property_id(), 'room_id': room_id, 'ts': now,
+            'kind': KIND_CODES[kind], 'status': status_code(status), 'ref_id': ref_id,
+            'housekeeper_id': housekeeper_id, 'last_cleaned': last_cleaned}
+
+
+def room_events(obj, now, new):
+    if new:
+        yield event_row(obj, obj.id, now, 'room_created', obj.status)
+        return
+    if changed(obj, 'status'):
+        yield event_row(obj, obj.id, now, 'room_status', obj.status)
+    if changed(obj, 'last_cleaned'):
+        # The time written (e.g. an offline completion), not the time of the flush
+        yield event_row(obj, obj.id, now, 'room_cleaned', last_cleaned=obj.last_cleaned)
+
+
+def checkout_events(obj, now, new):
+    if new:
+        yield event_row(obj, obj.room_id, now, 'checkout_scheduled', ref_id=obj.id)
+    if changed(obj, 'actual_checkout') and obj.actual_checkout is not None:
+        yield event_row(obj, obj.room_id, now, 'checkout', ref_id=obj.id)
+    if not new and changed(obj, 'late_checkout_time'):
+        yield event_row(obj, obj.room_id, now, 'late_checkout_requested', ref_id=obj.id)
+    elif not new and changed(obj, 'late_checkout_approved'):
+        decision = 'approved' if obj.late_checkout_approved else 'denied'
+        yield event_row(obj, obj.room_id, now, 'late_checkout', decision, ref_id=obj.id)
+
+
+def task_events(obj, now, new):
+    if new:
+        yield event_row(obj, obj.room_id, now, 'task_created', obj.status, obj.id, obj.housekeeper_id)
+        return
+    if changed(obj, 'status'):
+        yield event_row(obj, obj.room_id, now, 'task_status', obj.status, obj.id)
+    if changed(obj, 'housekeeper_id'):
+        yield event_row(obj, obj.room_id, now, 'task_reassigned', ref_id=obj.id, housekeeper_id=obj.housekeeper_id)
+
+
+RECORDERS = {Room: room_events, Checkout: checkout_events, CleaningTask: task_events}
+
+
+@event.listens_for(Session, 'after_flush')
+def _record_events(session, flush_context):
+    """Append the transitions of this flush; attribute history is still available here."""
+    now = datetime.utcnow()
+    rows = []
+    for obj in session.new:
+        recorder = RECORDERS.get(type(obj))
+        if recorder:
+            rows.extend(recorder(obj, now, True))
+    for obj in session.dirty:
+        recorder = RECORDERS.get(type(obj))
+        if recorder and session.is_modified(obj, include_collections=False):
+            rows.extend(recorder(obj, now, False))
+    for obj in session.deleted:
+        if type(obj) is CleaningTask:
+            rows.append(event_row(obj, obj.room_id, now, 'task_deleted', ref_id=obj.id))
+    if rows:
+        session.connection().execute(insert(RoomEvent.__table__), rows)
+
+
+def record_rooms(room_ids, status):
+    """Log a status change made with a bulk UPDATE, which the flush hook never sees. Caller commits."""
+    now = datetime.utcnow()
+    rows = [{'property_id': current_property_id(), 'room_id': room_id, 'ts': now,
+             'kind': KIND_CODES['room_status'], 'status': status_code(status), 'ref_id': None,
+             'housekeeper_id': None, 'last_cleaned': None}
+            for room_id in sorted(set(room_ids))]
+    if rows:
+        db.session.connection().execute(insert(RoomEvent.__table__), rows)
+
+
+# --- Reconstruction ---
+
+EVENT_COLUMNS = (RoomEvent.room_id, RoomEvent.ts, RoomEvent.kind, RoomEvent.status, RoomEvent.ref_id,
+                 RoomEvent.housekeeper_id, RoomEvent.last_cleaned)
+SNAPSHOT_COLUMNS = (RoomSnapshot.room_id, RoomSnapshot.status, RoomSnapshot.last_cleaned, RoomSnapshot.task_id,
+                    RoomSnapshot.task_status, RoomSnapshot.housekeeper_id)
+
+
+def empty_state():
+    return {'status': None, 'last_cleaned': None, 'task_id': None, 'task_status': None, 'housekeeper_id': None}
+
+
+def apply(state, kind, status, ref_id, housekeeper_id, last_cleaned):
+    """Apply one event to a room's state. Events of older tasks don't change it."""
+    if kind in ('room_created', 'room_status'):
+        state['status'] = status
+    elif kind == 'room_cleaned':
+        state['last_cleaned'] = last_cleaned
+    elif kind == 'task_created':
+        state.update(task_id=ref_id, task_status=status, housekeeper_id=housekeeper_id)
+    elif ref_id is not None and ref_id == state['task_id']:
+        if kind == 'task_status':
+            state['task_status'] = status
+        elif kind == 'task_reassigned':
+            state['housekeeper_id'] = housekeeper_id
+        elif kind == 'task_deleted':
+            state.update(task_id=None, task_status=None, housekeeper_id=None)
+
+
+def latest_snapshot(at=None):
+    """Time of the latest snapshot at or before `at` (default: any), or None."""
+    query = db.session.query(func.max(RoomSnapshot.ts))
+    if at is not None:
+        query = query.filter(RoomSnapshot.ts <= at)
+    return query.scalar()
+
+
+def snapshot_states(ts, room_id=None):
+    query = db.session.query(*SNAPSHOT_COLUMNS).filter(RoomSnapshot.ts == ts)
+    if room_id is not None:
+        query = query.filter(RoomSnapshot.room_id == room_id)
+    return {row[0]: {'status': status_name(row[1]), 'last_cleaned': row[2], 'task_id': row[3],
+                     'task_status': status_name(row[4]), 'housekeeper_id': row[5]}
+            for row in query}
+
+
+def events_between(after, until, room_id=None):
+    """Event rows with after < ts <= until (after None: from the start), in the order they happened."""
+    query = db.session.query(*EVENT_COLUMNS).filter(RoomEvent.ts <= until)
+    if after is not None:
+        query = query.filter(RoomEvent.ts > after)
+    if room_id is not None:
+        query = query.filter(RoomEvent.room_id == room_id)
+    return query.order_by(RoomEvent.ts, RoomEvent.id).yield_per(REPLAY_BATCH)
+
+
+def replay(states, room_id, ts, kind, status, ref_id, housekeeper_id, last_cleaned):
+    state = states.get(room_id)
+    if state is None:
+        state = states[room_id] = empty_state()
+    apply(state, KINDS[kind - 1], status_name(status), ref_id, housekeeper_id, last_cleaned)
+
+
+def states_at(at, room_id=None):
+    """{room_id: state} as of `at`, for every room (or just `room_id`) whose status is known by then."""
+    base = latest_snapshot(at)
+    states = snapshot_states(base, room_id) if base is not None else {}
+    for row in events_between(base, at, room_id):
+        replay(states, *row)
+    return {room_id: state for room_id, state in states.items() if state['status'] is not None}
+
+
+# --- Compaction ---
+
+def day_start(ts):
+    return datetime(ts.year, ts.month, ts.day)
+
+
+def write_snapshots(states, ts):
+    rows = [{'property_id': current_property_id(), 'room_id': room_id, 'ts': ts,
+             'status': status_code(state['status']), 'last_cleaned': state['last_cleaned'],
+             'task_id': state['task_id'], 'task_status': status_code(state['task_status']),
+             'housekeeper_id': state['housekeeper_id']}
+            for room_id, state in states.items() if state['status'] is not None]
+    if rows:
+        db.session.execute(insert(RoomSnapshot.__table__), rows)
+    return len(rows)
+
+
+def take_snapshots(until):
+    """Snapshot every room at each midnight up to `until` that had events since the last snapshot.
+
+    One pass over the events: states are carried forward from the latest
+    snapshot instead of being rebuilt for every day. Returns the rows written.
+    """
+    base = latest_snapshot()
+    if base is not None:
+        states, start = snapshot_states(base), base
+    else:
+        start = db.session.query(func.min(RoomEvent.ts)).scalar()
+        if start is None:
+            return 0
+        states = {}
+    day = day_start(start) + timedelta(days=1)
+    written = 0
+    pending = False  # Events applied since the last snapshot
+    for row in events_between(base, until):
+        while row[1] > day:
+            if pending:
+                written += write_snapshots(states, day)
+                pending = False
+            day += timedelta(days=1)
+        replay(states, *row)
+        pending = True
+    if pending and day <= until:
+        written += write_snapshots(states, day)
+    return written
+
+
+def compact(now, retain_days, snapshot_days):
+    """Snapshot each day up to today and delete what the snapshots make redundant. Caller commits.
+
+    Events are kept for `retain_days` and snapshots for `snapshot_days`, which
+    may not be shorter. Returns (snapshot rows written, events deleted,
+    snapshot rows deleted).
+    """
+    if snapshot_days < retain_days:
+        raise ValueError('Snapshots must be kept at least as long as events')
+    written = take_snapshots(day_start(now))
+    events_deleted = snapshots_deleted = 0
+    # Only events a snapshot covers can go, so times after that snapshot still replay exactly
+    covered = latest_snapshot(now - timedelta(days=retain_days))
+    if covered is not None:
+        events_deleted = RoomEvent.query.filter(RoomEvent.ts <= covered).delete(synchronize_session=False)
+    oldest_kept = latest_snapshot(now - timedelta(days=snapshot_days))
+    if oldest_kept is not None:
+        snapshots_deleted = RoomSnapshot.query.filter(RoomSnapshot.ts < oldest_kept).delete(synchronize_session=False)
+    return written, events_deleted, snapshots_deleted
+
+
+# --- Reads ---
+
+def event_data(event_id, room_id, ts, kind, status, ref_id, housekeeper_id, last_cleaned):
+    kind = KINDS[kind - 1]
+    data = {'id': event_id, 'room_id': room_id, 'ts': ts, 'type': kind, 'status': status_name(status)}
+    if kind == 'room_cleaned':
+        data['last_cleaned'] = last_cleaned
+    elif kind.startswith('task'):
+        data['task_id'] = ref_id
+        data['housekeeper_id'] = housekeeper_id
+    elif kind.startswith(('checkout', 'late_checkout')):
+        data['checkout_id'] = ref_id
+    return data
+
+
+def events_query(room_id, start=None, end=None):
+    """The events of one room with start <= ts < end, as (id, *EVENT_COLUMNS) rows."""
+    query = db.session.query(RoomEvent.id.label('id'), *EVENT_COLUMNS).filter(RoomEvent.room_id == room_id)
+    if start is not None:
+        query = query.filter(RoomEvent.ts >= start)
+    if end is not None:
+        query = query.filter(RoomEvent.ts < end)
+    return query
+
+
+def board_at(at, status=None):
+    """The room board as of `at`: rooms known by then, with their cleaning task, ordered by id."""
+    states = states_at(at)
+    numbers = dict(db.session.query(Room.id, Room.room_number).all())  # Rooms are never deleted
+    board = []
+    for room_id in sorted(states):
+        state = states[room_id]
+        if status and state['status'] not in status:
+            continue
+        task = None
+        if state['task_id'] is not None:
+            task = {'id': state['task_id'], 'status': state['task_status'], 'housekeeper_id': state['housekeeper_id']}
+        board.append({'id': room_id, 'room_number': numbers.get(room_id), 'status': state['status'],
+                      'last_cleaned': state['last_cleaned'], 'cleaning_task': task})
+    return board
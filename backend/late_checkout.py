@@ -0,0 +1,248 @@
+# backend/late_checkout.py
+"""Late-checkout availability and fee engine.
+
+Each room gets an IntervalIndex of the time it is spoken for: incoming
+reservations (arrival to departure) and late-checkout windows that were
+already approved. Asking whether a checkout can be held until T is an
+overlap query on [scheduled checkout, T + cleaning buffer), answered with
+a bisect and a prefix maximum. The latest feasible time is the next
+occupied interval's start minus the buffer.
+
+A room holds tens to a few hundred intervals (its upcoming reservations),
+so the index is kept in plain sorted lists: finding a position or ruling
+out a conflict is logarithmic, conflicts() visits only the intervals that
+could overlap, and adding or removing an interval is O(n) list work,
+which at this size is cheaper than a balanced tree in Python.
+
+Each decision has a budget (budget_ms). One that runs over, usually
+because loading a room's index was slow, raises BudgetExceeded rather
+than answering late; the index is loaded by then, so a retry is fast.
+
+Indexes are built lazily from the database the first time a room is asked
+about and kept current by note_reservation() / note_approval(). They
+expire after INDEX_TTL_SECONDS, so changes made by other workers are
+picked up.
+"""
+import threading
+import time
+from bisect import bisect_left
+from datetime import timedelta
+
+from models import db, Checkout, Reservation
+
+INDEX_TTL_SECONDS = 60
+DEFAULT_POLICY = {
+    'cleaning_buffer_minutes': 60,  # Time housekeeping needs before the next arrival
+    'max_extension_minutes': 360,  # Longest late checkout offered
+    # (up to this many minutes late, fee); requests beyond the last tier are refused
+    'fee_tiers': [(60, 0.0), (180, 25.0), (360, 50.0)],
+    'budget_ms': 50,  # Decisions slower than this raise BudgetExceeded
+}
+
+
+class BudgetExceeded(Exception):
+    """Raised when a decision took longer than the policy's budget_ms."""
+
+
+class IntervalIndex:
+    """Half-open [start, end) intervals sorted by start, with a prefix maximum of ends."""
+
+    def __init__(self):
+        self._starts = []
+        self._items = []  # (start, end, key), parallel to _starts
+        self._max_end = []  # _max_end[i] = max end among _items[:i + 1]
+        self._by_key = {}  # key -> (start, end, key)
+
+    def __len__(self):
+        return len(self._items)
+
+    def _reindex(self, position):
+        del self._max_end[position:]
+        running = self._max_end[-1] if self._max_end else None
+        for _, end, _ in self._items[position:]:
+            running = end if running is None or end > running else running
+            self._max_end.append(running)
+
+    def _position(self, item):
+        """Index of an item in _items: a bisect, then a step over intervals with the same start."""
+        position = bisect_left(self._starts, item[0])
+        while self._items[position] is not item:
+            position += 1
+        return position
+
+    def add(self, start, end, key):
+        lowest = self._detach(key)
+        item = self._by_key[key] = (start, end, key)
+        position = bisect_left(self._starts, start)
+        self._starts.insert(position, start)
+        self._items.insert(position, item)
+        self._reindex(position if lowest is None else min(position, lowest))
+
+    def _detach(self, key):
+        """Take key's interval out of the lists, leaving _max_end to the caller. Returns its old position."""
+        item = self._by_key.pop(key, None)
+        if item is None:
+            return None
+        position = self._position(item)
+        del self._starts[position]
+        del self._items[position]
+        return position
+
+    def remove(self, key):
+        position = self._detach(key)
+        if position is not None:
+            self._reindex(position)
+
+    def conflicts(self, start, end, exclude=None):
+        """Intervals overlapping [start, end), ignoring the one with key exclude.
+
+        Walks back from the last interval starting before `end` and stops
+        once the prefix maximum shows that nothing earlier reaches `start`.
+        """
+        found = []
+        position = bisect_left(self._starts, end) - 1
+        while position >= 0 and self._max_end[position] > start:
+            item = self._items[position]
+            if item[1] > start and item[2] != exclude:
+                found.append(item)
+            position -= 1
+        found.reverse()
+        return found
+
+    def next_start(self, after, exclude=None):
+        """Earliest interval start at or after `after`."""
+        for item in self._items[bisect_left(self._starts, after):]:
+            if item[2] != exclude:
+                return item[0]
+        return None
+
+
+class Decision:
+    """Outcome of an availability check."""
+
+    def __init__(self, feasible, requested_time, latest_time, fee, reason=None):
+        self.feasible = feasible
+        self.requested_time = requested_time
+        self.latest_time = latest_time
+        self.fee = fee
+        self.reason = reason
+
+    def to_dict(self):
+        return {
+            'feasible': self.feasible,
+            'requested_time': self.requested_time.isoformat() if self.requested_time else None,
+            'latest_available': self.latest_time.isoformat() if self.latest_time else None,
+            'fee': self.fee,
+            'reason': self.reason,
+        }
+
+
+class LateCheckoutEngine:
+    def __init__(self, policy=None, logger=None):
+        self.policy = dict(DEFAULT_POLICY, **(policy or {}))
+        self.logger = logger
+        self._lock = threading.Lock()
+        self._rooms = {}  # room_id -> (loaded_at, IntervalIndex)
+
+    # --- Fees ---
+
+    def fee_for(self, minutes_late):
+        """Fee for staying minutes_late past the scheduled checkout, or None if not offered."""
+        for up_to, fee in self.policy['fee_tiers']:
+            if minutes_late <= up_to:
+                return fee
+        return None
+
+    # --- Index maintenance ---
+
+    def _load(self, room_id, since):
+        index = IntervalIndex()
+        for reservation_id, arrival, departure in db.session.query(
+            Reservation.id, Reservation.arrival_time, Reservation.departure_time
+        ).filter(Reservation.room_id == room_id, Reservation.arrival_time >= since - timedelta(days=30)):
+            # A reservation without a departure holds the room from arrival onwards
+            index.add(arrival, departure or arrival + timedelta(days=365), ('reservation', reservation_id))
+        for checkout_id, scheduled, late in db.session.query(
+            Checkout.id, Checkout.scheduled_checkout, Checkout.late_checkout_time
+        ).filter(Checkout.room_id == room_id, Checkout.late_checkout_approved.is_(True),
+                 Checkout.late_checkout_time >= since):
+            index.add(scheduled, late, ('checkout', checkout_id))
+        return index
+
+    def _index(self, room_id, since):
+        with self._lock:
+            entry = self._rooms.get(room_id)
+            if entry and time.monotonic() - entry[0] < INDEX_TTL_SECONDS:
+                return entry[1]
+        index = self._load(room_id, since)
+        with self._lock:
+            self._rooms[room_id] = (time.monotonic(), index)
+        return index
+
+    def invalidate(self, room_id=None):
+        with self._lock:
+            if room_id is None:
+                self._rooms.clear()
+            else:
+                self._rooms.pop(room_id, None)
+
+    def note_reservation(self, reservation):
+        with self._lock:
+            entry = self._rooms.get(reservation.room_id)
+            if entry:
+                end = reservation.departure_time or reservation.arrival_time + timedelta(days=365)
+                entry[1].add(reservation.arrival_time, end, ('reservation', reservation.id))
+
+    def note_approval(self, checkout):
+        with self._lock:
+            entry = self._rooms.get(checkout.room_id)
+            if entry:
+                key = ('checkout', checkout.id)
+                if checkout.late_checkout_approved and checkout.late_checkout_time:
+                    entry[1].add(checkout.scheduled_checkout, checkout.late_checkout_time, key)
+                else:
+                    entry[1].remove(key)
+
+    # --- Queries ---
+
+    def check(self, checkout, requested_time):
+        """Can `checkout` keep its room until requested_time? Returns a Decision.
+
+        Raises BudgetExceeded when answering took longer than budget_ms.
+        """
+        started = time.perf_counter()
+        buffer = timedelta(minutes=self.policy['cleaning_buffer_minutes'])
+        max_extension = timedelta(minutes=self.policy['max_extension_minutes'])
+        scheduled = checkout.scheduled_checkout
+        own = ('checkout', checkout.id)
+        index = self._index(checkout.room_id, scheduled)
+
+        if index.conflicts(scheduled, scheduled + buffer, exclude=own):
+            latest = None  # Even an on-time checkout only just fits
+        else:
+            next_start = index.next_start(scheduled, exclude=own)
+            latest = scheduled + max_extension
+            if next_start is not None:
+                latest = min(latest, next_start - buffer)
+            latest = max(latest, scheduled)
+
+        minutes_late = (requested_time - scheduled).total_seconds() / 60
+        fee = self.fee_for(minutes_late)
+        if fee is None:
+            decision = Decision(False, requested_time, latest, None,
+                                f"Late checkout is limited to {self.policy['max_extension_minutes']} minutes")
+        elif latest is None or requested_time > latest:
+            decision = Decision(False, requested_time, latest, None, 'The room is needed for the next arrival')
+        else:
+            decision = Decision(True, requested_time, latest, fee)
+        if latest is not None and latest > scheduled and not decision.feasible:
+            decision.fee = self.fee_for((latest - scheduled).total_seconds() / 60)  # Fee for the suggested time
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if elapsed_ms > self.policy['budget_ms']:
+            if self.logger:
+                self.logger.warning('Late checkout decision for checkout %s took %.1f ms (budget %s ms)',
+                                    checkout.id, elapsed_ms, self.policy['budget_ms'])
+            raise BudgetExceeded(f"Availability check took {elapsed_ms:.0f} ms, over its "
+                                 f"{self.policy['budget_ms']} ms budget; try again")
+        return decision
@@ -0,0 +1,185 @@
+# backend/metrics.py
+"""Request latency and SQL instrumentation with a Prometheus /metrics endpoint.
+
+init_app() wraps every request to time it and count the SQL statements it
+issues. Statements are counted through SQLAlchemy engine events and
+attributed to the request running on the same thread. Observations go
+into fixed-bucket histograms per route, so recording one is a bisect and
+a few additions. Requests slower than SLOW_REQUEST_SECONDS are logged
+together with the statements they ran.
+
+Metrics are per process; with several gunicorn workers, scrape each one
+or put them behind a Prometheus multiprocess setup.
+"""
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Response, g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 250, 1000)
+MAX_RECORDED_STATEMENTS = 50  # Statements kept per request for the slow request log
+
+_local = threading.local()
+
+
+class Histogram:
+    """Cumulative-on-export histogram keyed by a label tuple."""
+
+    def __init__(self, name, help_text, buckets, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.label_names = label_names
+        self._series = {}  # labels -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def expose(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            snapshot = {labels: list(series) for labels, series in self._series.items()}
+        for labels, series in sorted(snapshot.items()):
+            label_text = format_labels(self.label_names, labels)
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            cumulative += series[len(self.buckets)]
+            lines.append(f'{self.name}_bucket{{{label_text},le="+Inf"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{label_text}}} {series[-1]:.6f}')
+            lines.append(f'{self.name}_count{{{label_text}}} {cumulative}')
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def expose(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self._lock:
+            snapshot = sorted(self._values.items())
+        for labels, value in snapshot:
+            lines.append(f'{self.name}{{{format_labels(self.label_names, labels)}}} {value}')
+        return lines
+
+
+def format_labels(names, values):
+    return ','.join(f'{name}="{str(value)}"' for name, value in zip(names, values))
+
+
+REQUEST_LATENCY = Histogram('pms_http_request_duration_seconds', 'Request latency by route.',
+                            LATENCY_BUCKETS, ('method', 'route'))
+REQUEST_STATEMENTS = Histogram('pms_http_request_sql_statements', 'SQL statements issued per request.',
+                               STATEMENT_BUCKETS, ('method', 'route'))
+REQUESTS = Counter('pms_http_requests_total', 'Requests by route and status.', ('method', 'route', 'status'))
+SQL_SECONDS = Counter('pms_sql_seconds_total', 'Time spent in SQL statements by route.', ('method', 'route'))
+SQL_STATEMENTS = Counter('pms_sql_statements_total', 'SQL statements by route.', ('method', 'route'))
+
+
+class RequestStats:
+    __slots__ = ('started', 'statements', 'sql_seconds', 'recorded')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.statements = 0
+        self.sql_seconds = 0.0
+        self.recorded = []  # (seconds, statement) for the slow request log
+
+
+# --- SQLAlchemy hooks (registered once for every engine) ---
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if getattr(_local, 'stats', None) is not None:
+        conn.info.setdefault('pms_query_start', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = getattr(_local, 'stats', None)
+    if stats is None:
+        return
+    starts = conn.info.get('pms_query_start')
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    stats.statements += 1
+    stats.sql_seconds += elapsed
+    if len(stats.recorded) < MAX_RECORDED_STATEMENTS:
+        stats.recorded.append((elapsed, statement))
+
+
+def observe_request(method, route, status, elapsed):
+    """Record a request served outside Flask (the async handlers in asgi.py)."""
+    REQUEST_LATENCY.observe((method, route), elapsed)
+    REQUESTS.inc((method, route, status))
+
+
+# --- Flask integration ---
+
+def init_app(app, slow_request_seconds=0.5):
+    """Instrument every request of app and add the /metrics endpoint."""
+    app.config.setdefault('SLOW_REQUEST_SECONDS', slow_request_seconds)
+
+    @app.before_request
+    def start_request_metrics():
+        _local.stats = g._metrics = RequestStats()
+
+    def finish(status):
+        stats = g.pop('_metrics', None)
+        _local.stats = None
+        if stats is None:
+            return
+        elapsed = time.perf_counter() - stats.started
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        labels = (request.method, route)
+        REQUEST_LATENCY.observe(labels, elapsed)
+        REQUEST_STATEMENTS.observe(labels, stats.statements)
+        REQUESTS.inc((request.method, route, status))
+        if stats.statements:
+            SQL_STATEMENTS.inc(labels, stats.statements)
+            SQL_SECONDS.inc(labels, stats.sql_seconds)
+        if elapsed >= app.config['SLOW_REQUEST_SECONDS']:
+            slowest = sorted(stats.recorded, reverse=True)[:5]
+            app.logger.warning(
+                'Slow request %s %s: %.3f s, %d SQL statements (%.3f s)%s',
+                request.method, request.full_path.rstrip('?'), elapsed, stats.statements, stats.sql_seconds,
+                ''.join(f'\n  {seconds * 1000:.1f} ms: {statement}' for seconds, statement in slowest)
+            )
+
+    @app.after_request
+    def record_request_metrics(response):
+        finish(response.status_code)
+        return response
+
+    @app.teardown_request
+    def record_failed_request_metrics(error):
+        if '_metrics' in g:  # after_request did not run: the view raised
+            finish(500)
+
+    @app.route('/metrics', methods=['GET'])
+    def prometheus_metrics():
+        lines = []
+        for metric in (REQUESTS, REQUEST_LATENCY, REQUEST_STATEMENTS, SQL_STATEMENTS, SQL_SECONDS):
+            lines.extend(metric.expose())
+        return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
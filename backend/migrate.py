@@ -0,0 +1,171 @@
+# backend/migrate.py
+"""Versioned schema migrations.
+
+Each script in migrations/ is named NNNN_description.py and defines
+``revision``, ``down_revision``, ``upgrade(conn)`` and ``downgrade(conn)``,
+in the same spirit as Alembic revisions. Applied revisions are recorded in
+the schema_migrations table, so running upgrade() against an existing
+database only applies what is missing.
+"""
+import importlib.util
+import os
+import re
+from datetime import datetime
+
+from sqlalchemy import text, inspect
+from sqlalchemy.schema import CreateTable
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+VERSION_TABLE = 'schema_migrations'
+
+
+# --- Operations used by migration scripts ---
+
+def create_index(conn, name, table, columns, unique=False, where=None):
+    """Create an index if it does not exist yet."""
+    sql = f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"
+    if where:
+        sql += f" WHERE {where}"
+    conn.execute(text(sql))
+
+def drop_index(conn, name):
+    """Drop an index if it exists."""
+    conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+def has_column(conn, table, column):
+    """Return True if the table already has the column."""
+    return column in {c['name'] for c in inspect(conn).get_columns(table)}
+
+def add_column(conn, table, column):
+    """Add a sqlalchemy Column to an existing table if it is missing."""
+    if has_column(conn, table, column.name):
+        return
+    column_type = column.type.compile(dialect=conn.dialect)
+    sql = f"ALTER TABLE {table} ADD COLUMN {column.name} {column_type}"
+    if column.server_default is not None:
+        sql += f" DEFAULT {column.server_default.arg}"
+    if not column.nullable and column.server_default is not None:
+        sql += " NOT NULL"
+    conn.execute(text(sql))
+
+def drop_column(conn, table, column_name):
+    """Drop a column if it exists (SQLite 3.35+ and PostgreSQL)."""
+    if has_column(conn, table, column_name):
+        conn.execute(text(f"ALTER TABLE {table} DROP COLUMN {column_name}"))
+
+def rebuild_table(conn, table):
+    """Recreate a table from a new sa.Table definition, keeping its rows.
+
+    For the changes SQLite's ALTER TABLE cannot make, such as dropping a
+    constraint. Columns missing from the old table get their defaults.
+    Indexes are dropped with the old table; recreate them afterwards.
+    """
+    temporary = f'{table.name}_rebuild'
+    kept = [column.name for column in table.columns if has_column(conn, table.name, column.name)]
+    # The table's own DDL under the temporary name; a to_metadata() copy orders constraints differently per process
+    create = str(CreateTable(table).compile(dialect=conn.dialect))
+    conn.execute(text(create.replace(f'CREATE TABLE {table.name} ', f'CREATE TABLE {temporary} ', 1)))
+    columns = ', '.join(kept)
+    conn.execute(text(f"INSERT INTO {temporary} ({columns}) SELECT {columns} FROM {table.name}"))
+    conn.execute(text(f"DROP TABLE {table.name}"))
+    conn.execute(text(f"ALTER TABLE {temporary} RENAME TO {table.name}"))
+
+
+# --- Runner ---
+
+def load_migrations():
+    """Load migration scripts and return them ordered by their revision chain."""
+    scripts = {}
+    for filename in sorted(os.listdir(MIGRATIONS_DIR)):
+        if not re.match(r'^\d{4}_\w+\.py$', filename):
+            continue
+        path = os.path.join(MIGRATIONS_DIR, filename)
+        spec = importlib.util.spec_from_file_location(f'migrations.{filename[:-3]}', path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        scripts[module.revision] = module
+
+    ordered = []
+    previous = None
+    while len(ordered) < len(scripts):
+        children = [m for m in scripts.values() if m.down_revision == previous]
+        if len(children) != 1:
+            raise RuntimeError(f'Broken migration chain after revision {previous}')
+        ordered.append(children[0])
+        previous = children[0].revision
+    return ordered
+
+def ensure_version_table(conn):
+    conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {VERSION_TABLE} ("
+        "version VARCHAR(32) PRIMARY KEY, applied_at TIMESTAMP NOT NULL)"
+    ))
+
+def applied_revisions(conn):
+    ensure_version_table(conn)
+    return {row[0] for row in conn.execute(text(f"SELECT version FROM {VERSION_TABLE}"))}
+
+def current_revision(engine):
+    """Return the newest applied revision, or None for an empty database."""
+    with engine.begin() as conn:
+        applied = applied_revisions(conn)
+    current = None
+    for migration in load_migrations():
+        if migration.revision in applied:
+            current = migration.revision
+    return current
+
+def upgrade(engine, target=None):
+    """Apply every pending migration up to and including target (default: head).
+
+    Each migration runs in its own transaction. Returns the applied revisions.
+    """
+    done = []
+    for migration in load_migrations():
+        with engine.begin() as conn:
+            if migration.revision not in applied_revisions(conn):
+                migration.upgrade(conn)
+                conn.execute(
+                    text(f"INSERT INTO {VERSION_TABLE} (version, applied_at) VALUES (:version, :applied_at)"),
+                    {'version': migration.revision, 'applied_at': datetime.utcnow()}
+                )
+                done.append(migration.revision)
+        if migration.revision == target:
+            break
+    return done
+
+def downgrade(engine, target):
+    """Revert applied migrations newer than target (None reverts everything)."""
+    done = []
+    migrations = load_migrations()
+    for migration in reversed(migrations):
+        if migration.revision == target:
+            break
+        with engine.begin() as conn:
+            if migration.revision in applied_revisions(conn):
+                migration.downgrade(conn)
+                conn.execute(text(f"DELETE FROM {VERSION_TABLE} WHERE version = :version"),
+                             {'version': migration.revision})
+                done.append(migration.revision)
+    return done
+
+
+if __name__ == '__main__':
+    import argparse
+    from sqlalchemy import create_engine
+
+    parser = argparse.ArgumentParser(description='Apply or revert schema migrations.')
+    parser.add_argument('command', choices=['upgrade', 'downgrade', 'current'])
+    parser.add_argument('revision', nargs='?', help='Target revision (downgrade requires one, use "base" for empty)')
+    parser.add_argument('--url', default=os.environ.get('DATABASE_URL', 'sqlite:///hotel.db'))
+    args = parser.parse_args()
+
+    engine = create_engine(args.url)
+    if args.command == 'upgrade':
+        print('Applied:', upgrade(engine, args.revision) or 'nothing')
+    elif args.command == 'downgrade':
+        if not args.revision:
+            parser.error('downgrade needs a target revision')
+        print('Reverted:', downgrade(engine, None if args.revision == 'base' else args.revision) or 'nothing')
+    else:
+        print(current_revision(engine) or 'base')
@@ -0,0 +1,49 @@
+"""Initial schema: rooms, checkouts, housekeepers and cleaning_tasks."""
+import sqlalchemy as sa
+
+revision = '0001'
+down_revision = None
+
+
+def tables():
+    metadata = sa.MetaData()
+    sa.Table(
+        'rooms', metadata,
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('room_number', sa.String(10), unique=True, nullable=False),
+        sa.Column('status', sa.String(20)),
+        sa.Column('last_cleaned', sa.DateTime),
+    )
+    sa.Table(
+        'checkouts', metadata,
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('room_id', sa.Integer, sa.ForeignKey('rooms.id'), nullable=False),
+        sa.Column('scheduled_checkout', sa.DateTime, nullable=False),
+        sa.Column('actual_checkout', sa.DateTime),
+        sa.Column('late_checkout_approved', sa.Boolean),
+        sa.Column('late_checkout_time', sa.DateTime),
+    )
+    sa.Table(
+        'housekeepers', metadata,
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('name', sa.String(80), nullable=False),
+    )
+    sa.Table(
+        'cleaning_tasks', metadata,
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('room_id', sa.Integer, sa.ForeignKey('rooms.id'), nullable=False),
+        sa.Column('housekeeper_id', sa.Integer, sa.ForeignKey('housekeepers.id'), nullable=False),
+        sa.Column('status', sa.String(20)),
+        sa.Column('started_at', sa.DateTime),
+        sa.Column('completed_at', sa.DateTime),
+    )
+    return metadata
+
+
+def upgrade(conn):
+    # checkfirst keeps this safe on databases created earlier by db.create_all()
+    tables().create_all(conn, checkfirst=True)
+
+
+def downgrade(conn):
+    tables().drop_all(conn, checkfirst=True)
@@ -0,0 +1,22 @@
+"""Composite indexes for the status-driven hot queries.
+
+- cleaning_tasks (room_id, status): open-task check in assign_cleaning_task
+- checkouts (room_id, scheduled_checkout): latest checkout lookup in record_checkout
+- rooms (status): status filters used by the room boards
+"""
+from migrate import create_index, drop_index
+
+revision = '0002'
+down_revision = '0001'
+
+
+def upgrade(conn):
+    create_index(conn, 'ix_cleaning_tasks_room_id_status', 'cleaning_tasks', ['room_id', 'status'])
+    create_index(conn, 'ix_checkouts_room_id_scheduled_checkout', 'checkouts', ['room_id', 'scheduled_checkout'])
+    create_index(conn, 'ix_rooms_status', 'rooms', ['status'])
+
+
+def downgrade(conn):
+    drop_index(conn, 'ix_rooms_status')
+    drop_index(conn, 'ix_checkouts_room_id_scheduled_checkout')
+    drop_index(conn, 'ix_cleaning_tasks_room_id_status')
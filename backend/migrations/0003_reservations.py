@@ -0,0 +1,31 @@
+"""Reservations (incoming arrivals) used to prioritise housekeeping."""
+import sqlalchemy as sa
+
+from migrate import create_index, drop_index
+
+revision = '0003'
+down_revision = '0002'
+
+
+def table():
+    metadata = sa.MetaData()
+    sa.Table('rooms', metadata, sa.Column('id', sa.Integer, primary_key=True))  # Foreign key target only
+    return sa.Table(
+        'reservations', metadata,
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('room_id', sa.Integer, sa.ForeignKey('rooms.id'), nullable=False),
+        sa.Column('guest_name', sa.String(120)),
+        sa.Column('arrival_time', sa.DateTime, nullable=False),
+        sa.Column('departure_time', sa.DateTime),
+        sa.Column('vip', sa.Boolean),
+    )
+
+
+def upgrade(conn):
+    table().create(conn, checkfirst=True)
+    create_index(conn, 'ix_reservations_room_id_arrival_time', 'reservations', ['room_id', 'arrival_time'])
+
+
+def downgrade(conn):
+    drop_index(conn, 'ix_reservations_room_id_arrival_time')
+    table().drop(conn, checkfirst=True)
@@ -0,0 +1,30 @@
+"""Pre-aggregated hourly and daily report rollups."""
+import sqlalchemy as sa
+
+revision = '0004'
+down_revision = '0003'
+
+
+def table():
+    return sa.Table(
+        'rollups', sa.MetaData(),
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('metric', sa.String(20), nullable=False),
+        sa.Column('granularity', sa.String(5), nullable=False),
+        sa.Column('bucket_start', sa.DateTime, nullable=False),
+        sa.Column('floor', sa.String(10), nullable=False),
+        sa.Column('housekeeper_id', sa.Integer, nullable=False),
+        sa.Column('count', sa.Integer, nullable=False),
+        sa.Column('total_minutes', sa.Float, nullable=False),
+        sa.Column('histogram', sa.String(400), nullable=False),
+        sa.UniqueConstraint('metric', 'granularity', 'bucket_start', 'floor', 'housekeeper_id',
+                            name='uq_rollups_bucket'),
+    )
+
+
+def upgrade(conn):
+    table().create(conn, checkfirst=True)
+
+
+def downgrade(conn):
+    table().drop(conn, checkfirst=True)
@@ -0,0 +1,15 @@
+"""Store the quoted late checkout fee on the checkout."""
+import sqlalchemy as sa
+
+from migrate import add_column, drop_column
+
+revision = '0005'
+down_revision = '0004'
+
+
+def upgrade(conn):
+    add_column(conn, 'checkouts', sa.Column('late_checkout_fee', sa.Numeric(10, 2)))
+
+
+def downgrade(conn):
+    drop_column(conn, 'checkouts', 'late_checkout_fee')
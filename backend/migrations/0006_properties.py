@@ -0,0 +1,120 @@
+"""Multi-property tenancy.
+
+Adds the properties table and a property_id on every per-hotel table.
+Existing rows go to the default property (id 1). Room numbers become unique
+per property instead of globally and report rollups are bucketed per
+property; SQLite cannot drop a constraint, so those two tables are rebuilt
+there. Status and date indexes gain a leading property_id.
+"""
+import sqlalchemy as sa
+
+from migrate import add_column, create_index, drop_column, drop_index, rebuild_table
+
+revision = '0006'
+down_revision = '0005'
+
+SCOPED_TABLES = ['checkouts', 'housekeepers', 'cleaning_tasks', 'reservations']
+INDEXES = [
+    ('ix_rooms_property_id_status', 'rooms', ['property_id', 'status']),
+    ('ix_checkouts_property_id_scheduled_checkout', 'checkouts', ['property_id', 'scheduled_checkout']),
+    ('ix_housekeepers_property_id', 'housekeepers', ['property_id']),
+    ('ix_cleaning_tasks_property_id_status', 'cleaning_tasks', ['property_id', 'status']),
+    ('ix_reservations_property_id_arrival_time', 'reservations', ['property_id', 'arrival_time']),
+]
+ROLLUP_KEY = ['metric', 'granularity', 'bucket_start', 'floor', 'housekeeper_id']
+
+
+def property_id_column():
+    return sa.Column('property_id', sa.Integer, nullable=False, server_default='1')
+
+
+def properties_table(metadata):
+    return sa.Table(
+        'properties', metadata,
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('code', sa.String(20), unique=True, nullable=False),
+        sa.Column('name', sa.String(120), nullable=False),
+    )
+
+
+def rooms_table(scoped):
+    metadata = sa.MetaData()
+    properties_table(metadata)
+    columns = [
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('room_number', sa.String(10), nullable=False, unique=not scoped),
+        sa.Column('status', sa.String(20)),
+        sa.Column('last_cleaned', sa.DateTime),
+    ]
+    if scoped:
+        columns += [
+            sa.Column('property_id', sa.Integer, sa.ForeignKey('properties.id'), nullable=False, server_default='1'),
+            sa.UniqueConstraint('property_id', 'room_number', name='uq_rooms_property_id_room_number'),
+        ]
+    return sa.Table('rooms', metadata, *columns)
+
+
+def rollups_table(scoped):
+    key = ['property_id'] + ROLLUP_KEY if scoped else ROLLUP_KEY
+    columns = [
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('metric', sa.String(20), nullable=False),
+        sa.Column('granularity', sa.String(5), nullable=False),
+        sa.Column('bucket_start', sa.DateTime, nullable=False),
+        sa.Column('floor', sa.String(10), nullable=False),
+        sa.Column('housekeeper_id', sa.Integer, nullable=False),
+        sa.Column('count', sa.Integer, nullable=False),
+        sa.Column('total_minutes', sa.Float, nullable=False),
+        sa.Column('histogram', sa.String(400), nullable=False),
+    ]
+    if scoped:
+        columns.append(property_id_column())
+    return sa.Table('rollups', sa.MetaData(), *columns, sa.UniqueConstraint(*key, name='uq_rollups_bucket'))
+
+
+def upgrade(conn):
+    properties_table(sa.MetaData()).create(conn, checkfirst=True)
+    if conn.execute(sa.text("SELECT COUNT(*) FROM properties")).scalar() == 0:
+        conn.execute(sa.text("INSERT INTO properties (id, code, name) VALUES (1, 'main', 'Main property')"))
+    for table in SCOPED_TABLES:
+        add_column(conn, table, property_id_column())
+
+    drop_index(conn, 'ix_rooms_status')
+    if conn.dialect.name == 'sqlite':
+        rebuild_table(conn, rooms_table(scoped=True))
+        rebuild_table(conn, rollups_table(scoped=True))
+    else:
+        add_column(conn, 'rooms', property_id_column())
+        conn.execute(sa.text("ALTER TABLE rooms DROP CONSTRAINT IF EXISTS rooms_room_number_key"))
+        conn.execute(sa.text("ALTER TABLE rooms ADD CONSTRAINT uq_rooms_property_id_room_number "
+                             "UNIQUE (property_id, room_number)"))
+        add_column(conn, 'rollups', property_id_column())
+        conn.execute(sa.text("ALTER TABLE rollups DROP CONSTRAINT IF EXISTS uq_rollups_bucket"))
+        conn.execute(sa.text(f"ALTER TABLE rollups ADD CONSTRAINT uq_rollups_bucket "
+                             f"UNIQUE (property_id, {', '.join(ROLLUP_KEY)})"))
+        for table in SCOPED_TABLES + ['rooms']:
+            conn.execute(sa.text(f"ALTER TABLE {table} ADD CONSTRAINT fk_{table}_property_id "
+                                 f"FOREIGN KEY (property_id) REFERENCES properties (id)"))
+    for name, table, columns in INDEXES:
+        create_index(conn, name, table, columns)
+
+
+def downgrade(conn):
+    for name, _, _ in INDEXES:
+        drop_index(conn, name)
+    if conn.dialect.name == 'sqlite':
+        rebuild_table(conn, rooms_table(scoped=False))
+        rebuild_table(conn, rollups_table(scoped=False))
+    else:
+        for table in SCOPED_TABLES + ['rooms']:
+            conn.execute(sa.text(f"ALTER TABLE {table} DROP CONSTRAINT IF EXISTS fk_{table}_property_id"))
+        conn.execute(sa.text("ALTER TABLE rooms DROP CONSTRAINT IF EXISTS uq_rooms_property_id_room_number"))
+        conn.execute(sa.text("ALTER TABLE rooms ADD CONSTRAINT rooms_room_number_key UNIQUE (room_number)"))
+        conn.execute(sa.text("ALTER TABLE rollups DROP CONSTRAINT IF EXISTS uq_rollups_bucket"))
+        conn.execute(sa.text(f"ALTER TABLE rollups ADD CONSTRAINT uq_rollups_bucket UNIQUE ({', '.join(ROLLUP_KEY)})"))
+        drop_column(conn, 'rooms', 'property_id')
+        drop_column(conn, 'rollups', 'property_id')
+    for table in SCOPED_TABLES:
+        drop_column(conn, table, 'property_id')
+    create_index(conn, 'ix_rooms_status', 'rooms', ['status'])
+    properties_table(sa.MetaData()).drop(conn, checkfirst=True)
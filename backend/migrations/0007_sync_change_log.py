@@ -0,0 +1,40 @@
+"""Change log and sync versions for offline handset sync."""
+import sqlalchemy as sa
+
+from migrate import add_column, create_index, drop_column, drop_index
+
+revision = '0007'
+down_revision = '0006'
+
+SYNCED_TABLES = ['properties', 'rooms', 'cleaning_tasks']
+
+
+def table():
+    metadata = sa.MetaData()
+    sa.Table('properties', metadata, sa.Column('id', sa.Integer, primary_key=True))  # Foreign key target only
+    return sa.Table(
+        'change_log', metadata,
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('property_id', sa.Integer, sa.ForeignKey('properties.id'), nullable=False, server_default='1'),
+        sa.Column('version', sa.Integer, nullable=False),
+        sa.Column('entity', sa.String(20), nullable=False),
+        sa.Column('entity_id', sa.Integer, nullable=False),
+        sa.Column('op', sa.String(10), nullable=False),
+        sa.Column('changed_at', sa.DateTime, nullable=False),
+        sa.Column('op_id', sa.String(64)),
+        sa.UniqueConstraint('property_id', 'version', name='uq_change_log_property_id_version'),
+    )
+
+
+def upgrade(conn):
+    for name in SYNCED_TABLES:
+        add_column(conn, name, sa.Column('sync_version', sa.Integer, nullable=False, server_default='0'))
+    table().create(conn, checkfirst=True)
+    create_index(conn, 'ix_change_log_property_id_op_id', 'change_log', ['property_id', 'op_id'])
+
+
+def downgrade(conn):
+    drop_index(conn, 'ix_change_log_property_id_op_id')
+    table().drop(conn, checkfirst=True)
+    for name in SYNCED_TABLES:
+        drop_column(conn, name, 'sync_version')
@@ -0,0 +1,36 @@
+"""Transactional outbox for messages to the hotel PMS."""
+import sqlalchemy as sa
+
+from migrate import create_index, drop_index
+
+revision = '0008'
+down_revision = '0007'
+
+
+def table():
+    metadata = sa.MetaData()
+    sa.Table('properties', metadata, sa.Column('id', sa.Integer, primary_key=True))  # Foreign key target only
+    return sa.Table(
+        'outbox_messages', metadata,
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('property_id', sa.Integer, sa.ForeignKey('properties.id'), nullable=False, server_default='1'),
+        sa.Column('topic', sa.String(30), nullable=False),
+        sa.Column('payload', sa.Text, nullable=False),
+        sa.Column('idempotency_key', sa.String(64), unique=True, nullable=False),
+        sa.Column('status', sa.String(10), nullable=False),
+        sa.Column('attempts', sa.Integer, nullable=False),
+        sa.Column('next_attempt_at', sa.DateTime, nullable=False),
+        sa.Column('created_at', sa.DateTime, nullable=False),
+        sa.Column('sent_at', sa.DateTime),
+        sa.Column('last_error', sa.String(500)),
+    )
+
+
+def upgrade(conn):
+    table().create(conn, checkfirst=True)
+    create_index(conn, 'ix_outbox_messages_property_id_status_id', 'outbox_messages', ['property_id', 'status', 'id'])
+
+
+def downgrade(conn):
+    drop_index(conn, 'ix_outbox_messages_property_id_status_id')
+    table().drop(conn, checkfirst=True)
@@ -0,0 +1,29 @@
+"""At most one open (pending or in progress) cleaning task per room.
+
+A partial unique index, so concurrent assignments cannot both create a task
+for the same room. Duplicates left by earlier races are removed first,
+keeping the task already in progress, else the oldest one.
+"""
+import sqlalchemy as sa
+
+from migrate import create_index, drop_index
+
+revision = '0009'
+down_revision = '0008'
+
+OPEN = "status IN ('pending', 'in_progress')"
+
+
+def upgrade(conn):
+    duplicates = conn.execute(sa.text(
+        f"SELECT room_id, MIN(CASE WHEN status = 'in_progress' THEN id END), MIN(id) "
+        f"FROM cleaning_tasks WHERE {OPEN} GROUP BY room_id HAVING COUNT(*) > 1"
+    )).all()
+    for room_id, in_progress_id, first_id in duplicates:
+        conn.execute(sa.text(f"DELETE FROM cleaning_tasks WHERE room_id = :room_id AND {OPEN} AND id != :keep"),
+                     {'room_id': room_id, 'keep': in_progress_id or first_id})
+    create_index(conn, 'uq_cleaning_tasks_open_room_id', 'cleaning_tasks', ['room_id'], unique=True, where=OPEN)
+
+
+def downgrade(conn):
+    drop_index(conn, 'uq_cleaning_tasks_open_room_id')
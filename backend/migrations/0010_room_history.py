@@ -0,0 +1,82 @@
+"""Room history: the event log and snapshots (see history.py).
+
+The first snapshot records every room as it is now, with its latest
+cleaning task, so history starts at this migration. The status codes are
+history.STATUSES as of this revision.
+"""
+from datetime import datetime
+
+import sqlalchemy as sa
+
+from migrate import create_index, drop_index
+
+revision = '0010'
+down_revision = '0009'
+
+STATUSES = ('occupied', 'checked_out', 'cleaning', 'clean', 'pending', 'in_progress', 'completed')
+
+
+def tables():
+    metadata = sa.MetaData()
+    sa.Table('properties', metadata, sa.Column('id', sa.Integer, primary_key=True))  # Foreign key target only
+    events = sa.Table(
+        'room_events', metadata,
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('property_id', sa.Integer, sa.ForeignKey('properties.id'), nullable=False, server_default='1'),
+        sa.Column('room_id', sa.Integer, nullable=False),
+        sa.Column('ts', sa.DateTime, nullable=False),
+        sa.Column('kind', sa.SmallInteger, nullable=False),
+        sa.Column('status', sa.SmallInteger),
+        sa.Column('ref_id', sa.Integer),
+        sa.Column('housekeeper_id', sa.Integer),
+    )
+    snapshots = sa.Table(
+        'room_snapshots', metadata,
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('property_id', sa.Integer, sa.ForeignKey('properties.id'), nullable=False, server_default='1'),
+        sa.Column('room_id', sa.Integer, nullable=False),
+        sa.Column('ts', sa.DateTime, nullable=False),
+        sa.Column('status', sa.SmallInteger),
+        sa.Column('last_cleaned', sa.DateTime),
+        sa.Column('task_id', sa.Integer),
+        sa.Column('task_status', sa.SmallInteger),
+        sa.Column('housekeeper_id', sa.Integer),
+        sa.UniqueConstraint('room_id', 'ts', name='uq_room_snapshots_room_id_ts'),
+    )
+    return events, snapshots
+
+
+def code(status):
+    return STATUSES.index(status) + 1 if status in STATUSES else None
+
+
+def upgrade(conn):
+    events, snapshots = tables()
+    events.create(conn, checkfirst=True)
+    snapshots.create(conn, checkfirst=True)
+    create_index(conn, 'ix_room_events_room_id_ts', 'room_events', ['room_id', 'ts'])
+    create_index(conn, 'ix_room_events_property_id_ts', 'room_events', ['property_id', 'ts'])
+    create_index(conn, 'ix_room_snapshots_property_id_ts', 'room_snapshots', ['property_id', 'ts'])
+
+    now = datetime.utcnow()
+    rooms = conn.execute(sa.text(
+        "SELECT r.id, r.property_id, r.status, r.last_cleaned, t.id AS task_id, t.status AS task_status, "
+        "t.housekeeper_id FROM rooms r "
+        "LEFT JOIN cleaning_tasks t ON t.id = (SELECT MAX(id) FROM cleaning_tasks WHERE room_id = r.id)"
+    ).columns(last_cleaned=sa.DateTime)).all()  # SQLite returns untyped datetimes as strings
+    if rooms:
+        conn.execute(snapshots.insert(), [
+            {'property_id': property_id, 'room_id': room_id, 'ts': now, 'status': code(status),
+             'last_cleaned': last_cleaned, 'task_id': task_id, 'task_status': code(task_status),
+             'housekeeper_id': housekeeper_id}
+            for room_id, property_id, status, last_cleaned, task_id, task_status, housekeeper_id in rooms
+        ])
+
+
+def downgrade(conn):
+    drop_index(conn, 'ix_room_snapshots_property_id_ts')
+    drop_index(conn, 'ix_room_events_property_id_ts')
+    drop_index(conn, 'ix_room_events_room_id_ts')
+    events, snapshots = tables()
+    snapshots.drop(conn, checkfirst=True)
+    events.drop(conn, checkfirst=True)
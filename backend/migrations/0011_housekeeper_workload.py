@@ -0,0 +1,30 @@
+"""Per-housekeeper task lookups and open task counters (see workload.py).
+
+The counters start from the tasks that are open now.
+"""
+import sqlalchemy as sa
+
+from migrate import add_column, create_index, drop_column, drop_index
+
+revision = '0011'
+down_revision = '0010'
+
+OPEN = "status IN ('pending', 'in_progress')"
+
+
+def upgrade(conn):
+    create_index(conn, 'ix_cleaning_tasks_housekeeper_id_status', 'cleaning_tasks', ['housekeeper_id', 'status'])
+    add_column(conn, 'housekeepers', sa.Column('open_tasks', sa.Integer, nullable=False, server_default='0'))
+    add_column(conn, 'housekeepers', sa.Column('in_progress_tasks', sa.Integer, nullable=False, server_default='0'))
+    conn.execute(sa.text(
+        f"UPDATE housekeepers SET "
+        f"open_tasks = (SELECT COUNT(*) FROM cleaning_tasks t WHERE t.housekeeper_id = housekeepers.id AND t.{OPEN}), "
+        f"in_progress_tasks = (SELECT COUNT(*) FROM cleaning_tasks t "
+        f"WHERE t.housekeeper_id = housekeepers.id AND t.status = 'in_progress')"
+    ))
+
+
+def downgrade(conn):
+    drop_column(conn, 'housekeepers', 'in_progress_tasks')
+    drop_column(conn, 'housekeepers', 'open_tasks')
+    drop_index(conn, 'ix_cleaning_tasks_housekeeper_id_status')
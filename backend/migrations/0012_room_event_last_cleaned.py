@@ -0,0 +1,22 @@
+"""Room history: the last_cleaned value written by each room_cleaned event.
+
+Replays used the event's own time, which is wrong for completions synced
+later from a handset. Existing events only have that time to go on.
+"""
+import sqlalchemy as sa
+
+from migrate import add_column, drop_column
+
+revision = '0012'
+down_revision = '0011'
+
+ROOM_CLEANED = 3  # history.KINDS code
+
+
+def upgrade(conn):
+    add_column(conn, 'room_events', sa.Column('last_cleaned', sa.DateTime))
+    conn.execute(sa.text("UPDATE room_events SET last_cleaned = ts WHERE kind = :kind"), {'kind': ROOM_CLEANED})
+
+
+def downgrade(conn):
+    drop_column(conn, 'room_events', 'last_cleaned')
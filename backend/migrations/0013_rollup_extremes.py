@@ -0,0 +1,22 @@
+"""Rollups: the shortest and longest observation of each bucket (see analytics.py).
+
+They bound percentile interpolation inside the wide first and last
+histogram bins. Existing rows have none; `flask rollups-rebuild --since`
+recomputes them for the range it covers.
+"""
+import sqlalchemy as sa
+
+from migrate import add_column, drop_column
+
+revision = '0013'
+down_revision = '0012'
+
+
+def upgrade(conn):
+    add_column(conn, 'rollups', sa.Column('min_minutes', sa.Float))
+    add_column(conn, 'rollups', sa.Column('max_minutes', sa.Float))
+
+
+def downgrade(conn):
+    drop_column(conn, 'rollups', 'max_minutes')
+    drop_column(conn, 'rollups', 'min_minutes')
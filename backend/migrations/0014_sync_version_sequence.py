@@ -0,0 +1,40 @@
+"""Sync versions from a sequence instead of a counter on the property row.
+
+Every write used to lock its property's row to take the next version. The
+sequence starts after the highest version handed out so far, so versions
+keep increasing across the switch. On SQLite, where there are no
+sequences, an AUTOINCREMENT table stands in for one.
+"""
+import sqlalchemy as sa
+
+from migrate import add_column, create_index, drop_column, drop_index
+
+revision = '0014'
+down_revision = '0013'
+
+
+def upgrade(conn):
+    last = conn.execute(sa.text("SELECT MAX(sync_version) FROM properties")).scalar() or 0
+    if conn.dialect.name == 'sqlite':
+        conn.execute(sa.text("CREATE TABLE IF NOT EXISTS sync_versions (id INTEGER PRIMARY KEY AUTOINCREMENT)"))
+        if last:
+            conn.execute(sa.text("INSERT INTO sync_versions (id) VALUES (:id)"), {'id': last})
+    else:
+        conn.execute(sa.text(f"CREATE SEQUENCE IF NOT EXISTS sync_versions START WITH {last + 1}"))
+    create_index(conn, 'ix_change_log_version', 'change_log', ['version'])  # Gap checks across properties
+    create_index(conn, 'ix_change_log_changed_at', 'change_log', ['changed_at'])  # Recent changes; pruning
+    drop_column(conn, 'properties', 'sync_version')
+
+
+def downgrade(conn):
+    add_column(conn, 'properties', sa.Column('sync_version', sa.Integer, nullable=False, server_default='0'))
+    conn.execute(sa.text(
+        "UPDATE properties SET sync_version = "
+        "COALESCE((SELECT MAX(version) FROM change_log WHERE change_log.property_id = properties.id), 0)"
+    ))
+    drop_index(conn, 'ix_change_log_changed_at')
+    drop_index(conn, 'ix_change_log_version')
+    if conn.dialect.name == 'sqlite':
+        conn.execute(sa.text("DROP TABLE IF EXISTS sync_versions"))
+    else:
+        conn.execute(sa.text("DROP SEQUENCE IF EXISTS sync_versions"))
@@ -0,0 +1,120 @@
+# backend/mock_pms.py
+"""A local stand-in PMS for developing and testing the outbox worker.
+
+    python mock_pms.py --port 8099 --fail-rate 0.2 --latency 0.05
+    PMS_URL=http://127.0.0.1:8099/messages flask outbox-worker
+
+It accepts the HTTP adapter's POST {"messages": [...]}, applies each
+idempotency key once (redeliveries are counted, not applied again), fails
+a share of batches with 503 so retries get exercised, and refuses
+messages whose topic is in --reject-topics. GET returns what it has
+received. MockPMS can also run inside a test process on a free port.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MockPMS:
+    """In-memory PMS endpoint with failure injection."""
+
+    def __init__(self, fail_rate=0.0, latency=0.0, reject_topics=(), seed=None):
+        self.fail_rate = fail_rate
+        self.latency = latency
+        self.reject_topics = set(reject_topics)
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.received = {}  # idempotency_key -> message, in arrival order
+        self.duplicates = 0
+        self.batches = 0
+        self.failures = 0
+        self.server = None
+
+    def handle(self, messages):
+        """Apply a batch. Returns (status, reply body)."""
+        if self.latency:
+            time.sleep(self.latency)
+        with self.lock:
+            self.batches += 1
+            if self.random.random() < self.fail_rate:
+                self.failures += 1
+                return 503, {'error': 'Injected failure'}
+            rejected = {}
+            for message in messages:
+                key = message['idempotency_key']
+                if message['topic'] in self.reject_topics:
+                    rejected[key] = f"Topic {message['topic']} is not accepted"
+                elif key in self.received:
+                    self.duplicates += 1
+                else:
+                    self.received[key] = message
+            return 200, {'accepted': len(messages) - len(rejected), 'rejected': rejected}
+
+    def summary(self):
+        with self.lock:
+            return {
+                'received': list(self.received.values()),
+                'duplicates': self.duplicates,
+                'batches': self.batches,
+                'failures': self.failures,
+            }
+
+    def make_handler(self):
+        pms = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def reply(self, status, body):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                try:
+                    body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                    messages = body['messages']
+                except (ValueError, KeyError, TypeError):
+                    return self.reply(400, {'error': 'Expected {"messages": [...]}'})
+                self.reply(*pms.handle(messages))
+
+            def do_GET(self):
+                self.reply(200, pms.summary())
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self, host='127.0.0.1', port=0):
+        """Serve in a background thread. Returns the URL to use as PMS_URL."""
+        self.server = ThreadingHTTPServer((host, port), self.make_handler())
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return f'http://{host}:{self.server.server_address[1]}/messages'
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run a mock PMS for the outbox worker.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='Share of batches answered with 503')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds to wait before replying')
+    parser.add_argument('--reject-topics', default='', help='Comma-separated topics to refuse')
+    args = parser.parse_args()
+
+    pms = MockPMS(args.fail_rate, args.latency, [t for t in args.reject_topics.split(',') if t])
+    server = ThreadingHTTPServer((args.host, args.port), pms.make_handler())
+    print(f'Mock PMS on http://{args.host}:{args.port}/messages')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,330 @@
+# backend/outbox.py
+"""Outbound messages to the hotel PMS through a transactional outbox.
+
+Handlers never call the PMS themselves. They add an OutboxMessage in the
+same transaction as the change it reports (room_ready, checkout,
+late_checkout), so a message exists exactly when its change committed and
+request latency does not depend on the PMS. The outbox stays empty unless
+PMS_ADAPTER (or PMS_URL) is set.
+
+OutboxWorker (``flask outbox-worker``) is an asyncio loop that drains every
+property's messages in batches, oldest first, properties in parallel:
+
+- A batch is leased before it is sent, so another worker skips it.
+- The adapter's send() delivers it. A failure retries the whole batch
+  after an exponential backoff with jitter; after OUTBOX_MAX_ATTEMPTS the
+  messages are marked failed and stop holding up the queue.
+- Every message carries an idempotency key, so the PMS can drop a batch
+  it already applied when a reply was lost and the batch is sent again.
+
+Adapters: 'http' POSTs JSON to PMS_URL, 'log' only logs, and
+'package.module:Class' loads any PMSAdapter subclass. mock_pms.py is a
+local stand-in PMS for trying this out.
+"""
+import asyncio
+import importlib
+import json
+import logging
+import os
+import random
+import urllib.error
+import urllib.request
+import uuid
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from itertools import takewhile
+
+from flask import current_app
+from sqlalchemy import func
+
+import tenancy
+from models import db, OutboxMessage
+
+TOPICS = ('room_ready', 'checkout', 'late_checkout')
+DEFAULTS = {
+    'PMS_ADAPTER': '',  # '' (outbox off), 'http', 'log' or 'package.module:Class'
+    'PMS_URL': '',
+    'PMS_TIMEOUT': 10.0,  # Seconds per HTTP request
+    'OUTBOX_BATCH_SIZE': 100,
+    'OUTBOX_MAX_ATTEMPTS': 12,  # Then the message is marked failed
+    'OUTBOX_BASE_DELAY': 1.0,  # Seconds before the first retry, doubled after each failure
+    'OUTBOX_MAX_DELAY': 600.0,
+    'OUTBOX_POLL_INTERVAL': 1.0,  # Seconds between polls when the outbox is empty
+    'OUTBOX_LEASE_SECONDS': 120,  # A claimed batch is left alone this long (longer than PMS_TIMEOUT)
+}
+RETRY_STATUSES = (408, 425, 429)  # 4xx replies worth retrying; other 4xx reject the batch
+
+logger = logging.getLogger(__name__)
+
+
+class PMSError(Exception):
+    """Raised by an adapter when a batch was not delivered and should be retried."""
+
+
+def init_app(app):
+    for key, default in DEFAULTS.items():
+        app.config.setdefault(key, type(default)(os.environ.get(key, default)))
+    if not app.config['PMS_ADAPTER'] and app.config['PMS_URL']:
+        app.config['PMS_ADAPTER'] = 'http'
+    if app.config['PMS_ADAPTER'] == 'http' and not app.config['PMS_URL']:
+        raise ValueError('PMS_ADAPTER=http needs PMS_URL')
+
+
+# --- Writing messages ---
+
+def encode(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f'Cannot encode {type(value).__name__}')
+
+
+def enqueue(topic, payload, property_id=None, key=None):
+    """Add a message to the current transaction. Caller commits. Returns None when the outbox is off."""
+    if not current_app.config['PMS_ADAPTER']:
+        return None
+    message = OutboxMessage(topic=topic, payload=json.dumps(payload, default=encode),
+                            idempotency_key=key or uuid.uuid4().hex)
+    if property_id is not None:
+        message.property_id = property_id
+    db.session.add(message)
+    return message
+
+
+def room_ready(room):
+    return enqueue('room_ready', {'room_number': room.room_number, 'cleaned_at': room.last_cleaned},
+                   room.property_id)
+
+
+def checkout_recorded(checkout, room):
+    return enqueue('checkout', {
+        'room_number': room.room_number,
+        'checkout_id': checkout.id,
+        'actual_checkout': checkout.actual_checkout,
+    }, checkout.property_id)
+
+
+def late_checkout_decided(checkout):
+    return enqueue('late_checkout', {
+        'room_number': checkout.room.room_number,
+        'checkout_id': checkout.id,
+        'approved': checkout.late_checkout_approved,
+        'late_checkout_time': checkout.late_checkout_time,
+        'fee': checkout.late_checkout_fee,
+    }, checkout.property_id)
+
+
+# --- Adapters ---
+
+class PMSAdapter:
+    """Delivers batches of outbox messages to a PMS. Subclasses implement send()."""
+
+    def __init__(self, config):
+        self.config = config
+
+    async def send(self, messages):
+        """Deliver a batch of message dicts.
+
+        Return {idempotency_key: reason} for messages the PMS refused and that
+        must not be retried (an empty dict when all were accepted). Raise
+        PMSError, or let any other exception out, to retry the whole batch.
+        """
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class LogAdapter(PMSAdapter):
+    """Logs messages instead of sending them, for setups without a PMS."""
+
+    async def send(self, messages):
+        for message in messages:
+            logger.info('PMS %s %s %s', message['property'], message['topic'], message['payload'])
+        return {}
+
+
+class HTTPAdapter(PMSAdapter):
+    """POSTs {"messages": [...]} to PMS_URL.
+
+    A 2xx reply delivers the batch; it may list refused messages as
+    {"rejected": {key: reason}}. Other 4xx replies refuse the whole batch.
+    Timeouts, connection errors, 5xx and RETRY_STATUSES are retried.
+    """
+
+    async def send(self, messages):
+        return await asyncio.to_thread(self._post, messages)  # urllib blocks; keep it off the event loop
+
+    def _post(self, messages):
+        request = urllib.request.Request(
+            self.config['PMS_URL'],
+            data=json.dumps({'messages': messages}).encode(),
+            headers={'Content-Type': 'application/json'},
+            method='POST',
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.config['PMS_TIMEOUT']) as response:
+                reply = response.read()
+        except urllib.error.HTTPError as error:
+            if error.code >= 500 or error.code in RETRY_STATUSES:
+                raise PMSError(f'PMS replied {error.code}')
+            return {message['idempotency_key']: f'PMS replied {error.code}' for message in messages}
+        except OSError as error:  # URLError, timeouts, refused connections
+            raise PMSError(f'PMS unreachable: {error}')
+        try:
+            return json.loads(reply or b'{}').get('rejected') or {}
+        except (ValueError, AttributeError):
+            return {}
+
+
+ADAPTERS = {'http': HTTPAdapter, 'log': LogAdapter}
+
+
+def load_adapter(config):
+    name = config['PMS_ADAPTER']
+    if name in ADAPTERS:
+        return ADAPTERS[name](config)
+    module, _, attribute = name.partition(':')
+    if not attribute:
+        raise ValueError(f"Invalid PMS_ADAPTER: {name} (use {', '.join(ADAPTERS)} or package.module:Class)")
+    return getattr(importlib.import_module(module), attribute)(config)
+
+
+# --- Delivery ---
+
+def backoff(attempts, config):
+    """Delay before retrying after the given number of failed attempts, with jitter."""
+    delay = min(config['OUTBOX_MAX_DELAY'], config['OUTBOX_BASE_DELAY'] * 2 ** (attempts - 1))
+    return timedelta(seconds=delay * random.uniform(0.5, 1.0))
+
+
+def claim(hotel, config):
+    """Lease a property's oldest pending messages and return them as dicts.
+
+    Stops at the first message still waiting for a retry, so a property's
+    messages reach the PMS in the order they were written.
+    """
+    with tenancy.use_property(hotel):
+        now = datetime.utcnow()
+        head = OutboxMessage.query.filter_by(status='pending').order_by(OutboxMessage.id) \
+            .limit(config['OUTBOX_BATCH_SIZE']).all()
+        due = list(takewhile(lambda message: message.next_attempt_at <= now, head))
+        if not due:
+            db.session.rollback()
+            return []
+        batch = [{
+            'idempotency_key': message.idempotency_key,
+            'property': hotel.code,
+            'topic': message.topic,
+            'payload': json.loads(message.payload),
+            'created_at': message.created_at.isoformat(),
+            'attempt': message.attempts + 1,
+        } for message in due]
+        claimed = OutboxMessage.query.filter(
+            OutboxMessage.id.in_([message.id for message in due]),
+            OutboxMessage.status == 'pending',
+            OutboxMessage.next_attempt_at <= now,
+        ).update({
+            OutboxMessage.attempts: OutboxMessage.attempts + 1,
+            OutboxMessage.next_attempt_at: now + timedelta(seconds=config['OUTBOX_LEASE_SECONDS']),
+        }, synchronize_session=False)
+        if claimed != len(due):  # Another worker leased some of them first
+            db.session.rollback()
+            return []
+        db.session.commit()
+        return batch
+
+
+def settle(hotel, batch, rejected, error, config):
+    """Record the outcome of sending a batch: sent, refused, or retry later."""
+    with tenancy.use_property(hotel):
+        now = datetime.utcnow()
+        keys = [message['idempotency_key'] for message in batch]
+        for message in OutboxMessage.query.filter(OutboxMessage.idempotency_key.in_(keys)):
+            if error is not None:
+                message.last_error = error[:500]
+                if message.attempts >= config['OUTBOX_MAX_ATTEMPTS']:
+                    message.status = 'failed'
+                else:
+                    message.next_attempt_at = now + backoff(message.attempts, config)
+            elif message.idempotency_key in rejected:
+                message.status = 'failed'
+                message.last_error = str(rejected[message.idempotency_key])[:500]
+            else:
+                message.status = 'sent'
+                message.sent_at = now
+                message.last_error = None
+        db.session.commit()
+
+
+class OutboxWorker:
+    """Drains every property's outbox into a PMS adapter."""
+
+    def __init__(self, app, adapter=None):
+        self.app = app
+        self.config = app.config
+        self.adapter = adapter or load_adapter(app.config)
+        self._stop = asyncio.Event()
+
+    def _in_app(self, function, *args):
+        with self.app.app_context():
+            return function(*args)
+
+    async def drain(self, hotel):
+        """Send one batch for a property. Returns the number of messages handled."""
+        batch = await asyncio.to_thread(self._in_app, claim, hotel, self.config)
+        if not batch:
+            return 0
+        rejected, error = {}, None
+        try:
+            rejected = await self.adapter.send(batch)
+        except Exception as exc:
+            error = str(exc) or type(exc).__name__
+            logger.warning('PMS delivery for %s failed (%d messages): %s', hotel.code, len(batch), error)
+        await asyncio.to_thread(self._in_app, settle, hotel, batch, rejected, error, self.config)
+        return len(batch)
+
+    async def run_once(self):
+        """One batch for every property, sent concurrently. Returns the number of messages handled."""
+        hotels = await asyncio.to_thread(self._in_app, tenancy.registry_for(self.app).all)
+        return sum(await asyncio.gather(*(self.drain(hotel) for hotel in hotels)))
+
+    async def run(self):
+        """Deliver messages until stop() is called."""
+        try:
+            while not self._stop.is_set():
+                if await self.run_once():
+                    continue
+                try:
+                    await asyncio.wait_for(self._stop.wait(), self.config['OUTBOX_POLL_INTERVAL'])
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            await self.adapter.close()
+
+    def stop(self):
+        self._stop.set()
+
+
+# --- Maintenance ---
+
+def status_counts():
+    """Message counts by status for the current property, plus the age of the oldest pending one."""
+    counts = dict(db.session.query(OutboxMessage.status, func.count()).group_by(OutboxMessage.status).all())
+    oldest = db.session.query(func.min(OutboxMessage.created_at)).filter(OutboxMessage.status == 'pending').scalar()
+    return counts, (datetime.utcnow() - oldest if oldest else None)
+
+
+def retry_failed():
+    """Put failed messages back in the queue. Caller commits."""
+    return OutboxMessage.query.filter_by(status='failed').update(
+        {OutboxMessage.status: 'pending', OutboxMessage.attempts: 0, OutboxMessage.next_attempt_at: datetime.utcnow()},
+        synchronize_session=False
+    )
+
+
+def prune(before):
+    """Delete messages sent before `before`. Caller commits."""
+    return OutboxMessage.query.filter(OutboxMessage.status == 'sent', OutboxMessage.sent_at < before) \
+        .delete(synchronize_session=False)
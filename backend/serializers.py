@@ -0,0 +1,246 @@
+# backend/serializers.py
+"""Fast JSON for the large list responses.
+
+Rows are selected as plain column tuples and zipped into dicts; datetimes
+and Decimals stay as they are and are handled by the encoder, so no ORM
+objects are built and no per-field isoformat() calls are made. The output
+has the same shape and values as the per-object helpers it replaces.
+
+dumps() uses orjson when it is installed and falls back to the standard
+json module otherwise. init_app() adds response compression: bodies over
+COMPRESS_MIN_BYTES are sent with brotli (if the brotli package is
+installed) or gzip when the client accepts it. Bodies with an ETag are
+compressed once per ETag and encoding.
+
+select(), children() and group_by_room() build the same rows from Core
+statements, for the async handlers in asgi.py.
+"""
+import gzip
+import json
+import threading
+from collections import OrderedDict, defaultdict
+from datetime import date, datetime
+from decimal import Decimal
+
+import sqlalchemy
+from flask import Response, request
+
+from models import db, Room, Checkout, CleaningTask, Housekeeper
+
+try:
+    import orjson  # Optional: several times faster, encodes datetimes natively
+except ImportError:
+    orjson = None
+try:
+    import brotli  # Optional: smaller than gzip for JSON
+except ImportError:
+    brotli = None
+
+IN_CLAUSE_CHUNK = 500  # Keeps IN (...) lists under SQLite's bound parameter limit
+COMPRESSIBLE_MIMETYPES = ('application/json', 'text/csv', 'text/plain')
+COMPRESSED_CACHE_SIZE = 64  # Compressed bodies kept, keyed by ETag
+
+# Response key -> column, in response order
+ROOM_SUMMARY_FIELDS = {
+    'id': Room.id,
+    'room_number': Room.room_number,
+    'status': Room.status,
+    'last_cleaned': Room.last_cleaned,
+}
+ROOM_FIELDS = dict(ROOM_SUMMARY_FIELDS, version=Room.sync_version)  # Plus checkouts and tasks, see full_rooms()
+CHECKOUT_FIELDS = {
+    'id': Checkout.id,
+    'scheduled_checkout': Checkout.scheduled_checkout,
+    'actual_checkout': Checkout.actual_checkout,
+    'late_checkout_approved': Checkout.late_checkout_approved,
+    'late_checkout_time': Checkout.late_checkout_time,
+    'late_checkout_fee': Checkout.late_checkout_fee,
+}
+CLEANING_TASK_FIELDS = {
+    'id': CleaningTask.id,
+    'room_id': CleaningTask.room_id,
+    'housekeeper_id': CleaningTask.housekeeper_id,
+    'status': CleaningTask.status,
+    'started_at': CleaningTask.started_at,
+    'completed_at': CleaningTask.completed_at,
+    'version': CleaningTask.sync_version,
+}
+ROUTE_TASK_FIELDS = dict(CLEANING_TASK_FIELDS, room_number=Room.room_number)  # Joined with the room
+HOUSEKEEPER_FIELDS = {
+    'id': Housekeeper.id,
+    'name': Housekeeper.name,
+}
+
+
+# --- Encoding ---
+
+def default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):  # orjson handles these itself
+        return value.isoformat()
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+if orjson is not None:
+    def dumps(value):
+        """Encode a response body as JSON bytes."""
+        return orjson.dumps(value, default=default) + b'\n'
+else:
+    def dumps(value):
+        """Encode a response body as JSON bytes."""
+        return json.dumps(value, default=default, separators=(',', ':')).encode() + b'\n'
+
+
+def json_response(body, status=200):
+    return Response(dumps(body), status=status, mimetype='application/json')
+
+
+# --- Rows ---
+
+def labelled(fields):
+    return [column.label(key) for key, column in fields.items()]
+
+
+def query(fields):
+    """An ORM query selecting `fields` as labelled columns. Still filtered per property."""
+    return db.session.query(*labelled(fields))
+
+
+def select(fields):
+    """The same as a select() statement, for sessions other than db.session."""
+    return sqlalchemy.select(*labelled(fields))
+
+
+def rows(fields, result):
+    """Zip result tuples into dicts keyed like `fields`."""
+    keys = tuple(fields)
+    return [dict(zip(keys, row)) for row in result]
+
+
+def chunks(ids):
+    for start in range(0, len(ids), IN_CLAUSE_CHUNK):
+        yield ids[start:start + IN_CLAUSE_CHUNK]
+
+
+def children(fields, model, room_ids):
+    """Select `fields` of the `model` rows in the given rooms, room_id first, ordered by id."""
+    return sqlalchemy.select(model.room_id, *fields.values()).where(model.room_id.in_(room_ids)).order_by(model.id)
+
+
+def group_by_room(fields, result, groups):
+    """Add (room_id, *fields) result rows to {room_id: [row dict, ...]}."""
+    keys = tuple(fields)
+    for room_id, *values in result:
+        groups[room_id].append(dict(zip(keys, values)))
+    return groups
+
+
+def grouped_by_room(fields, model, room_ids):
+    """{room_id: [row dict, ...]} for every row of `model` in the given rooms, ordered by id."""
+    groups = defaultdict(list)
+    for chunk in chunks(room_ids):
+        group_by_room(fields, db.session.execute(children(fields, model, chunk)), groups)
+    return groups
+
+
+def attach_children(room_rows, checkouts, tasks):
+    for row in room_rows:
+        row['checkouts'] = checkouts.get(row['id'], [])
+        row['cleaning_tasks'] = tasks.get(row['id'], [])
+    return room_rows
+
+
+def full_rooms(room_rows):
+    """Add checkouts and cleaning tasks to ROOM_FIELDS rows, with one IN query each per 500 rooms."""
+    room_ids = [row['id'] for row in room_rows]
+    return attach_children(room_rows, grouped_by_room(CHECKOUT_FIELDS, Checkout, room_ids),
+                           grouped_by_room(CLEANING_TASK_FIELDS, CleaningTask, room_ids))
+
+
+def room(room_id):
+    """One room's full row, or None."""
+    found = full_rooms(rows(ROOM_FIELDS, query(ROOM_FIELDS).filter(Room.id == room_id)))
+    return found[0] if found else None
+
+
+# --- Compression ---
+
+def accepted_encoding(accepted=None):
+    """'br', 'gzip' or None for an Accept-Encoding header (default: the current request's)."""
+    if accepted is None:
+        accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def coded_etag(etag, encoding):
+    """ETag of one content-coding of a representation; each coding needs its own strong validator."""
+    return f'{etag}-{encoding}' if encoding else etag
+
+
+def base_etag(tag):
+    """The ETag a coded_etag() was made from."""
+    for encoding in ('br', 'gzip'):
+        if tag.endswith('-' + encoding):
+            return tag[:-len(encoding) - 1]
+    return tag
+
+
+def matching_etag(tags, etag):
+    """The tag in `tags` (an If-None-Match header) naming any coding of `etag`, or None."""
+    return next((tag for tag in tags.as_set() if base_etag(tag) == etag), None)
+
+
+def compress(data, encoding, level):
+    if encoding == 'br':
+        return brotli.compress(data, quality=level['br'])
+    return gzip.compress(data, compresslevel=level['gzip'], mtime=0)
+
+
+def compressed(app, data, encoding, key=None):
+    """Compress a body at the app's COMPRESS_LEVEL, reusing the app's result for the same key (None: not cached)."""
+    level = app.config['COMPRESS_LEVEL']
+    if key is None:
+        return compress(data, encoding, level)
+    bodies, lock = app.extensions['compressed']
+    with lock:
+        body = bodies.get(key)
+    if body is None:
+        body = compress(data, encoding, level)
+        with lock:
+            bodies[key] = body
+            while len(bodies) > COMPRESSED_CACHE_SIZE:
+                bodies.popitem(last=False)
+    return body
+
+
+def init_app(app):
+    app.config.setdefault('COMPRESS_MIN_BYTES', 1024)
+    app.config.setdefault('COMPRESS_LEVEL', {'gzip': 5, 'br': 4})  # Fast levels; JSON compresses well anyway
+    app.extensions['compressed'] = (OrderedDict(), threading.Lock())  # (path, query string, ETag, encoding) -> body
+
+    @app.after_request
+    def compress_response(response):
+        if (response.direct_passthrough or response.is_streamed or response.status_code != 200
+                or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = accepted_encoding()
+        if encoding is None or response.content_length is not None \
+                and response.content_length < app.config['COMPRESS_MIN_BYTES']:
+            return response
+        data = response.get_data()
+        if len(data) < app.config['COMPRESS_MIN_BYTES']:
+            return response
+
+        etag, weak = response.get_etag()
+        key = (request.path, request.query_string, etag, encoding) if etag else None
+        response.set_data(compressed(app, data, encoding, key))
+        response.headers['Content-Encoding'] = encoding
+        if etag:
+            response.set_etag(coded_etag(etag, encoding), weak)
+        return response
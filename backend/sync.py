@@ -0,0 +1,437 @@
+# backend/sync.py
+"""Offline sync for housekeeping handsets.
+
+Every change to a Room or CleaningTask gets a version number and a row in
+the change log. Versions come from the sync_versions sequence, so writers
+never wait for each other to take one, but they can commit out of order:
+version 12 may be visible while 11 is still in flight. Pulls therefore
+stop before the first missing version that a recent change follows, until
+it commits or is given up on. A transaction that rolls back logs its
+versions as skipped; a version still missing after GAP_GRACE_SECONDS is
+taken as lost with a crashed writer.
+
+- pull(since) returns the rooms and tasks changed after ``since``, or a full
+  snapshot for a new handset or one that fell behind the pruned log.
+- apply_batch(changes) applies the status changes a handset queued while
+  offline, in one transaction, and reports the outcome of each.
+
+Conflicts are resolved the same way whatever order batches arrive in:
+
+- Task statuses only move forward (pending -> in_progress -> completed);
+  an older or repeated transition is reported as stale and ignored.
+- A room status from a handset applies if nobody changed the room since the
+  version the handset last pulled. Otherwise the front desk marking the
+  room occupied wins (a guest is in it), and anything else goes to the
+  later of the two changes. Changes made by earlier ops of the same batch
+  are the handset's own and never conflict.
+- Every change carries a client op_id; replaying an op that was already
+  applied is reported as a duplicate and changes nothing.
+
+Bulk updates that bypass the ORM must call record() themselves.
+"""
+import logging
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import bindparam, event, func, insert, text, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import flag_modified
+
+import analytics
+import outbox
+import transitions
+from models import db, Room, CleaningTask, ChangeLog, current_property_id
+
+logger = logging.getLogger(__name__)
+
+ENTITIES = {Room: 'room', CleaningTask: 'cleaning_task'}
+SKIP = 'skip'  # Change log op of a version whose transaction rolled back
+GAP_GRACE_SECONDS = 60  # Longer than any write transaction
+CHANGE_TYPES = ('task_status', 'room_status')
+DEFAULT_PULL_LIMIT = 500  # Change log rows per delta page
+MAX_PULL_LIMIT = 5000
+MAX_PUSH_CHANGES = 1000
+SNAPSHOT_TASK_HOURS = 24  # Completed tasks a fresh handset still sees
+OP_ID_LENGTH = 64
+
+
+class SyncError(ValueError):
+    """Raised for a malformed sync request."""
+
+
+# --- Change log ---
+
+# The newest version of a property's changes that pulls may return: below the first missing version
+# that a change made within the grace period follows. Also run by asgi.py.
+VISIBLE_VERSION = text(
+    "SELECT MAX(version) FROM change_log WHERE property_id = :property_id AND op != 'skip' AND version < COALESCE(("
+    "SELECT MIN(c.version) FROM change_log c WHERE c.changed_at > :recent "
+    "AND NOT EXISTS (SELECT 1 FROM change_log p WHERE p.version = c.version - 1) "
+    "AND EXISTS (SELECT 1 FROM change_log e WHERE e.version < c.version)), :unbounded)"
+)
+
+
+def visible_version_params(property_id):
+    recent = datetime.utcnow() - timedelta(seconds=GAP_GRACE_SECONDS)
+    return {'property_id': property_id, 'recent': recent, 'unbounded': 2 ** 31 - 1}
+
+
+def allocate_versions(session, property_id, count):
+    """Reserve `count` versions for a property's changes and return them in increasing order."""
+    conn = session.connection()
+    if conn.dialect.name == 'sqlite':
+        # One writer at a time, and a rollback takes the rows back too: consecutive, and never a gap
+        conn.execute(text(
+            "INSERT INTO sync_versions (id) WITH RECURSIVE n(i) AS "
+            "(SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < :count) SELECT NULL FROM n"
+        ), {'count': count})
+        last = conn.execute(text("SELECT last_insert_rowid()")).scalar()
+        conn.execute(text("DELETE FROM sync_versions WHERE id < :last"), {'last': last})
+        return list(range(last - count + 1, last + 1))
+    versions = sorted(conn.execute(
+        text("SELECT nextval('sync_versions') FROM generate_series(1, :count)"), {'count': count}
+    ).scalars())
+    session.info.setdefault('sync_allocated', []).extend((property_id, version) for version in versions)
+    return versions
+
+
+@event.listens_for(Session, 'before_flush')
+def _version_changes(session, flush_context, instances):
+    """Give each changed room and task its new version before it is written."""
+    changes = []
+    for obj in session.new:
+        if type(obj) in ENTITIES:
+            changes.append((obj, 'upsert'))
+    for obj in session.dirty:
+        if type(obj) in ENTITIES and session.is_modified(obj, include_collections=False):
+            changes.append((obj, 'upsert'))
+    for obj in session.deleted:
+        if type(obj) in ENTITIES:
+            changes.append((obj, 'delete'))
+    if not changes:
+        return
+
+    by_property = {}
+    for obj, op in changes:
+        by_property.setdefault(obj.property_id or current_property_id(), []).append((obj, op))
+    pending = session.info.setdefault('sync_pending', [])
+    for property_id, entries in by_property.items():
+        for (obj, op), version in zip(entries, allocate_versions(session, property_id, len(entries))):
+            if op == 'upsert':
+                obj.sync_version = version  # Also the optimistic lock: UPDATE ... WHERE sync_version = <old>
+            pending.append((obj, op, property_id, version))
+
+
+@event.listens_for(Session, 'after_flush')
+def _log_changes(session, flush_context):
+    """Write the change log rows once new rows have their ids."""
+    pending = session.info.pop('sync_pending', None)
+    if not pending:
+        return
+    now = datetime.utcnow()
+    op_id = session.info.get('sync_op_id')
+    session.connection().execute(insert(ChangeLog.__table__), [
+        {'property_id': property_id, 'version': version, 'entity': ENTITIES[type(obj)],
+         'entity_id': obj.id, 'op': op, 'changed_at': now, 'op_id': op_id}
+        for obj, op, property_id, version in pending
+    ])
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_changes(session, previous_transaction):
+    session.info.pop('sync_pending', None)
+
+
+@event.listens_for(Session, 'after_commit')
+def _keep_versions(session):
+    session.info.pop('sync_allocated', None)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _skip_versions(session):
+    """Log the versions a rolled back transaction took, so pulls need not wait for them."""
+    if session.in_nested_transaction():
+        return  # A savepoint: the transaction may still commit what it allocated before it
+    allocated = session.info.pop('sync_allocated', None)
+    if not allocated:
+        return
+    now = datetime.utcnow()
+    try:
+        with session.get_bind().begin() as conn:
+            conn.execute(insert(ChangeLog.__table__), [
+                {'property_id': property_id, 'version': version, 'entity': '', 'entity_id': 0, 'op': SKIP,
+                 'changed_at': now, 'op_id': None}
+                for property_id, version in allocated
+            ])
+    except SQLAlchemyError:
+        logger.exception('Could not mark rolled back sync versions; pulls wait out the grace period')
+
+
+def touch(obj):
+    """Give a room or task a new version at the next flush, though none of its own columns changed.
+
+    For changes to the rows serialized with it (a room's checkouts and
+    tasks), so the room cache and ETags, which go by version, see them.
+    """
+    flag_modified(obj, 'status')
+
+
+def record(model, ids):
+    """Log changes made with a bulk UPDATE, which the flush hooks never see. Caller commits."""
+    ids = sorted(set(ids))
+    if not ids:
+        return
+    property_id = current_property_id()
+    conn = db.session.connection()
+    versions = allocate_versions(db.session(), property_id, len(ids))
+    now = datetime.utcnow()
+    rows = [{'property_id': property_id, 'version': version, 'entity': ENTITIES[model],
+             'entity_id': entity_id, 'op': 'upsert', 'changed_at': now, 'op_id': None}
+            for version, entity_id in zip(versions, ids)]
+    conn.execute(insert(ChangeLog.__table__), rows)
+    table = model.__table__
+    conn.execute(
+        update(table).where(table.c.id == bindparam('entity_id')).values(sync_version=bindparam('version')),
+        [{'entity_id': row['entity_id'], 'version': row['version']} for row in rows]
+    )
+
+
+def current_version():
+    """Version of the current property's latest change that pulls return."""
+    return db.session.execute(VISIBLE_VERSION, visible_version_params(current_property_id())).scalar() or 0
+
+
+def prune(before):
+    """Delete change log rows older than `before`. Handsets further behind get a snapshot. Caller commits.
+
+    The latest change is kept whatever its age, since current_version() reads it.
+    """
+    latest = db.session.query(func.max(ChangeLog.version)).filter(ChangeLog.op != SKIP).scalar()
+    if latest is None:
+        return 0
+    return ChangeLog.query.filter(
+        ChangeLog.changed_at < before, ChangeLog.version < latest
+    ).delete(synchronize_session=False)
+
+
+# --- Pull ---
+
+def task_query(housekeeper_id):
+    query = CleaningTask.query
+    if housekeeper_id is not None:
+        query = query.filter(CleaningTask.housekeeper_id == housekeeper_id)
+    return query
+
+
+def snapshot(housekeeper_id=None):
+    """Every room and the tasks a handset needs: open ones and those completed recently."""
+    version = current_version()  # Read first: changes racing the snapshot are pulled again, never missed
+    since = datetime.utcnow() - timedelta(hours=SNAPSHOT_TASK_HOURS)
+    tasks = task_query(housekeeper_id).filter(
+        (CleaningTask.status != 'completed') | (CleaningTask.completed_at >= since)
+    ).order_by(CleaningTask.id).all()
+    return {
+        'version': version,
+        'reset': True,
+        'rooms': Room.query.order_by(Room.id).all(),
+        'cleaning_tasks': tasks,
+        'deleted': {'rooms': [], 'cleaning_tasks': []},
+        'has_more': False,
+    }
+
+
+def pull(since=0, limit=DEFAULT_PULL_LIMIT, housekeeper_id=None):
+    """Rooms and tasks changed after version `since`.
+
+    Returns a dict with the current rows (rooms, cleaning_tasks), the ids of
+    deleted ones, and the version to pass as ``since`` next time. When
+    has_more is set, pull again straight away. reset means the result is a
+    full snapshot and the handset should replace what it has.
+    """
+    if since < 0 or not 1 <= limit <= MAX_PULL_LIMIT:
+        raise SyncError(f'since must be 0 or more and limit between 1 and {MAX_PULL_LIMIT}')
+    if since == 0:
+        return snapshot(housekeeper_id)
+    latest = current_version()
+    oldest = db.session.query(func.min(ChangeLog.version)).scalar()
+    if since > latest or since < (oldest if oldest is not None else latest + 1) - 1:
+        return snapshot(housekeeper_id)  # Changes after `since` were pruned, or the database was replaced
+
+    entries = ChangeLog.query.filter(
+        ChangeLog.version > since, ChangeLog.version <= latest, ChangeLog.op != SKIP
+    ).order_by(ChangeLog.version).limit(limit + 1).all()
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    changed = {'room': set(), 'cleaning_task': set()}
+    for entry in entries:
+        changed[entry.entity].add(entry.entity_id)
+
+    rooms = Room.query.filter(Room.id.in_(changed['room'])).order_by(Room.id).all() if changed['room'] else []
+    tasks = []
+    if changed['cleaning_task']:
+        tasks = task_query(housekeeper_id).filter(
+            CleaningTask.id.in_(changed['cleaning_task'])
+        ).order_by(CleaningTask.id).all()
+    # Deleted, or (with housekeeper_id) reassigned to someone else: gone from this handset's view
+    found_rooms = {room.id for room in rooms}
+    found_tasks = {task.id for task in tasks}
+    return {
+        'version': entries[-1].version if entries else since,
+        'reset': False,
+        'rooms': rooms,
+        'cleaning_tasks': tasks,
+        'deleted': {
+            'rooms': sorted(changed['room'] - found_rooms),
+            'cleaning_tasks': sorted(changed['cleaning_task'] - found_tasks),
+        },
+        'has_more': has_more,
+    }
+
+
+# --- Push ---
+
+def parse_time(value):
+    """Parse a change's ISO timestamp as naive UTC, like the rest of the database."""
+    try:
+        moment = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise SyncError(f'Invalid at: {value}. Use ISO format (e.g., 2024-08-01T10:00:00)')
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+def parse_change(change, base_version):
+    """Validate one queued change. Returns it normalised, or raises SyncError."""
+    if not isinstance(change, dict):
+        raise SyncError('Each change must be an object')
+    op_id = change.get('op_id')
+    if not isinstance(op_id, str) or not 0 < len(op_id) <= OP_ID_LENGTH:
+        raise SyncError(f'op_id must be a string of 1 to {OP_ID_LENGTH} characters')
+    kind = change.get('type')
+    if kind not in CHANGE_TYPES:
+        raise SyncError(f"Invalid type: {kind}. Use {' or '.join(CHANGE_TYPES)}")
+    key = 'task_id' if kind == 'task_status' else 'room_id'
+    statuses = transitions.TASK_TRANSITIONS if kind == 'task_status' else transitions.ROOM_TRANSITIONS
+    if not isinstance(change.get(key), int):
+        raise SyncError(f'{kind} changes need an integer {key}')
+    if change.get('status') not in statuses:
+        raise SyncError(f"Invalid status: {change.get('status')}")
+    base = change.get('base_version', base_version)
+    if not isinstance(base, int):
+        raise SyncError('base_version must be an integer')
+    return {
+        'op_id': op_id, 'type': kind, 'id': change[key], 'status': change['status'],
+        'at': parse_time(change.get('at')), 'base_version': base,
+    }
+
+
+def changed_after(room, base_version, own_ops=()):
+    """When someone else last changed the room after the handset's version, or None if nobody has.
+
+    Changes logged under own_ops, the ops of the batch being applied, are
+    the handset's own and do not count.
+    """
+    if room.sync_version <= base_version:
+        return None
+    changes = db.session.query(ChangeLog.changed_at, ChangeLog.op_id).filter(
+        ChangeLog.entity == 'room', ChangeLog.entity_id == room.id, ChangeLog.version > base_version
+    ).all()
+    if not changes:
+        return datetime.max  # Logged changes were pruned: take them as recent
+    others = [changed_at for changed_at, op_id in changes if op_id is None or op_id not in own_ops]
+    return max(others) if others else None
+
+
+def resolve_room(room, status, at, base_version, own_ops=()):
+    """Apply a handset's room status unless a newer desk change wins. Returns True if applied."""
+    if room.status == status:
+        return True
+    if not transitions.room_allows(room.status, status):
+        return False  # e.g. a guest is in the room: completing its task does not make it clean
+    last_change = changed_after(room, base_version, own_ops)
+    if last_change is not None and (room.status == 'occupied' or at < last_change):
+        return False
+    room.status = status
+    if status == 'clean':
+        room.last_cleaned = max(room.last_cleaned or at, at)
+        outbox.room_ready(room)
+    return True
+
+
+def apply_task_status(change, housekeeper_id, now, touched, own_ops):
+    task = CleaningTask.query.get(change['id'])
+    if task is None:
+        return {'result': 'not_found'}
+    if housekeeper_id is not None and task.housekeeper_id != housekeeper_id:
+        return {'result': 'rejected', 'error': 'Task is assigned to another housekeeper'}
+    if task.status == change['status'] or not transitions.task_allows(task.status, change['status']):
+        return {'result': 'stale', 'status': task.status}
+
+    at = min(change['at'], now)
+    task.status = change['status']
+    if not task.started_at:
+        task.started_at = at
+    touch(task.room)  # Its tasks are part of the room's row
+    touched['cleaning_tasks'][task.id] = task
+    result = {'result': 'applied', 'status': task.status}
+    if task.status == 'completed':
+        task.completed_at = max(at, task.started_at)
+        room = task.room
+        room.last_cleaned = max(room.last_cleaned or task.completed_at, task.completed_at)
+        resolve_room(room, 'clean', at, change['base_version'], own_ops)
+        touched['rooms'][room.id] = room
+        result['room_status'] = room.status
+        analytics.record_task_completion(task, room.room_number)
+    return result
+
+
+def apply_room_status(change, now, touched, own_ops):
+    room = Room.query.get(change['id'])
+    if room is None:
+        return {'result': 'not_found'}
+    if not transitions.room_allows(room.status, change['status']):
+        return {'result': 'rejected', 'error': f"Room is {room.status}, it cannot become {change['status']}",
+                'room_status': room.status}
+    applied = resolve_room(room, change['status'], min(change['at'], now), change['base_version'], own_ops)
+    touched['rooms'][room.id] = room
+    return {'result': 'applied' if applied else 'conflict', 'room_status': room.status}
+
+
+def apply_batch(changes, base_version=0, housekeeper_id=None):
+    """Apply a handset's queued changes in the order they were made. Caller commits.
+
+    Returns (results, rooms, tasks): one result per change, in the order
+    given, and the rooms and tasks that were touched.
+    """
+    if not isinstance(changes, list) or len(changes) > MAX_PUSH_CHANGES:
+        raise SyncError(f'changes must be a list of at most {MAX_PUSH_CHANGES} changes')
+    results = [None] * len(changes)
+    parsed = []
+    for index, change in enumerate(changes):
+        try:
+            parsed.append((index, parse_change(change, base_version)))
+        except SyncError as error:
+            op_id = change.get('op_id') if isinstance(change, dict) else None
+            results[index] = {'op_id': op_id, 'result': 'invalid', 'error': str(error)}
+
+    now = datetime.utcnow()
+    touched = {'rooms': {}, 'cleaning_tasks': {}}
+    own_ops = set()  # Ops of this batch applied so far, and the one being applied
+    session = db.session()
+    for index, change in sorted(parsed, key=lambda item: (item[1]['at'], item[1]['op_id'])):
+        if ChangeLog.query.filter_by(op_id=change['op_id']).first() is not None:
+            result = {'result': 'duplicate'}
+        else:
+            session.info['sync_op_id'] = change['op_id']
+            own_ops.add(change['op_id'])  # Queries autoflush this op's own changes under its op_id
+            try:
+                if change['type'] == 'task_status':
+                    result = apply_task_status(change, housekeeper_id, now, touched, own_ops)
+                else:
+                    result = apply_room_status(change, now, touched, own_ops)
+                session.flush()  # Log this op's changes under its op_id
+            finally:
+                session.info.pop('sync_op_id', None)
+        results[index] = dict(result, op_id=change['op_id'])
+    return results, list(touched['rooms'].values()), list(touched['cleaning_tasks'].values())
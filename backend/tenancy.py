@@ -0,0 +1,241 @@
+# backend/tenancy.py
+"""Serving several properties (hotels) from one deployment.
+
+Every route is also reachable as /properties/<code>/<route>; the plain
+routes serve the default property, so a single-hotel setup works as
+before. The property being served is kept in models.current_property for
+the duration of the request, and every ORM query of a PropertyScoped model
+gets a ``property_id = :current`` criterion added automatically, so one
+property never scans or returns another's rows. New rows take the current
+property's id as their default.
+
+Physical partitioning is optional (PROPERTY_PARTITIONING):
+
+- None: all properties share the tables, separated by property_id.
+- 'database': each property has its own database, PROPERTY_DATABASE_URL
+  with {code} filled in (e.g. sqlite:///hotel_{code}.db).
+- 'schema': each property has its own PostgreSQL schema, property_<code>,
+  on the main server.
+
+The properties table in the main database is the catalog, and the default
+property always lives there. Other properties' engines are opened on the
+first request for them, migrated and then kept for the life of the app.
+Each app from create_app() has its own registry in app.extensions.
+Code outside a request (CLI commands, jobs) is unscoped unless it runs
+inside use_property().
+"""
+import re
+import threading
+from contextlib import contextmanager
+
+from flask import current_app, g, jsonify, request
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import Session, with_loader_criteria
+from werkzeug.local import LocalProxy
+
+import db_profiles
+import migrate
+from models import db, current_property, DEFAULT_PROPERTY_ID, PropertyScoped
+
+URL_PREFIX = '/properties/<property_code>'
+PARTITIONING = (None, 'database', 'schema')
+CODE_PATTERN = re.compile(r'^[a-z0-9][a-z0-9-]{0,19}$')
+UNPREFIXED_ENDPOINTS = {'static', 'prometheus_metrics', 'api.ready'}  # Process-wide, not per property
+
+
+class PropertyContext:
+    """The property being served, and its engine when it has a database of its own."""
+    __slots__ = ('id', 'code', 'name', 'engine')
+
+    def __init__(self, id, code, name, engine=None):
+        self.id = id
+        self.code = code
+        self.name = name
+        self.engine = engine
+
+
+class PropertyRegistry:
+    """Property catalog cache and lazily opened per-property engines."""
+
+    def __init__(self):
+        self.app = None
+        self._lock = threading.Lock()
+        self._by_code = {}
+        self._by_id = {}
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['tenancy'] = self
+        app.config.setdefault('PROPERTY_PARTITIONING', None)
+        app.config.setdefault('PROPERTY_DATABASE_URL', None)
+        mode = app.config['PROPERTY_PARTITIONING']
+        if mode not in PARTITIONING:
+            raise db_profiles.DatabaseConfigError(f'Invalid PROPERTY_PARTITIONING: {mode}')
+        if mode == 'database' and '{code}' not in (app.config['PROPERTY_DATABASE_URL'] or ''):
+            raise db_profiles.DatabaseConfigError('PROPERTY_DATABASE_URL must contain {code}')
+        if mode == 'schema' and app.config['DATABASE_PROFILE'] != 'postgresql':
+            raise db_profiles.DatabaseConfigError('Schema partitioning needs the postgresql profile')
+
+    def _catalog(self, where, value):
+        with db.engine.connect() as conn:  # Always the main database
+            return conn.execute(text(f"SELECT id, code, name FROM properties WHERE {where} = :value"),
+                                {'value': value}).first()
+
+    def _lookup(self, where, value, cache):
+        context = cache.get(value)
+        if context is not None:
+            return context
+        row = self._catalog(where, value)
+        if row is None:
+            return None
+        with self._lock:
+            context = self._by_id.get(row.id)
+            if context is None:
+                context = PropertyContext(row.id, row.code, row.name, self._open(row))
+                self._by_id[row.id] = self._by_code[row.code] = context
+            return context
+
+    def get(self, code):
+        """Context for a property code, or None if there is no such property."""
+        return self._lookup('code', code, self._by_code)
+
+    def get_by_id(self, property_id):
+        return self._lookup('id', property_id, self._by_id)
+
+    def default(self):
+        return self.get_by_id(DEFAULT_PROPERTY_ID)
+
+    def cached(self, code=None):
+        """Context for a property code (None: the default property) if it was looked up before, else None."""
+        return self._by_code.get(code) if code else self._by_id.get(DEFAULT_PROPERTY_ID)
+
+    def all(self):
+        with db.engine.connect() as conn:
+            ids = [row[0] for row in conn.execute(text("SELECT id FROM properties ORDER BY id"))]
+        return [self.get_by_id(property_id) for property_id in ids]
+
+    def location(self, code):
+        """(database URL, PostgreSQL schema or None) of a partitioned property."""
+        config = self.app.config
+        if config['PROPERTY_PARTITIONING'] == 'database':
+            return config['PROPERTY_DATABASE_URL'].format(code=code), None
+        return config['SQLALCHEMY_DATABASE_URI'], 'property_' + code.replace('-', '_')
+
+    def _open(self, row):
+        """Create, migrate and return the engine of a partitioned property (None when shared)."""
+        config = self.app.config
+        mode = config['PROPERTY_PARTITIONING']
+        if mode is None or row.id == DEFAULT_PROPERTY_ID:
+            return None
+        options = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+        options['connect_args'] = dict(options.get('connect_args', {}))
+        url, schema = self.location(row.code)
+        if mode == 'database':
+            if db_profiles.profile_for(url) != config['DATABASE_PROFILE']:
+                raise db_profiles.DatabaseConfigError(f'{url} does not match the {config["DATABASE_PROFILE"]} profile')
+        else:
+            with db.engine.begin() as conn:
+                conn.execute(text(f'CREATE SCHEMA IF NOT EXISTS {schema}'))
+            options['connect_args']['options'] = (
+                options['connect_args'].get('options', '') + f' -c search_path={schema}'
+            ).strip()
+        engine = create_engine(url, **options)
+        db_profiles.install(engine, config)
+        migrate.upgrade(engine)
+        with engine.begin() as conn:
+            # The partition's own properties row, so property_id foreign keys resolve there too
+            if conn.execute(text("SELECT 1 FROM properties WHERE id = :id"), {'id': row.id}).first() is None:
+                conn.execute(text("INSERT INTO properties (id, code, name) VALUES (:id, :code, :name)"),
+                             {'id': row.id, 'code': row.code, 'name': row.name})
+        return engine
+
+
+def registry_for(app):
+    """An app's PropertyRegistry, for code running outside its app context (asgi.py, outbox.py)."""
+    return app.extensions['tenancy']
+
+
+registry = LocalProxy(lambda: registry_for(current_app))  # The current app's PropertyRegistry
+
+
+@contextmanager
+def use_property(context):
+    """Scope queries and new rows to a property outside of a request."""
+    token = current_property.set(context)
+    try:
+        yield context
+    finally:
+        current_property.reset(token)
+
+
+class PerProperty:
+    """One instance of a helper (cache, index) for each app and property, created on first use.
+
+    The instances live in app.extensions[name], so every app starts without
+    any; factory(app, context) builds one. Attribute access is forwarded to
+    the current property's instance in the current app.
+    """
+
+    def __init__(self, name, factory):
+        self.name = name
+        self._factory = factory
+        self._lock = threading.Lock()
+
+    def get(self, app=None):
+        """The current property's instance; pass `app` when there is no app context."""
+        app = app or current_app._get_current_object()
+        context = current_property.get() or registry_for(app).default()
+        instances = app.extensions.setdefault(self.name, {})
+        instance = instances.get(context.id)
+        if instance is None:
+            with self._lock:
+                instance = instances.get(context.id)
+                if instance is None:
+                    instance = instances[context.id] = self._factory(app, context)
+        return instance
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _scope_to_property(execute_state):
+    context = current_property.get()
+    if context is None or execute_state.is_column_load or execute_state.is_relationship_load:
+        return  # Lazy and eager loads follow from an already scoped parent
+    if execute_state.is_select or execute_state.is_update or execute_state.is_delete:
+        property_id = context.id
+        execute_state.statement = execute_state.statement.options(with_loader_criteria(
+            PropertyScoped, lambda cls: cls.property_id == property_id, include_aliases=True
+        ))
+
+
+def add_property_routes(app):
+    """Register /properties/<code>/... for every route defined so far."""
+    for rule in list(app.url_map.iter_rules()):
+        if rule.endpoint in UNPREFIXED_ENDPOINTS or rule.rule.startswith('/properties'):
+            continue
+        app.add_url_rule(URL_PREFIX + rule.rule, endpoint=rule.endpoint,
+                         methods=sorted(rule.methods - {'HEAD', 'OPTIONS'}))
+
+
+def init_app(app):
+    PropertyRegistry().init_app(app)
+
+    @app.url_value_preprocessor
+    def pop_property_code(endpoint, values):
+        g.property_code = values.pop('property_code', None) if values else None
+
+    @app.before_request
+    def enter_property():
+        if request.endpoint in UNPREFIXED_ENDPOINTS:
+            return  # Process-wide; works before the properties table exists
+        code = g.pop('property_code', None)
+        context = registry.get(code) if code else registry.default()
+        if context is None:
+            return jsonify({'error': f'Property {code} not found'}), 404
+        current_property.set(context)
+
+    @app.teardown_request
+    def leave_property(error):
+        current_property.set(None)
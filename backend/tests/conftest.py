@@ -0,0 +1,29 @@
+# backend/tests/conftest.py
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [BACKEND_DIR, os.path.dirname(BACKEND_DIR)]
+
+import database  # noqa: E402
+
+sys.modules.setdefault('models', database)  # The backend imports the root database.py as models
+
+import app as appmod  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    """A migrated, seeded app on a private in-memory database."""
+    app = appmod.create_app({'DATABASE_URL': 'sqlite://'})
+    with app.app_context():
+        appmod.init_db()
+        appmod.seed_db()
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
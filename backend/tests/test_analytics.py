@@ -0,0 +1,27 @@
+# backend/tests/test_analytics.py
+from datetime import datetime, timedelta
+
+import analytics
+import tenancy
+from models import db
+
+
+def test_percentiles_stay_within_the_observed_times():
+    counts = analytics.empty_histogram()
+    counts[analytics.bin_index(10 / 60)] += 1  # One 10 second task
+    assert analytics.percentile(counts, 0.5) == 2.5  # Bin midpoint without bounds
+    assert analytics.percentile(counts, 0.5, 10 / 60, 10 / 60) == 0.2
+    counts = analytics.empty_histogram()
+    counts[-1] += 1  # Beyond the last edge
+    assert analytics.percentile(counts, 0.5, 2000.0, 2000.0) == 2000.0
+
+
+def test_report_includes_the_bucket_containing_start(app):
+    completed = datetime(2026, 3, 2, 9, 0)
+    with app.app_context(), tenancy.use_property(tenancy.registry.default()):
+        analytics.apply_buckets(analytics.aggregate([('cleaning', completed, '1', 1, 0.25)]))
+        db.session.commit()
+        report = analytics.housekeeper_report(completed - timedelta(hours=1), completed + timedelta(hours=1))
+    cleaning = report[0]['cleaning']
+    assert cleaning['count'] == 1
+    assert cleaning['avg_minutes'] == cleaning['p50_minutes'] == cleaning['p90_minutes'] == 0.2
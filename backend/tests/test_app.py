@@ -0,0 +1,19 @@
+# backend/tests/test_app.py
+import app as appmod
+from models import db, Room, DEFAULT_PROPERTY_ID
+
+
+def test_apps_do_not_share_room_boards_or_readiness(app, client):
+    assert client.get('/ready').status_code == 200  # Warms the first app's room cache
+    assert len(client.get('/rooms').get_json()['rooms']) == 10
+
+    other = appmod.create_app({'DATABASE_URL': 'sqlite://'})
+    assert other.test_client().get('/ready').status_code == 503  # Its own warm-up, on an empty database
+    with other.app_context():
+        appmod.init_db()
+        db.session.add(Room(room_number='999'))
+        db.session.commit()
+    for _ in range(2):  # Loaded, then served from the second app's own cache
+        assert [room['room_number'] for room in other.test_client().get('/rooms').get_json()['rooms']] == ['999']
+    assert len(client.get('/rooms').get_json()['rooms']) == 10
+    assert other.extensions['room_cache'][DEFAULT_PROPERTY_ID] is not app.extensions['room_cache'][DEFAULT_PROPERTY_ID]
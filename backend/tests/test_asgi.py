@@ -0,0 +1,113 @@
+# backend/tests/test_asgi.py
+import asyncio
+import importlib
+import json
+
+import pytest
+
+import app as appmod
+
+for module in ('a2wsgi', 'aiosqlite', 'greenlet'):  # The ASGI entry point's optional dependencies
+    pytest.importorskip(module)
+
+
+@pytest.fixture(scope='module')
+def asgi(tmp_path_factory):
+    """asgi.py serves the app built from the environment: point it at a fresh database first."""
+    patch = pytest.MonkeyPatch()
+    patch.setenv('DATABASE_URL', f"sqlite:///{tmp_path_factory.mktemp('asgi') / 'hotel.db'}")
+    patch.setattr(appmod, '_app', None)
+    module = importlib.import_module('asgi')
+    with module.wsgi.app.app_context():
+        appmod.init_db()
+        appmod.seed_db()
+    yield module
+    patch.undo()
+
+
+def run(asgi, scenario):
+    async def main():
+        try:
+            return await scenario
+        finally:
+            await asgi.engines.dispose()  # Async engines belong to this event loop
+    return asyncio.run(main())
+
+
+async def call(asgi, path, method='GET', body=None, headers=()):
+    """Send one request to the ASGI app. Returns (status, headers, body)."""
+    path, _, query = path.partition('?')
+    payload = json.dumps(body).encode() if body is not None else b''
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'scheme': 'http',
+        'method': method, 'path': path, 'raw_path': path.encode(), 'query_string': query.encode(),
+        'root_path': '', 'server': ('testserver', 80), 'client': ('testclient', 50000),
+        'headers': [(name.lower().encode(), value.encode()) for name, value in
+                    [('Host', 'testserver'), ('Content-Type', 'application/json'),
+                     ('Content-Length', str(len(payload))), *headers]],
+    }
+    requests = [{'type': 'http.request', 'body': payload, 'more_body': False}]
+    messages = []
+
+    async def receive():
+        return requests.pop(0) if requests else {'type': 'http.disconnect'}
+
+    async def send(message):
+        messages.append(message)
+
+    await asgi.app(scope, receive, send)
+    start = messages[0]
+    response_headers = {name.decode().lower(): value.decode() for name, value in start['headers']}
+    return start['status'], response_headers, b''.join(message.get('body', b'') for message in messages[1:])
+
+
+def test_board_and_room_are_served_async_with_etags(asgi):
+    async def scenario():
+        status, headers, body = await call(asgi, '/rooms')
+        assert status == 200 and len(json.loads(body)['rooms']) == 10
+        status, _, _ = await call(asgi, '/rooms', headers=[('If-None-Match', headers['etag'])])
+        assert status == 304
+
+        status, headers, body = await call(asgi, '/rooms/1')
+        assert status == 200 and json.loads(body)['room_number'] == '101'
+        assert (await call(asgi, '/rooms/1', headers=[('If-None-Match', headers['etag'])]))[0] == 304
+        assert (await call(asgi, '/rooms/999'))[0] == 404
+        assert (await call(asgi, '/properties/nowhere/rooms'))[0] == 404
+        status, _, body = await call(asgi, '/properties/main/rooms?view=summary')
+        assert status == 200 and len(json.loads(body)['rooms']) == 10
+    run(asgi, scenario())
+
+
+def test_writes_go_through_flask_and_reach_the_async_cache(asgi):
+    async def scenario():
+        _, before, _ = await call(asgi, '/rooms')
+        status, _, _ = await call(asgi, '/rooms/2', 'PUT', {'status': 'checked_out'})
+        assert status == 200
+        status, after, body = await call(asgi, '/rooms')
+        assert after['etag'] != before['etag']
+        assert {room['id']: room['status'] for room in json.loads(body)['rooms']}[2] == 'checked_out'
+        assert (await call(asgi, '/rooms?status=checked_out'))[0] == 200  # Filtered: handed to Flask
+    run(asgi, scenario())
+
+
+def test_sync_long_poll_returns_once_something_changes(asgi):
+    async def scenario():
+        since = json.loads((await call(asgi, '/sync'))[2])['version']
+        waiting = asyncio.ensure_future(call(asgi, f'/sync?since={since}&wait=10'))
+        await asyncio.sleep(0.2)
+        assert not waiting.done()
+        assert (await call(asgi, '/rooms/3', 'PUT', {'status': 'checked_out'}))[0] == 200
+        status, _, body = await asyncio.wait_for(waiting, 5)
+        assert status == 200
+        assert [room['id'] for room in json.loads(body)['rooms']] == [3]
+    run(asgi, scenario())
+
+
+def test_event_stream_replays_the_backlog(asgi):
+    async def scenario():
+        assert (await call(asgi, '/rooms/4', 'PUT', {'status': 'checked_out'}))[0] == 200
+        status, headers, body = await call(asgi, '/events?since=0&room_id=4')
+        assert status == 200 and headers['content-type'].startswith('text/event-stream')
+        assert body.startswith(b'retry: 3000') and b'"checked_out"' in body
+        assert (await call(asgi, '/events?room_id=x'))[0] == 400
+    run(asgi, scenario())
@@ -0,0 +1,58 @@
+# backend/tests/test_benchmarks.py
+import os
+import random
+import sys
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, text
+
+import app as appmod
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                                'benchmarks'))
+
+import datagen  # noqa: E402
+import load_test  # noqa: E402
+
+NOW = datetime(2030, 6, 1, 9)
+TABLES = ('rooms', 'housekeepers', 'checkouts', 'cleaning_tasks', 'reservations')
+
+
+def dump(url):
+    engine = create_engine(url)
+    with engine.connect() as conn:
+        tables = {table: conn.execute(text(f'SELECT * FROM {table} ORDER BY id')).all() for table in TABLES}
+    engine.dispose()
+    return tables
+
+
+@pytest.fixture
+def hotel(tmp_path):
+    url = f"sqlite:///{tmp_path / 'hotel.db'}"
+    datagen.generate(url, rooms=60, days=5, seed=3, now=NOW)
+    return url
+
+
+def test_datagen_is_reproducible(hotel, tmp_path):
+    again = f"sqlite:///{tmp_path / 'again.db'}"
+    counts = datagen.generate(again, rooms=60, days=5, seed=3, now=NOW)
+    assert dump(again) == dump(hotel)
+    assert counts['rooms'] == 60 and counts['checkouts'] > 0
+
+
+def test_every_scenario_is_served(hotel):
+    fixtures = load_test.load_fixtures(hotel)
+    client = appmod.create_app({'DATABASE_URL': hotel}).test_client()
+    for name, scenario in load_test.SCENARIOS.items():
+        method, path, body = scenario(fixtures, random.Random(1))
+        assert client.open(path, method=method, json=body).status_code < 500, name
+
+
+def test_compare_reports_slower_and_chattier_scenarios():
+    baseline = {'board': {'p50_ms': 1.0, 'throughput_rps': 100, 'sql_per_request': 1}}
+    assert load_test.compare({'board': {'p50_ms': 1.05, 'throughput_rps': 98, 'sql_per_request': 1}},
+                             baseline, 0.1) == []
+    regressions = load_test.compare({'board': {'p50_ms': 2.0, 'throughput_rps': 50, 'sql_per_request': 3}},
+                                    baseline, 0.1)
+    assert len(regressions) == 3
@@ -0,0 +1,54 @@
+# backend/tests/test_cache.py
+from datetime import datetime
+
+import app as appmod
+import tenancy
+from cache import RoomCache
+from models import db, Checkout
+
+
+def warm_cache():
+    cache = RoomCache()
+    cache.board('full', lambda: {1: {'id': 1, 'version': 5, 'status': 'clean'}}, lambda view, rooms: b'')
+    return cache
+
+
+def test_older_row_never_replaces_newer():
+    cache = warm_cache()
+    cache.write_through(1, lambda room_id: {'id': 1, 'version': 7, 'status': 'occupied'})
+    version, data = cache.room(1)
+    assert data['status'] == 'occupied'
+
+    assert cache.write_through(1, lambda room_id: {'id': 1, 'version': 6, 'status': 'cleaning'}) == version  # Late
+    assert cache.room(1) == (version, data)
+
+
+def test_unchanged_row_publishes_nothing():
+    cache = warm_cache()
+    version, data = cache.room(1)
+    assert cache.write_through(1, lambda room_id: dict(data)) == version
+    assert cache.room(1) == (version, data)
+
+
+def test_write_through_on_cold_cache_only_bumps_version():
+    cache = RoomCache()
+    before = cache.version()
+    assert cache.write_through(1, lambda room_id: {'id': 1, 'version': 1}) > before
+    assert cache.room(1)[1] is None
+
+
+def test_late_checkout_updates_the_cached_room(app, client):
+    with app.app_context(), tenancy.use_property(tenancy.registry.default()):
+        checkout = Checkout(room_id=1, scheduled_checkout=datetime(2030, 5, 1, 11))
+        db.session.add(checkout)
+        db.session.commit()
+        checkout_id = checkout.id
+    client.get('/rooms')  # Loads the board
+
+    assert client.put(f'/checkouts/{checkout_id}/late', json={'requested_time': '2030-05-01T13:00:00'}).status_code == 200
+    assert client.put(f'/checkouts/{checkout_id}/approve_late', json={'approved': True}).status_code == 200
+    with app.app_context(), tenancy.use_property(tenancy.registry.default()):
+        _, data = appmod.room_cache.room(1)
+    assert data is not None  # Updated in place, not dropped
+    assert data['checkouts'][0]['late_checkout_approved'] is True
+    assert data['checkouts'][0]['late_checkout_time'] == datetime(2030, 5, 1, 13)
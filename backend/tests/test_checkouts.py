@@ -0,0 +1,67 @@
+# backend/tests/test_checkouts.py
+import json
+from datetime import datetime
+
+import pytest
+
+import app as appmod
+import tenancy
+from models import db, Room, Checkout
+
+
+@pytest.fixture
+def app(app):
+    with app.app_context(), tenancy.use_property(tenancy.registry.default()):
+        for room_id in range(1, 6):
+            db.session.add(Checkout(room_id=room_id, scheduled_checkout=datetime(2030, 1, 2, 11)))
+        db.session.add(Checkout(room_id=1, scheduled_checkout=datetime(2030, 1, 1, 11)))  # An older stay
+        db.session.commit()
+    return app
+
+
+def room_statuses(app):
+    with app.app_context(), tenancy.use_property(tenancy.registry.default()):
+        return {room.room_number: room.status for room in Room.query}
+
+
+def test_batch_with_failures_answers_207_and_applies_the_rest(app, client):
+    response = client.post('/checkouts/batch', json=[
+        {'room_number': '101', 'actual_checkout': '2030-01-02T10:30:00'},
+        {'room_number': '999', 'actual_checkout': '2030-01-02T10:30:00'},
+        {'room_number': '102', 'actual_checkout': 'this morning'},
+        'not a record',
+        {'room_number': '103', 'actual_checkout': '2030-01-02T10:45:00'},
+    ])
+    assert response.status_code == 207
+    body = response.get_json()
+    assert (body['recorded'], body['failed']) == (2, 3)
+    assert [result['status'] for result in body['results']] == [200, 404, 400, 400, 200]
+
+    statuses = room_statuses(app)
+    assert statuses['101'] == statuses['103'] == 'checked_out' and statuses['102'] == 'occupied'
+    with app.app_context(), tenancy.use_property(tenancy.registry.default()):
+        checkout = db.session.get(Checkout, body['results'][0]['checkout_id'])
+        assert checkout.scheduled_checkout == datetime(2030, 1, 2, 11)  # The latest stay, not the older one
+        assert checkout.actual_checkout == datetime(2030, 1, 2, 10, 30)
+
+
+def test_ndjson_batch_that_fully_succeeds_answers_200(app, client):
+    lines = [json.dumps({'room_number': f'10{n}', 'actual_checkout': '2030-01-02T09:00:00'}) for n in (4, 5)]
+    response = client.post('/checkouts/batch', data='\n'.join(lines) + '\n', content_type='application/x-ndjson')
+    assert response.status_code == 200 and response.get_json()['recorded'] == 2
+    assert room_statuses(app)['105'] == 'checked_out'
+
+
+@pytest.mark.parametrize('data, content_type', [
+    ('{"room_number": "101"}\nnot json\n', 'application/x-ndjson'),
+    ('{"room_number": "101"}', 'application/json'),
+])
+def test_malformed_batch_body_is_rejected(client, data, content_type):
+    assert client.post('/checkouts/batch', data=data, content_type=content_type).status_code == 400
+
+
+def test_oversized_batch_is_rejected_before_any_work(app, client, monkeypatch):
+    monkeypatch.setattr(appmod, 'MAX_BATCH_SIZE', 2)
+    records = [{'room_number': f'10{n}', 'actual_checkout': '2030-01-02T09:00:00'} for n in (1, 2, 3)]
+    assert client.post('/checkouts/batch', json=records).status_code == 413
+    assert set(room_statuses(app).values()) == {'occupied'}
@@ -0,0 +1,26 @@
+# backend/tests/test_compression.py
+"""Each content-coding of a response gets its own strong ETag."""
+import pytest
+
+
+@pytest.fixture
+def app(app):
+    app.config['COMPRESS_MIN_BYTES'] = 1
+    return app
+
+
+def test_compressed_board_has_its_own_etag(client):
+    plain = client.get('/rooms', headers={'Accept-Encoding': 'identity'})
+    coded = client.get('/rooms', headers={'Accept-Encoding': 'gzip'})
+    assert coded.headers['Content-Encoding'] == 'gzip'
+    assert coded.get_etag() == (plain.get_etag()[0] + '-gzip', False)
+
+    revalidated = client.get('/rooms', headers={'Accept-Encoding': 'gzip', 'If-None-Match': coded.headers['ETag']})
+    assert revalidated.status_code == 304 and revalidated.headers['ETag'] == coded.headers['ETag']
+
+
+def test_if_match_accepts_a_compressed_etag(client):
+    etag = client.get('/rooms/1', headers={'Accept-Encoding': 'gzip'}).headers['ETag']
+    assert etag.endswith('-gzip"')
+    assert client.put('/rooms/1', json={'status': 'checked_out'}, headers={'If-Match': etag}).status_code == 200
+    assert client.put('/rooms/1', json={'status': 'clean'}, headers={'If-Match': etag}).status_code == 412
@@ -0,0 +1,98 @@
+# backend/tests/test_db_profiles.py
+import threading
+
+import pytest
+from flask import Flask
+from sqlalchemy import create_engine
+
+import db_profiles
+from db_profiles import DatabaseConfigError
+
+
+@pytest.fixture(autouse=True)
+def clean_environment(monkeypatch):
+    for key in ('DATABASE_URL', 'DATABASE_PROFILE', *db_profiles.DEFAULTS):
+        monkeypatch.delenv(key, raising=False)
+
+
+def configured(url, **config):
+    app = Flask(__name__)
+    app.config.update(config)
+    db_profiles.configure(app, url)
+    return app.config
+
+
+def test_profile_follows_the_url_scheme():
+    assert db_profiles.profile_for('postgres://db/hotel') == 'postgresql'
+    assert db_profiles.profile_for('postgresql+psycopg://db/hotel') == 'postgresql'
+    assert db_profiles.profile_for('sqlite:///hotel.db') == 'sqlite'
+    with pytest.raises(DatabaseConfigError):
+        db_profiles.profile_for('mysql://db/hotel')
+
+
+def test_postgresql_profile_sizes_the_pool_and_sets_a_statement_timeout(monkeypatch):
+    monkeypatch.setenv('DB_POOL_SIZE', '4')
+    config = configured('postgres://db/hotel')
+    assert config['SQLALCHEMY_DATABASE_URI'] == 'postgresql://db/hotel'
+    options = config['SQLALCHEMY_ENGINE_OPTIONS']
+    assert options['pool_size'] == 4 and options['pool_pre_ping']
+    assert options['connect_args']['options'] == '-c statement_timeout=5000'
+    assert 'options' not in configured('postgresql://db/hotel', DB_STATEMENT_TIMEOUT_MS=0)[
+        'SQLALCHEMY_ENGINE_OPTIONS']['connect_args']
+
+
+def test_profile_must_match_the_url():
+    with pytest.raises(DatabaseConfigError):
+        configured('sqlite:///hotel.db', DATABASE_PROFILE='postgresql')
+    with pytest.raises(DatabaseConfigError):
+        configured('sqlite:///hotel.db', DATABASE_PROFILE='oracle')
+
+
+def test_async_url_uses_the_profile_driver():
+    assert db_profiles.async_url('sqlite:///hotel.db') == 'sqlite+aiosqlite:///hotel.db'
+    assert db_profiles.async_url('postgresql+psycopg://db/hotel') == 'postgresql+asyncpg://db/hotel'
+
+
+def test_sqlite_file_database_runs_in_wal_mode(tmp_path):
+    url = f"sqlite:///{tmp_path / 'hotel.db'}"
+    config = configured(url, SQLITE_BUSY_TIMEOUT_MS=2000)
+    engine = create_engine(url, **config['SQLALCHEMY_ENGINE_OPTIONS'])
+    db_profiles.install(engine, config)
+    settings = db_profiles.validate(engine, config)
+    assert settings['journal_mode'] == 'wal'
+    assert settings['busy_timeout_ms'] == 2000
+    assert settings['profile'] == 'sqlite'
+
+
+def test_unreachable_database_is_a_config_error(tmp_path):
+    url = f"sqlite:///{tmp_path / 'missing' / 'hotel.db'}"
+    with pytest.raises(DatabaseConfigError):
+        db_profiles.validate(create_engine(url), configured(url))
+
+
+def test_writers_take_turns(tmp_path):
+    url = f"sqlite:///{tmp_path / 'hotel.db'}"
+    config = configured(url)
+    engine = create_engine(url, **config['SQLALCHEMY_ENGINE_OPTIONS'])
+    db_profiles.install(engine, config)
+    with engine.begin() as conn:
+        conn.exec_driver_sql('CREATE TABLE notes (body TEXT)')
+
+    second_wrote = threading.Event()
+
+    def second_writer():
+        with engine.begin() as conn:
+            conn.exec_driver_sql("INSERT INTO notes VALUES ('second')")
+            second_wrote.set()
+
+    with engine.connect() as first:
+        first.exec_driver_sql("INSERT INTO notes VALUES ('first')")
+        thread = threading.Thread(target=second_writer)
+        thread.start()
+        assert not second_wrote.wait(0.3)  # Queued behind the open write transaction
+        first.exec_driver_sql('SELECT count(*) FROM notes')  # Reads don't need the lock
+        first.commit()
+    thread.join(5)
+    assert second_wrote.is_set()
+    with engine.connect() as conn:
+        assert [row[0] for row in conn.exec_driver_sql('SELECT body FROM notes')] == ['first', 'second']
@@ -0,0 +1,25 @@
+# backend/tests/test_dispatcher.py
+import dispatcher
+import tenancy
+from models import db, Room, CleaningTask, ChangeLog
+
+
+def test_room_changed_after_planning_is_skipped(app):
+    with app.app_context(), tenancy.use_property(tenancy.registry.default()):
+        Room.query.filter(Room.room_number.in_(['101', '102'])).update({Room.status: 'checked_out'})
+        db.session.commit()
+        assignments, _ = dispatcher.plan(dispatcher.load_candidates(), dispatcher.load_staff())
+        assert {a.room_number for a in assignments} == {'101', '102'}
+
+        Room.query.filter_by(room_number='102').update({Room.status: 'occupied'})  # The guest came back
+        db.session.commit()
+        room = Room.query.filter_by(room_number='102').one()
+        logged = ChangeLog.query.filter_by(entity='room', entity_id=room.id).count()
+
+        applied, tasks, skipped = dispatcher.apply(assignments)
+        db.session.commit()
+        assert [a.room_number for a in applied] == ['101'] and len(tasks) == 1
+        assert [a.room_number for a in skipped] == ['102']
+        assert CleaningTask.query.filter_by(room_id=room.id).count() == 0
+        assert ChangeLog.query.filter_by(entity='room', entity_id=room.id).count() == logged
+        assert db.session.get(Room, room.id).status == 'occupied'
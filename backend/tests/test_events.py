@@ -0,0 +1,52 @@
+# backend/tests/test_events.py
+import json
+
+import pytest
+
+import app as appmod
+from events import EventBus
+
+
+@pytest.fixture
+def bus(monkeypatch):
+    bus = EventBus(history_size=3)
+    monkeypatch.setattr(appmod, 'bus', bus)
+    return bus
+
+
+def messages(client, count, **headers):
+    """The first `count` messages of GET /events, as (event, data) pairs."""
+    response = client.get('/events', headers=headers, buffered=False)
+    assert response.status_code == 200
+    received, text = [], ''
+    chunks = iter(response.response)
+    while len(received) < count:
+        text += next(chunks).decode()
+        *blocks, text = text.split('\n\n')
+        for block in blocks:
+            fields = dict(line.split(': ', 1) for line in block.split('\n') if ': ' in line)
+            if 'event' in fields:
+                received.append((fields['event'], json.loads(fields['data'])))
+    response.close()
+    return received
+
+
+def test_resume_replays_events_after_the_last_id(client, bus):
+    for room_id in (1, 2, 3):
+        bus.publish('room', property_id=1, room_id=room_id)
+    assert [data['room_id'] for _, data in messages(client, 2, **{'Last-Event-ID': '1'})] == [2, 3]
+
+
+def test_expired_id_asks_the_client_to_resync(client, bus):
+    for room_id in range(1, 6):
+        bus.publish('room', property_id=1, room_id=room_id)  # Events 1 and 2 fall out of history
+    received = messages(client, 4, **{'Last-Event-ID': '1'})
+    assert received[0] == ('resync', {'seq': 5})
+    assert [data['seq'] for _, data in received[1:]] == [3, 4, 5]
+
+
+@pytest.mark.parametrize('value', ['abc', '-1', '1.5', '١'])
+def test_malformed_last_event_id_is_rejected(client, bus, value):
+    response = client.get('/events', headers={'Last-Event-ID': value})
+    assert response.status_code == 400
+    assert 'non-negative integer' in response.get_json()['error']
@@ -0,0 +1,64 @@
+# backend/tests/test_export.py
+import csv
+import io
+from datetime import datetime, timedelta
+
+import pytest
+
+import export
+import tenancy
+from models import db, CleaningTask
+
+
+@pytest.fixture
+def app(app):
+    with app.app_context(), tenancy.use_property(tenancy.registry.default()):
+        start = datetime(2030, 1, 1)
+        db.session.add_all(CleaningTask(room_id=task % 10 + 1, housekeeper_id=1, status='completed',
+                                        started_at=start + timedelta(hours=task),
+                                        completed_at=start + timedelta(hours=task, minutes=30)) for task in range(48))
+        db.session.add(CleaningTask(room_id=1, housekeeper_id=2))  # Open: no completed_at
+        db.session.commit()
+    return app
+
+
+def test_chunks_cover_every_row_once(app):
+    with app.app_context(), tenancy.use_property(tenancy.registry.default()):
+        chunks = list(export.iter_chunks('cleaning_tasks', chunk_size=7))
+    assert [len(chunk) for chunk in chunks] == [7] * 7
+    ids = [row[0] for chunk in chunks for row in chunk]
+    assert ids == sorted(set(ids))
+
+
+def test_csv_export_streams_the_date_range(client):
+    response = client.get('/exports/cleaning_tasks?format=csv&start=2030-01-01T12:00:00&end=2030-01-02T00:00:00')
+    assert response.status_code == 200 and response.is_streamed
+    assert response.headers['Content-Disposition'] == 'attachment; filename=cleaning_tasks.csv'
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert len(rows) == 12 and rows[0]['completed_at'] == '2030-01-01T12:30:00'
+
+
+@pytest.mark.parametrize('fmt', ['arrow', 'parquet'])
+def test_arrow_exports_read_back(client, fmt):
+    pa = pytest.importorskip('pyarrow')
+    body = client.get(f'/exports/cleaning_tasks?format={fmt}').get_data()
+    if fmt == 'arrow':
+        table = pa.ipc.open_stream(body).read_all()
+    else:
+        import pyarrow.parquet as pq
+        table = pq.read_table(pa.BufferReader(body))
+    assert table.num_rows == 49
+    assert table.column('completed_at').null_count == 1
+    assert table.column('completed_at')[0].as_py() == datetime(2030, 1, 1, 0, 30)
+
+
+def test_missing_arrow_dependency_fails_before_streaming(client, monkeypatch):
+    def missing():
+        raise export.MissingDependency('Arrow and Parquet exports need the pyarrow and numpy packages')
+    monkeypatch.setattr(export, 'import_arrow', missing)
+    assert client.get('/exports/checkouts?format=parquet').status_code == 501
+
+
+@pytest.mark.parametrize('url', ['/exports/cleaning_tasks?format=xlsx', '/exports/guests?format=csv'])
+def test_unknown_format_or_dataset_is_rejected(client, url):
+    assert client.get(url).status_code == 400
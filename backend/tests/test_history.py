@@ -0,0 +1,19 @@
+# backend/tests/test_history.py
+from datetime import datetime, timedelta
+
+import history
+import tenancy
+from models import db, Room
+
+
+def test_replay_uses_the_last_cleaned_time_written(app):
+    cleaned = datetime.utcnow() - timedelta(hours=3)  # e.g. a completion synced late from a handset
+    with app.app_context(), tenancy.use_property(tenancy.registry.default()):
+        room = Room.query.filter_by(room_number='101').one()
+        room.last_cleaned = cleaned
+        db.session.commit()
+
+        now = datetime.utcnow()
+        assert history.states_at(now, room.id)[room.id]['last_cleaned'] == cleaned
+        history.take_snapshots(now + timedelta(days=2))
+        assert history.states_at(now + timedelta(days=2), room.id)[room.id]['last_cleaned'] == cleaned
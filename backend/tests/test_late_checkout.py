@@ -0,0 +1,44 @@
+# backend/tests/test_late_checkout.py
+import random
+from datetime import datetime
+
+import pytest
+
+import tenancy
+from late_checkout import IntervalIndex
+from models import db, Checkout
+
+
+def test_interval_index_matches_a_scan():
+    rng = random.Random(7)
+    index, intervals = IntervalIndex(), {}
+    for _ in range(500):
+        key = rng.randrange(40)
+        if rng.random() < 0.2:
+            index.remove(key)
+            intervals.pop(key, None)
+        else:
+            start = rng.randrange(1000)
+            intervals[key] = (start, start + rng.randrange(1, 100), key)
+            index.add(*intervals[key])
+        start = rng.randrange(1000)
+        end = start + rng.randrange(1, 50)
+        expected = sorted(item for item in intervals.values() if item[0] < end and item[1] > start)
+        assert sorted(index.conflicts(start, end)) == expected
+    assert len(index) == len(intervals)
+
+
+@pytest.fixture
+def app(app):
+    app.config['LATE_CHECKOUT_POLICY'] = {'budget_ms': 0}
+    with app.app_context(), tenancy.use_property(tenancy.registry.default()):
+        db.session.add(Checkout(room_id=1, scheduled_checkout=datetime(2030, 5, 1, 11)))
+        db.session.commit()
+    return app
+
+
+def test_decision_over_budget_fails_closed(client):
+    response = client.put('/checkouts/1/late', json={'requested_time': '2030-05-01T12:00:00'})
+    assert response.status_code == 503 and response.headers['Retry-After'] == '1'
+    assert 'budget' in response.get_json()['error']
+    assert client.get('/rooms/1').get_json()['checkouts'][0]['late_checkout_time'] is None
@@ -0,0 +1,48 @@
+# backend/tests/test_metrics.py
+import logging
+
+import metrics
+
+
+def sample(client, line_prefix):
+    """Value of the first /metrics sample starting with line_prefix, or 0."""
+    for line in client.get('/metrics').get_data(as_text=True).splitlines():
+        if line.startswith(line_prefix):
+            return float(line.rsplit(' ', 1)[1])
+    return 0
+
+
+def test_requests_are_counted_by_route_template_and_status(client):
+    label = 'pms_http_requests_total{method="GET",route="/rooms/<int:room_id>",status="%s"}'
+    ok, missing = sample(client, label % 200), sample(client, label % 404)
+    client.get('/rooms/1')
+    client.get('/rooms/2')
+    client.get('/rooms/999')
+    assert sample(client, label % 200) == ok + 2
+    assert sample(client, label % 404) == missing + 1
+
+
+def test_sql_statements_are_attributed_to_the_route(client):
+    label = 'pms_sql_statements_total{method="GET",route="/housekeepers"}'
+    before = sample(client, label)
+    client.get('/housekeepers')
+    assert sample(client, label) > before
+
+
+def test_histogram_exports_cumulative_buckets():
+    histogram = metrics.Histogram('h', 'Test.', (1, 5), ('route',))
+    for value in (0.5, 3, 3, 7):
+        histogram.observe(('/x',), value)
+    lines = histogram.expose()
+    assert 'h_bucket{route="/x",le="1"} 1' in lines
+    assert 'h_bucket{route="/x",le="5"} 3' in lines
+    assert 'h_bucket{route="/x",le="+Inf"} 4' in lines
+    assert 'h_sum{route="/x"} 13.500000' in lines
+
+
+def test_slow_requests_are_logged_with_their_sql(app, client, caplog):
+    app.config['SLOW_REQUEST_SECONDS'] = 0
+    with caplog.at_level(logging.WARNING, logger=app.logger.name):
+        client.get('/housekeepers')
+    assert any('Slow request GET /housekeepers' in record.message and 'SELECT' in record.message
+               for record in caplog.records)
@@ -0,0 +1,46 @@
+# backend/tests/test_migrations.py
+import pytest
+from sqlalchemy import create_engine, text
+
+import migrate
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine('sqlite://')
+    migrate.upgrade(engine)
+    yield engine
+    engine.dispose()
+
+
+def schema(engine):
+    with engine.connect() as conn:
+        return conn.execute(text(
+            "SELECT type, name, sql FROM sqlite_master WHERE name NOT LIKE 'sqlite_%' ORDER BY type, name"
+        )).all()
+
+
+def plan(engine, sql):
+    with engine.connect() as conn:
+        return ' '.join(row[-1] for row in conn.execute(text('EXPLAIN QUERY PLAN ' + sql)))
+
+
+def test_downgrade_and_upgrade_round_trip(engine):
+    head = schema(engine)
+    assert migrate.current_revision(engine) == migrate.load_migrations()[-1].revision
+    migrate.downgrade(engine, None)
+    assert migrate.current_revision(engine) is None
+    migrate.upgrade(engine)
+    assert schema(engine) == head
+
+
+@pytest.mark.parametrize('sql, index', [
+    ("SELECT id FROM rooms WHERE property_id = 1 AND status IN ('checked_out', 'cleaning')",
+     'ix_rooms_property_id_status'),
+    ("SELECT id FROM cleaning_tasks WHERE room_id IN (1, 2) AND status IN ('pending', 'in_progress')",
+     'ix_cleaning_tasks_room_id_status'),
+    ("SELECT id FROM checkouts WHERE room_id = 1 ORDER BY scheduled_checkout DESC LIMIT 1",
+     'ix_checkouts_room_id_scheduled_checkout'),
+])
+def test_hot_queries_use_their_indexes(engine, sql, index):
+    assert index in plan(engine, sql)
@@ -0,0 +1,160 @@
+# backend/tests/test_outbox.py
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+import app as appmod
+import outbox
+import tenancy
+from models import db, OutboxMessage
+
+CONFIG = {'PMS_ADAPTER': 'log', 'OUTBOX_BATCH_SIZE': 2, 'OUTBOX_MAX_ATTEMPTS': 3}
+
+
+class FakePMS(outbox.PMSAdapter):
+    """Records batches; fails while `failing` is set and refuses the keys in `refuse`."""
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.batches = []
+        self.failing = False
+        self.refuse = set()
+
+    async def send(self, messages):
+        self.batches.append(messages)
+        if self.failing:
+            raise outbox.PMSError('PMS unavailable')
+        return {message['idempotency_key']: 'unknown room' for message in messages
+                if message['idempotency_key'] in self.refuse}
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = appmod.create_app(dict(CONFIG, DATABASE_URL=f"sqlite:///{tmp_path / 'hotel.db'}"))
+    with app.app_context():
+        appmod.init_db()
+        appmod.seed_db()
+    return app
+
+
+@pytest.fixture
+def pms(app):
+    return FakePMS(app.config)
+
+
+def enqueue(app, count):
+    with app.app_context(), tenancy.use_property(tenancy.registry.default()):
+        keys = [outbox.enqueue('room_ready', {'room_number': str(n)}, key=f'key-{n}').idempotency_key
+                for n in range(count)]
+        db.session.commit()
+    return keys
+
+
+def messages(app):
+    with app.app_context(), tenancy.use_property(tenancy.registry.default()):
+        return {message.idempotency_key: message for message in OutboxMessage.query.order_by(OutboxMessage.id)}
+
+
+def make_due(app):
+    with app.app_context():
+        OutboxMessage.query.update({OutboxMessage.next_attempt_at: datetime.utcnow()})
+        db.session.commit()
+
+
+def run_once(app, pms):
+    return asyncio.run(outbox.OutboxWorker(app, pms).run_once())
+
+
+def test_a_room_becoming_clean_is_queued_for_the_pms(app, client):
+    for status in ('checked_out', 'clean'):
+        assert client.put('/rooms/1', json={'status': status}).status_code == 200
+    [message] = messages(app).values()
+    assert message.topic == 'room_ready' and message.status == 'pending'
+
+
+def test_nothing_is_queued_without_an_adapter():
+    app = appmod.create_app({'DATABASE_URL': 'sqlite://'})
+    with app.app_context():
+        appmod.init_db()
+        appmod.seed_db()
+    client = app.test_client()
+    for status in ('checked_out', 'clean'):
+        assert client.put('/rooms/1', json={'status': status}).status_code == 200
+    assert messages(app) == {}
+
+
+def test_batches_are_sent_oldest_first(app, pms):
+    keys = enqueue(app, 3)
+    assert run_once(app, pms) == 2
+    assert run_once(app, pms) == 1
+    assert [[message['idempotency_key'] for message in batch] for batch in pms.batches] == [keys[:2], keys[2:]]
+    assert pms.batches[0][0]['property'] == 'main' and pms.batches[0][0]['attempt'] == 1
+    assert all(message.status == 'sent' and message.sent_at for message in messages(app).values())
+    assert run_once(app, pms) == 0
+
+
+def test_a_claimed_batch_is_leased_to_one_worker(app):
+    enqueue(app, 1)
+    with app.app_context():
+        hotel = tenancy.registry.default()
+        assert len(outbox.claim(hotel, app.config)) == 1
+        assert outbox.claim(hotel, app.config) == []
+
+
+def test_failed_batches_back_off_then_stop_holding_up_the_queue(app, pms):
+    [key] = enqueue(app, 1)
+    pms.failing = True
+    assert run_once(app, pms) == 1
+    message = messages(app)[key]
+    assert message.status == 'pending' and message.attempts == 1 and message.last_error == 'PMS unavailable'
+    assert message.next_attempt_at > datetime.utcnow()
+    assert run_once(app, pms) == 0  # Not due yet
+
+    for _ in range(app.config['OUTBOX_MAX_ATTEMPTS'] - 1):
+        make_due(app)
+        assert run_once(app, pms) == 1
+    assert messages(app)[key].status == 'failed'
+    assert [batch[0]['attempt'] for batch in pms.batches] == [1, 2, 3]
+
+    with app.app_context():
+        assert outbox.retry_failed() == 1
+        db.session.commit()
+    pms.failing = False
+    assert run_once(app, pms) == 1
+    assert messages(app)[key].status == 'sent'
+
+
+def test_a_waiting_retry_holds_back_later_messages(app, pms):
+    first, second = enqueue(app, 2)
+    pms.failing = True
+    run_once(app, pms)
+    pms.failing = False
+    assert run_once(app, pms) == 0  # The second message waits for the first
+    make_due(app)
+    assert run_once(app, pms) == 2
+    assert [message['idempotency_key'] for message in pms.batches[-1]] == [first, second]
+
+
+def test_refused_messages_fail_without_a_retry(app, pms):
+    first, second = enqueue(app, 2)
+    pms.refuse = {first}
+    assert run_once(app, pms) == 2
+    sent = messages(app)
+    assert (sent[first].status, sent[first].last_error) == ('failed', 'unknown room')
+    assert sent[second].status == 'sent'
+
+
+def test_backoff_doubles_up_to_the_maximum(monkeypatch):
+    monkeypatch.setattr(outbox.random, 'uniform', lambda low, high: high)
+    config = {'OUTBOX_BASE_DELAY': 1.0, 'OUTBOX_MAX_DELAY': 5.0}
+    assert [outbox.backoff(attempts, config) for attempts in (1, 2, 3, 4)] == [
+        timedelta(seconds=1), timedelta(seconds=2), timedelta(seconds=4), timedelta(seconds=5)]
+
+
+def test_adapters_are_loaded_by_name():
+    config = dict(outbox.DEFAULTS, PMS_ADAPTER='log')
+    assert isinstance(outbox.load_adapter(config), outbox.LogAdapter)
+    assert isinstance(outbox.load_adapter(dict(config, PMS_ADAPTER='test_outbox:FakePMS')), FakePMS)
+    with pytest.raises(ValueError):
+        outbox.load_adapter(dict(config, PMS_ADAPTER='carrier-pigeon'))
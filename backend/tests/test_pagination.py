@@ -0,0 +1,46 @@
+# backend/tests/test_pagination.py
+from datetime import datetime, timedelta
+
+import pytest
+
+import tenancy
+from models import db, CleaningTask
+
+
+@pytest.fixture
+def app(app):
+    with app.app_context(), tenancy.use_property(tenancy.registry.default()):
+        start = datetime(2030, 1, 1)
+        db.session.add_all(CleaningTask(room_id=task % 10 + 1, housekeeper_id=task % 2 + 1, status='completed',
+                                        completed_at=start + timedelta(hours=task)) for task in range(250))
+        db.session.commit()
+    return app
+
+
+def test_default_page_is_marked_truncated(client):
+    response = client.get('/cleaning_tasks')
+    body = response.get_json()
+    assert len(body['cleaning_tasks']) == 100 and body['truncated'] is True
+    assert body['next'] == f"/cleaning_tasks?limit=100&after={body['next_cursor']}"
+    assert response.headers['Link'] == f'<{body["next"]}>; rel="next"'
+
+
+def test_following_next_walks_every_row_once_with_filters(client):
+    url, seen = '/cleaning_tasks?housekeeper_id=1&limit=40', []
+    while url:
+        body = client.get(url).get_json()
+        seen += [task['id'] for task in body['cleaning_tasks']]
+        assert all(task['housekeeper_id'] == 1 for task in body['cleaning_tasks'])
+        url = body['next']
+    assert seen == sorted(seen) and len(seen) == len(set(seen)) == 125
+    assert body['truncated'] is False and body['next_cursor'] is None
+
+
+def test_completed_range_is_pushed_down(client):
+    body = client.get('/cleaning_tasks?completed_after=2030-01-02T00:00:00&completed_before=2030-01-03T00:00:00').get_json()
+    assert len(body['cleaning_tasks']) == 24 and body['truncated'] is False
+
+
+@pytest.mark.parametrize('query', ['limit=0', 'limit=1001', 'after=x'])
+def test_bad_cursor_arguments_are_rejected(client, query):
+    assert client.get(f'/cleaning_tasks?{query}').status_code == 400
@@ -0,0 +1,58 @@
+# backend/tests/test_rooms.py
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event
+
+import serializers
+import tenancy
+from models import db, Room, Checkout, CleaningTask
+
+
+def add_rooms(app, first, count):
+    with app.app_context(), tenancy.use_property(tenancy.registry.default()):
+        for number in range(first, first + count):
+            room = Room(room_number=f'9{number:03}', status='checked_out')
+            db.session.add(room)
+            db.session.flush()
+            db.session.add(Checkout(room_id=room.id, scheduled_checkout=datetime(2030, 1, 1, 11)))
+            db.session.add(CleaningTask(room_id=room.id, housekeeper_id=1, status='completed'))
+        db.session.commit()
+
+
+def statements(app, client, url):
+    """The SQL statements a request runs."""
+    issued = []
+    with app.app_context():
+        engine = db.engine
+    listener = lambda *args: issued.append(args[2])  # noqa: E731
+    event.listen(engine, 'before_cursor_execute', listener)
+    try:
+        assert client.get(url).status_code == 200
+    finally:
+        event.remove(engine, 'before_cursor_execute', listener)
+    return issued
+
+
+def test_full_listing_runs_the_same_queries_for_any_number_of_rooms(app, client):
+    url = '/rooms?status=checked_out'
+    client.get(url)
+    add_rooms(app, 0, 5)
+    few = statements(app, client, url)
+    add_rooms(app, 5, 50)
+    many = statements(app, client, url)
+    assert len(many) == len(few) <= 3  # Rooms, then one IN query each for checkouts and tasks
+
+    rooms = client.get(url).get_json()['rooms']
+    assert len(rooms) == 55
+    assert all(len(room['checkouts']) == 1 and len(room['cleaning_tasks']) == 1 for room in rooms)
+
+
+@pytest.mark.parametrize('url', ['/rooms?view=summary', '/rooms?view=summary&status=occupied'])
+def test_summary_view_returns_only_summary_fields(client, url):
+    rooms = client.get(url).get_json()['rooms']
+    assert len(rooms) == 10 and all(set(room) == set(serializers.ROOM_SUMMARY_FIELDS) for room in rooms)
+
+
+def test_unknown_view_is_rejected(client):
+    assert client.get('/rooms?view=everything').status_code == 400
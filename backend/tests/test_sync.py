@@ -0,0 +1,173 @@
+# backend/tests/test_sync.py
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert
+
+import sync
+import tenancy
+from models import db, Room, ChangeLog
+
+
+@pytest.fixture
+def hotel(app):
+    with app.app_context(), tenancy.use_property(tenancy.registry.default()) as hotel:
+        yield hotel
+
+
+def log(hotel, version, age=0, op='upsert'):
+    """A change log row as another writer would commit it."""
+    db.session.execute(insert(ChangeLog.__table__), {
+        'property_id': hotel.id, 'version': version, 'entity': 'room', 'entity_id': 1, 'op': op,
+        'changed_at': datetime.utcnow() - timedelta(seconds=age), 'op_id': None})
+    db.session.commit()
+
+
+def test_versions_increase_without_a_property_counter(hotel):
+    room = Room.query.first()
+    first = sync.current_version()
+    room.status = 'checked_out'
+    db.session.commit()
+    room.status = 'clean'
+    db.session.commit()
+    assert sync.current_version() == first + 2 == room.sync_version
+
+
+def test_pulls_stop_before_a_version_still_in_flight(hotel):
+    latest = sync.current_version()
+    log(hotel, latest + 2)  # latest + 1 has not committed yet
+    assert sync.current_version() == latest
+    assert sync.pull(latest)['version'] == latest
+
+    log(hotel, latest + 1)
+    assert sync.current_version() == latest + 2
+    assert sync.pull(latest)['version'] == latest + 2
+
+
+def test_old_gaps_and_skipped_versions_do_not_hold_pulls_back(hotel):
+    latest = sync.current_version()
+    log(hotel, latest + 2, age=sync.GAP_GRACE_SECONDS + 1)  # latest + 1 was lost with its writer
+    assert sync.current_version() == latest + 2
+
+    log(hotel, latest + 4)
+    assert sync.current_version() == latest + 2
+    db.session.info['sync_allocated'] = [(hotel.id, latest + 3)]  # As a PostgreSQL writer that rolled back
+    db.session.rollback()
+    assert sync.current_version() == latest + 4
+    pulled = sync.pull(latest + 2)
+    assert pulled['version'] == latest + 4
+    assert [room.id for room in pulled['rooms']] == [1]
+
+
+# --- Push and delta pulls over the API ---
+
+def at(minutes=0):
+    return (datetime.utcnow() + timedelta(minutes=minutes)).isoformat()
+
+
+def push(client, changes, **body):
+    response = client.post('/sync', json=dict(body, changes=changes))
+    assert response.status_code == 200
+    return response.get_json()
+
+
+@pytest.fixture
+def task_id(client):
+    """An open cleaning task for room 101 (id 1), assigned to Alice."""
+    assert client.put('/rooms/1', json={'status': 'checked_out'}).status_code == 200
+    assert client.post('/cleaning_tasks', json={'room_number': '101', 'housekeeper_id': 1}).status_code == 201
+    return client.get('/cleaning_tasks?room_id=1').get_json()['cleaning_tasks'][0]['id']
+
+
+def test_first_pull_is_a_snapshot(client):
+    pulled = client.get('/sync').get_json()
+    assert pulled['reset'] and not pulled['has_more']
+    assert len(pulled['rooms']) == 10 and pulled['cleaning_tasks'] == []
+
+
+def test_task_changes_apply_in_the_order_they_were_made(client, task_id):
+    base = client.get('/sync').get_json()['version']
+    pushed = push(client, [
+        {'op_id': 'b', 'type': 'task_status', 'task_id': task_id, 'status': 'completed', 'at': at(-5)},
+        {'op_id': 'a', 'type': 'task_status', 'task_id': task_id, 'status': 'in_progress', 'at': at(-30)},
+    ], housekeeper_id=1, base_version=base)
+    assert pushed['results'] == [
+        {'op_id': 'b', 'result': 'applied', 'status': 'completed', 'room_status': 'clean'},
+        {'op_id': 'a', 'result': 'applied', 'status': 'in_progress'},
+    ]
+    assert not pushed['reset'] and pushed['version'] > base
+    assert [room['status'] for room in pushed['rooms']] == ['clean']
+    assert [task['status'] for task in pushed['cleaning_tasks']] == ['completed']
+
+
+def test_replayed_and_out_of_date_changes_change_nothing(client, task_id):
+    change = {'op_id': 'done', 'type': 'task_status', 'task_id': task_id, 'status': 'completed', 'at': at()}
+    assert push(client, [change], housekeeper_id=1)['results'][0]['result'] == 'applied'
+    version = client.get('/sync').get_json()['version']
+
+    pushed = push(client, [change, {'op_id': 'late', 'type': 'task_status', 'task_id': task_id,
+                                    'status': 'in_progress', 'at': at(-60)}], housekeeper_id=1)
+    assert [result['result'] for result in pushed['results']] == ['duplicate', 'stale']
+    assert client.get('/sync').get_json()['version'] == version
+
+
+def test_tasks_of_other_housekeepers_are_rejected(client, task_id):
+    pushed = push(client, [{'op_id': 'x', 'type': 'task_status', 'task_id': task_id,
+                            'status': 'in_progress', 'at': at()}], housekeeper_id=2)
+    assert pushed['results'][0]['result'] == 'rejected'
+
+
+def test_room_status_from_a_current_handset_applies(client):
+    base = client.get('/sync').get_json()['version']
+    pushed = push(client, [{'op_id': 'r', 'type': 'room_status', 'room_id': 2, 'status': 'checked_out',
+                            'at': at()}], base_version=base)
+    assert pushed['results'] == [{'op_id': 'r', 'result': 'applied', 'room_status': 'checked_out'}]
+
+
+def test_later_desk_changes_win_over_older_handset_changes(client):
+    base = client.get('/sync').get_json()['version']
+    stale = at(-10)  # Queued offline before the desk's change below
+    assert client.put('/rooms/2', json={'status': 'checked_out'}).status_code == 200
+    pushed = push(client, [{'op_id': 'r', 'type': 'room_status', 'room_id': 2, 'status': 'clean',
+                            'at': stale}], base_version=base)
+    assert pushed['results'] == [{'op_id': 'r', 'result': 'conflict', 'room_status': 'checked_out'}]
+
+    pushed = push(client, [{'op_id': 'r2', 'type': 'room_status', 'room_id': 2, 'status': 'clean',
+                            'at': at(1)}], base_version=base)
+    assert pushed['results'][0]['result'] == 'applied'
+
+
+def test_a_guest_moving_in_wins_over_any_handset_change(client):
+    base = client.get('/sync').get_json()['version']
+    for status in ('checked_out', 'clean', 'occupied'):
+        assert client.put('/rooms/3', json={'status': status}).status_code == 200
+    pushed = push(client, [{'op_id': 'r', 'type': 'room_status', 'room_id': 3, 'status': 'checked_out',
+                            'at': at(5)}], base_version=base)
+    assert pushed['results'] == [{'op_id': 'r', 'result': 'conflict', 'room_status': 'occupied'}]
+
+
+def test_invalid_changes_are_reported_without_failing_the_batch(client):
+    base = client.get('/sync').get_json()['version']
+    pushed = push(client, [
+        {'op_id': 'bad', 'type': 'room_status', 'room_id': 2, 'status': 'on_fire', 'at': at()},
+        {'op_id': 'ok', 'type': 'room_status', 'room_id': 2, 'status': 'checked_out', 'at': at()},
+    ], base_version=base)
+    assert [result['result'] for result in pushed['results']] == ['invalid', 'applied']
+    assert client.post('/sync', json={'changes': 'all of them'}).status_code == 400
+    assert client.post('/sync', json={'changes': [], 'base_version': 'x'}).status_code == 400
+
+
+def test_delta_pulls_return_changed_and_deleted_rows(client, task_id):
+    since = client.get('/sync').get_json()['version']
+    assert client.put('/rooms/4', json={'status': 'checked_out'}).status_code == 200
+    assert client.delete(f'/cleaning_tasks/{task_id}').status_code == 200
+
+    pulled = client.get(f'/sync?since={since}').get_json()
+    assert not pulled['reset']
+    assert sorted(room['id'] for room in pulled['rooms']) == [1, 4]  # Room 1 lost its task
+    assert pulled['deleted'] == {'rooms': [], 'cleaning_tasks': [task_id]}
+
+    paged = client.get(f'/sync?since={since}&limit=1').get_json()
+    assert paged['has_more'] and paged['version'] < pulled['version']
+    assert client.get(f"/sync?since={pulled['version']}").get_json()['rooms'] == []
+    assert client.get(f'/sync?limit={sync.MAX_PULL_LIMIT + 1}').status_code == 400
@@ -0,0 +1,75 @@
+# backend/tests/test_tenancy.py
+import pytest
+from sqlalchemy import create_engine, text
+
+import app as appmod
+import tenancy
+from models import db, Room
+
+
+def add_property(app, client, code, rooms):
+    assert client.post('/properties', json={'code': code, 'name': code.title()}).status_code == 201
+    with app.app_context(), tenancy.use_property(tenancy.registry.get(code)):
+        for number in rooms:
+            db.session.add(Room(room_number=number, status='vacant'))
+        db.session.commit()
+
+
+def room_numbers(response):
+    assert response.status_code == 200
+    return sorted(room['room_number'] for room in response.get_json()['rooms'])
+
+
+def test_unknown_property_is_not_found(client):
+    response = client.get('/properties/nowhere/rooms')
+    assert response.status_code == 404
+    assert response.get_json() == {'error': 'Property nowhere not found'}
+
+
+def test_properties_only_see_their_own_rooms(app, client):
+    add_property(app, client, 'annex', ['101', '201'])
+    assert room_numbers(client.get('/properties/annex/rooms')) == ['101', '201']
+    assert len(room_numbers(client.get('/rooms'))) == 10  # Unprefixed routes serve the default property
+    assert room_numbers(client.get('/properties/main/rooms')) == room_numbers(client.get('/rooms'))
+
+    default_room = client.get('/rooms?view=summary').get_json()['rooms'][0]['id']
+    assert client.get(f'/rooms/{default_room}').status_code == 200
+    assert client.get(f'/properties/annex/rooms/{default_room}').status_code == 404
+
+
+def test_property_codes_are_validated(client):
+    assert client.post('/properties', json={'code': 'Not Valid', 'name': 'x'}).status_code == 400
+    assert client.post('/properties', json={'code': 'annex', 'name': 'Annex'}).status_code == 201
+    assert client.post('/properties', json={'code': 'annex', 'name': 'Annex'}).status_code == 409
+    assert [hotel['code'] for hotel in client.get('/properties').get_json()] == ['main', 'annex']
+
+
+def test_process_wide_routes_have_no_property_prefix(client):
+    assert client.get('/ready').status_code == 200
+    assert client.get('/properties/main/ready').status_code == 404
+
+
+def test_database_partitioning_keeps_each_property_in_its_own_file(tmp_path):
+    app = appmod.create_app({
+        'DATABASE_URL': f"sqlite:///{tmp_path / 'hotel.db'}",
+        'PROPERTY_PARTITIONING': 'database',
+        'PROPERTY_DATABASE_URL': f"sqlite:///{tmp_path / 'hotel_{code}.db'}",
+    })
+    with app.app_context():
+        appmod.init_db()
+        appmod.seed_db()
+    client = app.test_client()
+    add_property(app, client, 'annex', ['101'])
+
+    assert room_numbers(client.get('/properties/annex/rooms')) == ['101']
+    assert (tmp_path / 'hotel_annex.db').exists()
+    engine = create_engine(f"sqlite:///{tmp_path / 'hotel_annex.db'}")
+    with engine.connect() as conn:
+        assert conn.execute(text('SELECT room_number FROM rooms')).scalars().all() == ['101']
+    engine.dispose()
+    assert len(room_numbers(client.get('/rooms'))) == 10
+
+
+def test_partitioning_mode_is_validated():
+    with pytest.raises(appmod.db_profiles.DatabaseConfigError):
+        appmod.create_app({'DATABASE_URL': 'sqlite://', 'PROPERTY_PARTITIONING': 'database'})
@@ -0,0 +1,81 @@
+# backend/tests/test_transitions.py
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm.exc import StaleDataError
+
+import tenancy
+import transitions
+from models import db, Room
+
+
+@pytest.fixture
+def task_id(client):
+    """An open cleaning task for room 101 (id 1)."""
+    assert client.put('/rooms/1', json={'status': 'checked_out'}).status_code == 200
+    assert client.post('/cleaning_tasks', json={'room_number': '101', 'housekeeper_id': 1}).status_code == 201
+    return client.get('/cleaning_tasks?room_id=1').get_json()['cleaning_tasks'][0]['id']
+
+
+def test_transition_table():
+    assert transitions.room_allows('occupied', 'checked_out')
+    assert transitions.room_allows('clean', 'clean')  # Repeating the current status
+    assert not transitions.room_allows('occupied', 'clean')
+    assert not transitions.task_allows('completed', 'in_progress')
+    with pytest.raises(transitions.InvalidTransition, match='allowed: checked_out'):
+        transitions.check_room('occupied', 'cleaning')
+    with pytest.raises(transitions.InvalidTransition, match='Invalid status'):
+        transitions.check_task('pending', 'paused')
+
+
+def test_room_changes_outside_the_table_conflict(client):
+    response = client.put('/rooms/1', json={'status': 'clean'})
+    assert response.status_code == 409
+    assert response.get_json()['status'] == 'occupied'
+    assert client.put('/rooms/1', json={'status': 'occupied'}).status_code == 200  # Retried requests are harmless
+    assert client.put('/rooms/1', json={'status': 'vacuumed'}).status_code == 400
+
+
+def test_task_changes_outside_the_table_conflict(client, task_id):
+    assert client.put(f'/cleaning_tasks/{task_id}', json={'status': 'completed'}).status_code == 200
+    response = client.put(f'/cleaning_tasks/{task_id}', json={'status': 'in_progress'})
+    assert response.status_code == 409
+    assert response.get_json()['status'] == 'completed'
+
+
+def test_room_updates_check_if_match(client):
+    etag = client.get('/rooms/1').headers['ETag']
+    response = client.put('/rooms/1', json={'status': 'checked_out'}, headers={'If-Match': etag})
+    assert response.status_code == 200
+
+    stale = client.put('/rooms/1', json={'status': 'clean'}, headers={'If-Match': etag})
+    assert stale.status_code == 412
+    assert stale.headers['ETag'] == response.headers['ETag']
+    assert client.get('/rooms/1').get_json()['status'] == 'checked_out'
+
+    assert client.put('/rooms/1', json={'status': 'clean'}, headers={'If-Match': response.headers['ETag']}) \
+        .status_code == 200
+    assert client.put('/rooms/1', json={'status': 'occupied'}, headers={'If-Match': '*'}).status_code == 200
+
+
+def test_task_updates_and_deletes_check_if_match(client, task_id):
+    first = client.put(f'/cleaning_tasks/{task_id}', json={'status': 'in_progress'})
+    assert first.status_code == 200
+    second = client.put(f'/cleaning_tasks/{task_id}', json={'status': 'completed'},
+                        headers={'If-Match': first.headers['ETag']})
+    assert second.status_code == 200
+
+    stale = client.delete(f'/cleaning_tasks/{task_id}', headers={'If-Match': first.headers['ETag']})
+    assert stale.status_code == 412
+    assert client.delete(f'/cleaning_tasks/{task_id}', headers={'If-Match': second.headers['ETag']}) \
+        .status_code == 200
+
+
+def test_lost_races_raise_stale_data(app):
+    with app.app_context(), tenancy.use_property(tenancy.registry.default()):
+        room = db.session.get(Room, 1)
+        with db.engine.begin() as conn:  # Another writer commits first
+            conn.execute(text("UPDATE rooms SET sync_version = sync_version + 1, status = 'checked_out' "
+                              "WHERE id = 1"))
+        room.status = 'checked_out'
+        with pytest.raises(StaleDataError):
+            db.session.commit()
@@ -0,0 +1,71 @@
+# backend/tests/test_workload.py
+import pytest
+from sqlalchemy import text
+
+import tenancy
+import workload
+from models import db
+
+
+def assign(client, room_id, room_number, housekeeper_id):
+    assert client.put(f'/rooms/{room_id}', json={'status': 'checked_out'}).status_code == 200
+    assert client.post('/cleaning_tasks', json={'room_number': room_number,
+                                                'housekeeper_id': housekeeper_id}).status_code == 201
+    return client.get(f'/cleaning_tasks?room_id={room_id}').get_json()['cleaning_tasks'][0]['id']
+
+
+def route(client, housekeeper_id, query=''):
+    response = client.get(f'/housekeepers/{housekeeper_id}/tasks{query}')
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_walking_order_snakes_between_floors():
+    rooms = [(1, '101'), (2, '203'), (3, '102'), (4, '201'), (5, '301'), (6, '202'), (7, '302')]
+    positions = workload.route_positions(rooms)
+    assert [room_id for room_id, _ in sorted(positions.items(), key=lambda item: item[1])] == [1, 3, 2, 6, 4, 5, 7]
+
+
+def test_tasks_come_in_walking_order(client):
+    for room_id, room_number in ((10, '1010'), (3, '103'), (1, '101')):
+        assign(client, room_id, room_number, 1)
+    tasks = route(client, 1)['tasks']
+    assert [task['room_number'] for task in tasks] == ['101', '103', '1010']
+    assert [task['floor'] for task in tasks] == ['1', '1', '10']
+
+
+def test_counters_follow_task_changes(client):
+    first = assign(client, 1, '101', 1)
+    second = assign(client, 2, '102', 1)
+    assign(client, 3, '103', 2)
+    assert route(client, 1)['workload'] == {'open': 2, 'in_progress': 0, 'cleaned_today': 0,
+                                            'avg_minutes_today': None}
+
+    assert client.put(f'/cleaning_tasks/{first}', json={'status': 'in_progress'}).status_code == 200
+    assert route(client, 1)['workload']['in_progress'] == 1
+    assert client.put(f'/cleaning_tasks/{first}', json={'status': 'completed'}).status_code == 200
+    assert client.delete(f'/cleaning_tasks/{second}').status_code == 200
+
+    counters = route(client, 1)['workload']
+    assert (counters['open'], counters['in_progress'], counters['cleaned_today']) == (0, 0, 1)
+    assert route(client, 2)['workload']['open'] == 1
+    assert [task['room_number'] for task in route(client, 1, '?status=completed')['tasks']] == ['101']
+
+
+def test_rebuild_recounts_drifted_counters(app, client):
+    assign(client, 1, '101', 1)
+    with app.app_context(), tenancy.use_property(tenancy.registry.default()):
+        db.session.execute(text('UPDATE housekeepers SET open_tasks = 5, in_progress_tasks = 2'))
+        assert workload.rebuild() == 2
+        db.session.commit()
+        assert workload.rebuild() == 0
+    assert route(client, 1)['workload']['open'] == 1
+    assert route(client, 2)['workload']['open'] == 0
+
+
+@pytest.mark.parametrize('url, status', [
+    ('/housekeepers/1/tasks?status=paused', 400),
+    ('/housekeepers/99/tasks', 404),
+])
+def test_bad_route_requests(client, url, status):
+    assert client.get(url).status_code == status
@@ -0,0 +1,60 @@
+# backend/transitions.py
+"""Allowed status changes for rooms and cleaning tasks.
+
+Setting the status a row already has is always allowed and changes
+nothing, so retried requests are harmless.
+
+Concurrent writers are handled by optimistic locking rather than table
+locks. Room and CleaningTask use sync_version as their SQLAlchemy
+version_id_col, so every UPDATE and DELETE of one of them carries
+``WHERE sync_version = <version read>``. A writer that lost a race hits
+zero rows and gets StaleDataError, and the API answers 409. Clients can
+also send the version they saw as ``If-Match: "room-<id>-v<version>"`` (see
+the ETag of GET /rooms/<id>) and get 412 when it is out of date.
+"""
+
+ROOM_TRANSITIONS = {
+    'occupied': ('checked_out',),
+    'checked_out': ('cleaning', 'clean'),
+    'cleaning': ('clean', 'checked_out'),  # checked_out: cleaning abandoned, the room waits again
+    'clean': ('occupied', 'checked_out'),  # checked_out: failed inspection, clean it again
+}
+TASK_TRANSITIONS = {
+    'pending': ('in_progress', 'completed'),
+    'in_progress': ('completed',),
+    'completed': (),
+}
+OPEN_TASK_STATUSES = ('pending', 'in_progress')  # At most one open task per room
+
+
+class InvalidTransition(ValueError):
+    """Raised for a status change the transition table does not allow."""
+
+
+def allowed(table, current, new):
+    return current is None or current == new or new in table.get(current, ())
+
+
+def check(table, kind, current, new):
+    """Raise InvalidTransition unless `current` may change to `new`."""
+    if new not in table:
+        raise InvalidTransition(f'Invalid status: {new}')
+    if not allowed(table, current, new):
+        targets = ', '.join(table[current]) or 'nothing'
+        raise InvalidTransition(f'A {kind} cannot go from {current} to {new} (allowed: {targets})')
+
+
+def check_room(current, new):
+    check(ROOM_TRANSITIONS, 'room', current, new)
+
+
+def check_task(current, new):
+    check(TASK_TRANSITIONS, 'cleaning task', current, new)
+
+
+def room_allows(current, new):
+    return allowed(ROOM_TRANSITIONS, current, new)
+
+
+def task_allows(current, new):
+    return allowed(TASK_TRANSITIONS, current, new)
@@ -0,0 +1,150 @@
+# backend/workload.py
+"""One housekeeper's tasks in walking order, and their workload.
+
+Housekeeper.open_tasks and in_progress_tasks are kept up to date by a
+flush hook, in the same transaction as the task change, with relative
+UPDATEs (``SET open_tasks = open_tasks + 1``) so concurrent writers don't
+overwrite each other's counts. rebuild() recounts them from the tasks.
+Cleanings finished today and their average time come from the daily
+cleaning rollups, which analytics.py keeps up to date the same way.
+
+WalkingRoute orders rooms the way a housekeeper walks them: floor by floor
+from the lowest, and along each floor in room number order, alternating
+direction so that each floor starts at the stairwell where the previous
+one ended. Positions are computed once per property and process, and again
+when a room is missing from them.
+"""
+import threading
+from collections import defaultdict
+
+from sqlalchemy import bindparam, event, func, update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history
+
+import transitions
+from models import db, Room, Housekeeper, CleaningTask, Rollup, room_floor
+
+
+# --- Counters ---
+
+def counted(status):
+    """(open, in progress) contribution of a task with this status."""
+    return int(status in transitions.OPEN_TASK_STATUSES), int(status == 'in_progress')
+
+
+def previous(obj, key):
+    """The value an attribute had before this flush."""
+    history = get_history(obj, key)
+    if history.deleted:
+        return history.deleted[0]
+    return history.unchanged[0] if history.unchanged else getattr(obj, key)
+
+
+@event.listens_for(Session, 'after_flush')
+def _count_tasks(session, flush_context):
+    deltas = defaultdict(lambda: [0, 0])  # housekeeper_id -> [open, in progress]
+
+    def add(housekeeper_id, status, sign):
+        open_count, in_progress = counted(status)
+        deltas[housekeeper_id][0] += sign * open_count
+        deltas[housekeeper_id][1] += sign * in_progress
+
+    for obj in session.new:
+        if type(obj) is CleaningTask:
+            add(obj.housekeeper_id, obj.status, 1)
+    for obj in session.dirty:
+        if type(obj) is CleaningTask and session.is_modified(obj, include_collections=False):
+            add(previous(obj, 'housekeeper_id'), previous(obj, 'status'), -1)
+            add(obj.housekeeper_id, obj.status, 1)
+    for obj in session.deleted:
+        if type(obj) is CleaningTask:
+            add(previous(obj, 'housekeeper_id'), previous(obj, 'status'), -1)
+
+    rows = [{'housekeeper_id': housekeeper_id, 'open': open_count, 'in_progress': in_progress}
+            for housekeeper_id, (open_count, in_progress) in sorted(deltas.items())  # Same lock order everywhere
+            if housekeeper_id is not None and (open_count or in_progress)]
+    if rows:
+        table = Housekeeper.__table__
+        session.connection().execute(
+            update(table).where(table.c.id == bindparam('housekeeper_id')).values(
+                open_tasks=table.c.open_tasks + bindparam('open'),
+                in_progress_tasks=table.c.in_progress_tasks + bindparam('in_progress'),
+            ), rows
+        )
+
+
+def rebuild():
+    """Recount every housekeeper's open and in progress tasks. Caller commits. Returns the housekeepers fixed."""
+    counts = defaultdict(lambda: [0, 0])
+    for housekeeper_id, status, count in db.session.query(
+        CleaningTask.housekeeper_id, CleaningTask.status, func.count()
+    ).filter(CleaningTask.status.in_(transitions.OPEN_TASK_STATUSES)).group_by(
+        CleaningTask.housekeeper_id, CleaningTask.status
+    ):
+        counts[housekeeper_id][0] += count
+        counts[housekeeper_id][1] += count if status == 'in_progress' else 0
+    fixed = 0
+    for housekeeper in Housekeeper.query.all():
+        open_count, in_progress = counts.get(housekeeper.id, (0, 0))
+        if (housekeeper.open_tasks, housekeeper.in_progress_tasks) != (open_count, in_progress):
+            housekeeper.open_tasks, housekeeper.in_progress_tasks = open_count, in_progress
+            fixed += 1
+    return fixed
+
+
+def workload(housekeeper, now):
+    """Live counters for a housekeeper: open and in progress tasks, and cleanings finished today."""
+    day = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    cleaned, minutes = db.session.query(func.sum(Rollup.count), func.sum(Rollup.total_minutes)).filter(
+        Rollup.metric == 'cleaning',
+        Rollup.granularity == 'day',
+        Rollup.bucket_start == day,
+        Rollup.housekeeper_id == housekeeper.id,
+    ).one()
+    return {
+        'open': housekeeper.open_tasks,
+        'in_progress': housekeeper.in_progress_tasks,
+        'cleaned_today': cleaned or 0,
+        'avg_minutes_today': round(minutes / cleaned, 1) if cleaned else None,
+    }
+
+
+# --- Walking route ---
+
+def sort_key(value):
+    """Numbers in numeric order, anything else after them."""
+    return (0, int(value), '') if value.isdigit() else (1, 0, value)
+
+
+def route_positions(rooms):
+    """{room_id: position} for (room_id, room_number) pairs, in walking order."""
+    floors = defaultdict(list)
+    for room_id, room_number in rooms:
+        floors[room_floor(room_number)].append((sort_key(room_number[-2:]), room_id))
+    positions = {}
+    for index, floor in enumerate(sorted(floors, key=sort_key)):
+        corridor = sorted(floors[floor], reverse=index % 2 == 1)  # Back along the next floor
+        for _, room_id in corridor:
+            positions[room_id] = len(positions)
+    return positions
+
+
+class WalkingRoute:
+    """Route positions of one property's rooms."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._positions = {}
+
+    def positions(self, room_ids):
+        """Route positions covering `room_ids`, recomputed if one of them is new."""
+        positions = self._positions
+        if any(room_id not in positions for room_id in room_ids):
+            with self._lock:
+                positions = self._positions = route_positions(db.session.query(Room.id, Room.room_number).all())
+        return positions
+
+    def order(self, rows, key='room_id'):
+        """Sort row dicts by the route position of their room."""
+        positions = self.positions({row[key] for row in rows})
+        return sorted(rows, key=lambda row: (positions.get(row[key], len(positions)), row['id']))
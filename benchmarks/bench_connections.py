@@ -0,0 +1,195 @@
+# benchmarks/bench_connections.py
+"""Concurrent connection capacity: the WSGI app against the ASGI entry point.
+
+For each mode and connection count, starts the app on a freshly generated
+database (or the one given by --url), opens that many idle GET /events
+streams, the way handsets keep one open all shift, and with all of them
+held measures:
+
+- how many streams were established within --connect-timeout,
+- GET /rooms?view=summary latency from another client (or timeouts),
+- how many streams received a room change made through PUT /rooms/<id>,
+  and the p50/p99 delivery delay,
+- the server's resident memory and thread count (Linux).
+
+Modes: wsgi runs app:app with --workers workers (gunicorn sync workers when
+installed, otherwise forked werkzeug workers), so every open stream holds
+one; asgi runs asgi:app in one uvicorn process. The event bus is per
+process, so with several WSGI workers a change only reaches the streams
+held by the worker that made it.
+
+    python benchmarks/bench_connections.py --connections 10,100,1000
+    python benchmarks/bench_connections.py --modes asgi --connections 1000,5000
+"""
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine, text
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import datagen  # noqa: E402
+import load_test  # noqa: E402
+from bench_writes import NEXT_STATUS  # noqa: E402
+
+
+def server_command(mode, workers, port):
+    if mode == 'wsgi':
+        return None  # load_test's default
+    return [sys.executable, '-m', 'uvicorn', 'asgi:app', '--app-dir', load_test.BACKEND_DIR,
+            '--port', str(port), '--log-level', 'warning', '--backlog', '4096']
+
+
+def group_usage(pgid):
+    """(resident MB, threads) summed over a process group, or (None, None) without /proc."""
+    rss_kb = threads = 0
+    try:
+        pids = [name for name in os.listdir('/proc') if name.isdigit()]
+    except OSError:
+        return None, None
+    for pid in pids:
+        try:
+            with open(f'/proc/{pid}/stat') as f:
+                if int(f.read().rsplit(')', 1)[1].split()[2]) != pgid:
+                    continue
+            with open(f'/proc/{pid}/status') as f:
+                status = dict(line.split(':', 1) for line in f if ':' in line)
+        except (OSError, ValueError, IndexError):
+            continue  # The process exited meanwhile
+        rss_kb += int(status['VmRSS'].split()[0])
+        threads += int(status['Threads'])
+    return rss_kb / 1024, threads
+
+
+async def open_stream(port, timeout):
+    """An SSE connection that has received its first line, or None."""
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection('127.0.0.1', port), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return None
+    try:
+        writer.write(b'GET /events HTTP/1.1\r\nHost: bench\r\n\r\n')
+        await asyncio.wait_for(reader.readuntil(b'retry:'), timeout)
+        return reader, writer
+    except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+        writer.close()
+        return None
+
+
+async def wait_for_event(reader, started, timeout):
+    """Seconds until a room event arrives on the stream, or None."""
+    try:
+        await asyncio.wait_for(reader.readuntil(b'event: room'), timeout)
+        return time.perf_counter() - started
+    except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+        return None
+
+
+def request(port, method, path, body=None, timeout=5.0):
+    """(status, seconds), or (None, None) when the server did not answer within timeout."""
+    started = time.perf_counter()
+    try:
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+        connection.request(method, path, body=json.dumps(body) if body is not None else None,
+                           headers={'Content-Type': 'application/json'} if body is not None else {})
+        response = connection.getresponse()
+        response.read()
+        connection.close()
+        return response.status, time.perf_counter() - started
+    except OSError:
+        return None, None
+
+
+async def measure(port, connections, room, args):
+    streams = await asyncio.gather(*(open_stream(port, args.connect_timeout) for _ in range(connections)))
+    streams = [stream for stream in streams if stream is not None]
+    try:
+        board = []
+        for _ in range(args.requests):
+            status, seconds = await asyncio.to_thread(request, port, 'GET', '/rooms?view=summary',
+                                                      timeout=args.request_timeout)
+            if status != 200:
+                board.extend([None] * (args.requests - len(board)))  # No free worker; don't wait for every one
+                break
+            board.append(seconds)
+
+        started = time.perf_counter()
+        waiters = [asyncio.ensure_future(wait_for_event(reader, started, args.event_timeout))
+                   for reader, _ in streams]
+        room_id, status = room
+        written, _ = await asyncio.to_thread(request, port, 'PUT', f'/rooms/{room_id}',
+                                             {'status': NEXT_STATUS[status]}, args.request_timeout)
+        delays = [delay for delay in await asyncio.gather(*waiters) if delay is not None]
+        if written == 200:
+            room[1] = NEXT_STATUS[status]
+    finally:
+        for _, writer in streams:
+            writer.close()
+    return len(streams), board, written, sorted(delays)
+
+
+def raise_file_limit(needed):
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    wanted = min(hard, max(soft, needed)) if hard != resource.RLIM_INFINITY else max(soft, needed)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (wanted, hard))  # Inherited by the server process too
+    return wanted
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modes', default='wsgi,asgi')
+    parser.add_argument('--connections', default='10,100,1000', help='Comma-separated open stream counts')
+    parser.add_argument('--workers', type=int, default=4, help='WSGI worker processes')
+    parser.add_argument('--url', help='Database already filled by datagen.py (default: a fresh SQLite file)')
+    parser.add_argument('--rooms', type=int, default=200)
+    parser.add_argument('--requests', type=int, default=20, help='Board requests while the streams are open')
+    parser.add_argument('--connect-timeout', type=float, default=10.0)
+    parser.add_argument('--request-timeout', type=float, default=5.0)
+    parser.add_argument('--event-timeout', type=float, default=5.0)
+    parser.add_argument('--port', type=int, default=5097)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    counts = [int(value) for value in args.connections.split(',')]
+    limit = raise_file_limit(max(counts) * 2 + 256)  # Client and server ends of every stream
+    if limit < max(counts) + 256:
+        print(f'Warning: open file limit is {limit}; large runs will fail to connect', file=sys.stderr)
+    url = args.url
+    if not url:
+        url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_connections.db')}"
+        datagen.generate(url, args.rooms, 3, seed=args.seed)
+    engine = create_engine(url)
+    with engine.connect() as conn:
+        room = list(conn.execute(text("SELECT id, status FROM rooms ORDER BY id LIMIT 1")).one())
+    engine.dispose()
+
+    print(f"{'mode':>5} {'open':>6} {'held':>6} {'board p50':>10} {'unanswered':>10} "
+          f"{'delivered':>9} {'p50 ms':>8} {'p99 ms':>8} {'RSS MB':>7} {'threads':>7}")
+    for mode in args.modes.split(','):
+        for connections in counts:
+            process = load_test.start_server(url, args.workers, args.port,
+                                             command=server_command(mode, args.workers, args.port))
+            try:
+                held, board, written, delays = asyncio.run(measure(args.port, connections, room, args))
+                rss, threads = group_usage(process.pid)
+            finally:
+                load_test.stop_server(process)
+            answered = [seconds for seconds in board if seconds is not None]
+            board_p50 = f'{statistics.median(answered) * 1000:.1f} ms' if answered else '-'
+            delivered = f'{len(delays)}/{held}' if written == 200 else 'no write'
+            p50 = f'{delays[len(delays) // 2] * 1000:.1f}' if delays else '-'
+            p99 = f'{delays[int(len(delays) * 0.99)] * 1000:.1f}' if delays else '-'
+            print(f'{mode:>5} {connections:>6} {held:>6} {board_p50:>10} {len(board) - len(answered):>10} '
+                  f"{delivered:>9} {p50:>8} {p99:>8} {rss or 0:>7.0f} {threads or 0:>7}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+# benchmarks/bench_dispatcher.py
+"""Time a full dispatcher re-plan.
+
+    python benchmarks/bench_dispatcher.py --rooms 1000 --staff 100
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+import dispatcher  # noqa: E402
+
+
+def make_inputs(rooms, staff, floors, seed=42):
+    rng = random.Random(seed)
+    now = datetime(2024, 8, 1, 11, 0)
+    candidates = []
+    for i in range(rooms):
+        floor = str(1 + i % floors)
+        number = f'{floor}{i // floors:02d}'
+        arrival = now + timedelta(minutes=rng.randrange(30, 720)) if rng.random() < 0.7 else None
+        late = now + timedelta(hours=1) if rng.random() < 0.05 else None
+        candidates.append(dispatcher.Candidate(i, number, floor, arrival, rng.random() < 0.05, late))
+    members = [
+        dispatcher.Staff(i, f'Housekeeper {i}', rng.randrange(0, 3),
+                         frozenset({str(1 + rng.randrange(floors))}))
+        for i in range(staff)
+    ]
+    return candidates, members, now
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rooms', type=int, default=1000)
+    parser.add_argument('--staff', type=int, default=100)
+    parser.add_argument('--floors', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    candidates, members, now = make_inputs(args.rooms, args.staff, args.floors)
+    timings = []
+    for _ in range(args.repeat):
+        t0 = time.perf_counter()
+        assignments, unassigned = dispatcher.plan(candidates, members, now)
+        timings.append((time.perf_counter() - t0) * 1000)
+
+    loads = {}
+    for assignment in assignments:
+        loads[assignment.housekeeper_id] = loads.get(assignment.housekeeper_id, 0) + 1
+    print(f'{args.rooms} rooms, {args.staff} staff: {len(assignments)} assigned, {len(unassigned)} unassigned')
+    print(f'plan: median {statistics.median(timings):.2f} ms, max {max(timings):.2f} ms')
+    print(f'rooms per housekeeper: min {min(loads.values())}, max {max(loads.values())}')
+
+
+if __name__ == '__main__':
+    main()
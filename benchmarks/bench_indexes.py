@@ -0,0 +1,145 @@
+# benchmarks/bench_indexes.py
+"""Query plans and latency of the hot queries before and after migration 0002.
+
+Seeds a SQLite database at the 0001 schema, times the queries that
+backend/app.py runs on every assignment, checkout and board refresh, then
+applies the remaining migrations and times them again.
+
+    python benchmarks/bench_indexes.py --tasks 1000000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from sqlalchemy import create_engine  # noqa: E402
+
+import migrate  # noqa: E402
+
+QUERIES = {
+    'open task for room (assign_cleaning_task)': (
+        "SELECT id FROM cleaning_tasks WHERE room_id = :room_id "
+        "AND status IN ('pending', 'in_progress') LIMIT 1"
+    ),
+    'latest checkout for room (record_checkout)': (
+        "SELECT id FROM checkouts WHERE room_id = :room_id "
+        "ORDER BY scheduled_checkout DESC LIMIT 1"
+    ),
+    'rooms by status (boards)': (
+        "SELECT id, room_number, status, last_cleaned FROM rooms WHERE status = 'checked_out'"
+    ),
+}
+
+
+def seed(path, rooms, tasks, checkouts):
+    """Fill the 0001 schema with random but realistic rows."""
+    conn = sqlite3.connect(path)
+    rng = random.Random(42)
+    start = datetime(2024, 1, 1)
+    statuses = ['occupied'] * 6 + ['checked_out', 'cleaning', 'clean', 'clean']
+    conn.executemany(
+        "INSERT INTO rooms (id, room_number, status) VALUES (?, ?, ?)",
+        ((i, str(100 + i), rng.choice(statuses)) for i in range(1, rooms + 1))
+    )
+    conn.executemany(
+        "INSERT INTO housekeepers (id, name) VALUES (?, ?)",
+        ((i, f'Housekeeper {i}') for i in range(1, max(rooms // 15, 2) + 1))
+    )
+    housekeepers = max(rooms // 15, 2)
+
+    def checkout_rows():
+        for i in range(1, checkouts + 1):
+            scheduled = start + timedelta(minutes=rng.randrange(0, 525600))
+            yield (i, rng.randrange(1, rooms + 1), scheduled, scheduled + timedelta(minutes=rng.randrange(-60, 120)), False)
+
+    def task_rows():
+        for i in range(1, tasks + 1):
+            started = start + timedelta(minutes=rng.randrange(0, 525600))
+            # History is almost entirely completed; a handful of tasks are open
+            status = 'completed' if rng.random() > 0.001 else rng.choice(['pending', 'in_progress'])
+            completed = started + timedelta(minutes=rng.randrange(15, 90)) if status == 'completed' else None
+            yield (i, rng.randrange(1, rooms + 1), rng.randrange(1, housekeepers + 1), status, started, completed)
+
+    conn.executemany(
+        "INSERT INTO checkouts (id, room_id, scheduled_checkout, actual_checkout, late_checkout_approved) "
+        "VALUES (?, ?, ?, ?, ?)", checkout_rows()
+    )
+    conn.executemany(
+        "INSERT INTO cleaning_tasks (id, room_id, housekeeper_id, status, started_at, completed_at) "
+        "VALUES (?, ?, ?, ?, ?, ?)", task_rows()
+    )
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.close()
+
+
+def measure(path, rooms, repeat):
+    """Return {query name: (plan lines, median ms, p90 ms)}."""
+    conn = sqlite3.connect(path)
+    rng = random.Random(7)
+    results = {}
+    for name, sql in QUERIES.items():
+        params = {'room_id': rng.randrange(1, rooms + 1)}
+        plan = [row[-1] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params)]
+        timings = []
+        for _ in range(repeat):
+            params = {'room_id': rng.randrange(1, rooms + 1)}
+            t0 = time.perf_counter()
+            conn.execute(sql, params).fetchall()
+            timings.append((time.perf_counter() - t0) * 1000)
+        timings.sort()
+        results[name] = (plan, statistics.median(timings), timings[int(len(timings) * 0.9) - 1])
+    conn.close()
+    return results
+
+
+def report(label, results):
+    print(f'\n== {label} ==')
+    for name, (plan, median, p90) in results.items():
+        print(f'{name}: median {median:.3f} ms, p90 {p90:.3f} ms')
+        for line in plan:
+            print(f'    {line}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rooms', type=int, default=600)
+    parser.add_argument('--tasks', type=int, default=1_000_000)
+    parser.add_argument('--checkouts', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--db', help='Database file to use (default: a temporary file)')
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(tempfile.mkdtemp(), 'bench_indexes.db')
+    engine = create_engine(f'sqlite:///{path}')
+    migrate.upgrade(engine, target='0001')
+
+    t0 = time.perf_counter()
+    seed(path, args.rooms, args.tasks, args.checkouts)
+    print(f'Seeded {args.rooms} rooms, {args.tasks} tasks, {args.checkouts} checkouts '
+          f'in {time.perf_counter() - t0:.1f}s ({path})')
+    before = measure(path, args.rooms, args.repeat)
+    report('before (0001)', before)
+
+    t0 = time.perf_counter()
+    applied = migrate.upgrade(engine)
+    with sqlite3.connect(path) as conn:
+        conn.execute("ANALYZE")
+    print(f'\nApplied {", ".join(applied)} in {time.perf_counter() - t0:.1f}s')
+    after = measure(path, args.rooms, args.repeat)
+    report(f'after ({migrate.current_revision(engine)})', after)
+
+    print('\n== speedup (median) ==')
+    for name in QUERIES:
+        print(f'{name}: {before[name][1] / max(after[name][1], 1e-6):.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+# benchmarks/bench_startup.py
+"""Startup cost: import, app creation, readiness and the first requests.
+
+On a freshly generated database (or the one given by --url), measures the
+median over --runs fresh processes of:
+
+- import: `import app` in a new interpreter,
+- create: app.create_app() after that import,
+- ready: from spawning a one-worker server until GET /ready answers 200,
+
+and, on fresh one-worker servers, the latency of the first and second
+GET /rooms, once with the server just accepting connections (the first
+request pays for connecting to the database and loading the room board)
+and once after a GET /ready probe has warmed it up.
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 10 --rooms 1000
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import datagen  # noqa: E402
+import load_test  # noqa: E402
+
+IMPORT_AND_CREATE = '''
+import json, sys, time
+sys.path.insert(0, sys.argv[1])
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.create_app()
+print(json.dumps({'import': imported - started, 'create': time.perf_counter() - imported}))
+'''
+
+
+def import_and_create(url):
+    """Seconds spent importing app and in create_app(), in a fresh interpreter."""
+    output = subprocess.run([sys.executable, '-c', IMPORT_AND_CREATE, load_test.BACKEND_DIR],
+                            env=dict(os.environ, DATABASE_URL=url), cwd=load_test.BACKEND_DIR,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def get(port, path, timeout=30.0):
+    """(status, seconds), or (None, None) when nothing answered."""
+    started = time.perf_counter()
+    try:
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+        connection.request('GET', path)
+        response = connection.getresponse()
+        response.read()
+        connection.close()
+        return response.status, time.perf_counter() - started
+    except OSError:
+        return None, None
+
+
+def wait_until(check, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if check():
+            return
+        time.sleep(0.01)
+    raise RuntimeError(f'Server did not start within {timeout:.0f} s')
+
+
+def accepting(port):
+    try:
+        socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+        return True
+    except OSError:
+        return False
+
+
+def time_to_ready(url, port):
+    started = time.perf_counter()
+    process = load_test.spawn_server(url, 1, port)
+    try:
+        wait_until(lambda: get(port, '/ready', timeout=5)[0] == 200)
+        return time.perf_counter() - started
+    finally:
+        load_test.stop_server(process)
+
+
+def first_requests(url, port, probe, path):
+    """Latency of the first and second `path` on a fresh server."""
+    process = load_test.spawn_server(url, 1, port)
+    try:
+        if probe:
+            wait_until(lambda: get(port, '/ready', timeout=5)[0] == 200)
+        else:
+            wait_until(lambda: accepting(port))
+        timings = []
+        for _ in range(2):
+            status, seconds = get(port, path)
+            if status != 200:
+                raise RuntimeError(f'GET {path} returned {status}')
+            timings.append(seconds)
+        return timings
+    finally:
+        load_test.stop_server(process)
+
+
+def ms(values):
+    return f'{statistics.median(values) * 1000:.1f}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='Database already filled by datagen.py (default: a fresh SQLite file)')
+    parser.add_argument('--rooms', type=int, default=500)
+    parser.add_argument('--runs', type=int, default=5, help='Fresh processes per measurement')
+    parser.add_argument('--path', default='/rooms', help='Request timed on fresh servers')
+    parser.add_argument('--port', type=int, default=5098)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    url = args.url
+    if not url:
+        url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_startup.db')}"
+        datagen.generate(url, args.rooms, 3, seed=args.seed)
+
+    startups = [import_and_create(url) for _ in range(args.runs)]
+    ready = [time_to_ready(url, args.port) for _ in range(args.runs)]
+    print(f"{'step':32} {'median ms':>10}")
+    print(f"{'import app':32} {ms([run['import'] for run in startups]):>10}")
+    print(f"{'create_app()':32} {ms([run['create'] for run in startups]):>10}")
+    print(f"{'spawn until /ready is 200':32} {ms(ready):>10}")
+
+    for probe in (False, True):
+        runs = [first_requests(url, args.port, probe, args.path) for _ in range(args.runs)]
+        label = 'after /ready' if probe else 'cold'
+        print(f"{f'first GET {args.path}, {label}':32} {ms([first for first, _ in runs]):>10}")
+        print(f"{f'second GET {args.path}, {label}':32} {ms([second for _, second in runs]):>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+# benchmarks/datagen.py
+"""Generate a realistic hotel dataset for benchmarks.
+
+Builds a hotel of --rooms rooms on floors of --floor-size, one housekeeper
+per 15 rooms, and --days days of history: a checkout roughly every other
+night per room, a completed cleaning task after each checkout, plus a
+day of upcoming reservations and today's open work.
+
+    python benchmarks/datagen.py --rooms 5000 --days 90 --url sqlite:///bench.db
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from sqlalchemy import create_engine, text  # noqa: E402
+
+import migrate  # noqa: E402
+
+BATCH_SIZE = 10000
+ROOMS_PER_HOUSEKEEPER = 15
+
+
+def room_numbers(rooms, floor_size):
+    for i in range(rooms):
+        yield f'{1 + i // floor_size}{1 + i % floor_size:02d}'
+
+
+def insert(conn, sql, rows):
+    """executemany in batches so huge hotels don't build one giant parameter list."""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            conn.execute(text(sql), batch)
+            batch = []
+    if batch:
+        conn.execute(text(sql), batch)
+
+
+def generate(url, rooms=500, days=30, floor_size=40, seed=42, now=None):
+    """Create the schema at url and fill it. Returns row counts."""
+    if not 1 <= floor_size <= 99:
+        raise ValueError('floor_size must be between 1 and 99')
+    rng = random.Random(seed)
+    now = (now or datetime.utcnow()).replace(minute=0, second=0, microsecond=0)
+    today = now.replace(hour=0)
+    engine = create_engine(url)
+    migrate.upgrade(engine)
+    housekeepers = max(rooms // ROOMS_PER_HOUSEKEEPER, 2)
+    counts = {'rooms': rooms, 'housekeepers': housekeepers, 'checkouts': 0, 'cleaning_tasks': 0, 'reservations': 0}
+
+    statuses = {}
+    for room_id in range(1, rooms + 1):
+        statuses[room_id] = rng.choices(['occupied', 'checked_out', 'cleaning', 'clean'], [60, 15, 10, 15])[0]
+
+    def checkout_and_task_rows():
+        checkout_id = task_id = 0
+        for room_id in range(1, rooms + 1):
+            day = today - timedelta(days=days)
+            while day < today:
+                scheduled = day + timedelta(hours=11)
+                actual = scheduled + timedelta(minutes=rng.randint(-150, 45))
+                late = rng.random() < 0.05
+                checkout_id += 1
+                yield 'checkout', {
+                    'id': checkout_id, 'room_id': room_id, 'scheduled': scheduled, 'actual': actual,
+                    'approved': late, 'late_time': scheduled + timedelta(hours=2) if late else None,
+                }
+                started = actual + timedelta(minutes=rng.randint(5, 120))
+                task_id += 1
+                yield 'task', {
+                    'id': task_id, 'room_id': room_id, 'housekeeper_id': rng.randint(1, housekeepers),
+                    'status': 'completed', 'started': started,
+                    'completed': started + timedelta(minutes=max(10, int(rng.gauss(35, 10)))),
+                }
+                day += timedelta(days=rng.choice([1, 2, 2, 3, 4]))
+            # Today's checkout, still open for occupied rooms
+            checkout_id += 1
+            yield 'checkout', {
+                'id': checkout_id, 'room_id': room_id, 'scheduled': today + timedelta(hours=11),
+                'actual': None if statuses[room_id] == 'occupied' else today + timedelta(hours=10),
+                'approved': False, 'late_time': None,
+            }
+            if statuses[room_id] == 'cleaning':
+                task_id += 1
+                yield 'task', {
+                    'id': task_id, 'room_id': room_id, 'housekeeper_id': rng.randint(1, housekeepers),
+                    'status': rng.choice(['pending', 'in_progress']), 'started': None, 'completed': None,
+                }
+
+    with engine.begin() as conn:
+        insert(conn, "INSERT INTO rooms (id, room_number, status, last_cleaned) VALUES (:id, :number, :status, :cleaned)", (
+            {'id': room_id, 'number': number, 'status': statuses[room_id],
+             'cleaned': today - timedelta(hours=rng.randint(1, 48))}
+            for room_id, number in enumerate(room_numbers(rooms, floor_size), start=1)
+        ))
+        insert(conn, "INSERT INTO housekeepers (id, name) VALUES (:id, :name)", (
+            {'id': i, 'name': f'Housekeeper {i}'} for i in range(1, housekeepers + 1)
+        ))
+
+        checkouts, tasks = [], []
+
+        def flush():
+            if checkouts:
+                insert(conn, "INSERT INTO checkouts (id, room_id, scheduled_checkout, actual_checkout, "
+                             "late_checkout_approved, late_checkout_time) "
+                             "VALUES (:id, :room_id, :scheduled, :actual, :approved, :late_time)", checkouts)
+            if tasks:
+                insert(conn, "INSERT INTO cleaning_tasks (id, room_id, housekeeper_id, status, started_at, completed_at) "
+                             "VALUES (:id, :room_id, :housekeeper_id, :status, :started, :completed)", tasks)
+            counts['checkouts'] += len(checkouts)
+            counts['cleaning_tasks'] += len(tasks)
+            checkouts.clear()
+            tasks.clear()
+
+        for kind, row in checkout_and_task_rows():
+            (checkouts if kind == 'checkout' else tasks).append(row)
+            if len(checkouts) + len(tasks) >= BATCH_SIZE:
+                flush()
+        flush()
+
+        reservations = [
+            {'room_id': room_id, 'arrival': today + timedelta(hours=rng.randint(14, 22)),
+             'departure': today + timedelta(days=rng.randint(1, 5), hours=11), 'vip': rng.random() < 0.05}
+            for room_id in range(1, rooms + 1) if rng.random() < 0.7
+        ]
+        insert(conn, "INSERT INTO reservations (room_id, arrival_time, departure_time, vip) "
+                     "VALUES (:room_id, :arrival, :departure, :vip)", reservations)
+        counts['reservations'] = len(reservations)
+    engine.dispose()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rooms', type=int, default=500, help='100 to 50,000')
+    parser.add_argument('--days', type=int, default=30, help='Days of checkout and cleaning history')
+    parser.add_argument('--floor-size', type=int, default=40)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--url', default='sqlite:///bench.db', help='Database URL (must be empty)')
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    counts = generate(args.url, args.rooms, args.days, args.floor_size, args.seed)
+    print(', '.join(f'{count} {name}' for name, count in counts.items()), f'in {time.perf_counter() - t0:.1f}s')
+
+
+if __name__ == '__main__':
+    main()
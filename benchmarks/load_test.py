@@ -0,0 +1,310 @@
+# benchmarks/load_test.py
+"""Drive the real PMS endpoints and compare against a stored baseline.
+
+Generates a hotel with datagen.py (or reuses --url), then runs every
+scenario either in-process through the Flask test client (--mode client,
+which also counts SQL statements per request) or over HTTP against a
+local multi-worker server (--mode server: gunicorn when installed,
+otherwise forked single-threaded werkzeug workers sharing one socket).
+
+    python benchmarks/load_test.py --rooms 2000 --requests 500 --save-baseline benchmarks/baseline.json
+    python benchmarks/load_test.py --rooms 2000 --requests 500 --compare benchmarks/baseline.json
+
+With --compare, the exit status is 1 when a scenario's p50 or throughput
+is worse than the baseline by more than --tolerance, or when it issues
+more SQL statements per request than before.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(BENCH_DIR, '..', 'backend')
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from sqlalchemy import create_engine, event, text  # noqa: E402
+from sqlalchemy.engine import Engine  # noqa: E402
+
+import datagen  # noqa: E402
+
+
+# --- Scenarios: name -> function(fixtures, rng) returning (method, path, json body or None) ---
+
+def later(fixtures, hours):
+    return (fixtures['today'] + timedelta(hours=hours)).isoformat()
+
+SCENARIOS = {
+    'rooms_board': lambda f, rng: ('GET', '/rooms', None),
+    'rooms_board_uncached': lambda f, rng: ('GET', '/rooms?status=occupied,checked_out,cleaning,clean', None),
+    'rooms_summary': lambda f, rng: ('GET', '/rooms?view=summary', None),
+    'room_detail': lambda f, rng: ('GET', f"/rooms/{rng.choice(f['room_ids'])}", None),
+    'cleaning_tasks_page': lambda f, rng: (
+        'GET', f"/cleaning_tasks?limit=100&after={rng.randrange(f['max_task_id'])}", None),
+    'cleaning_tasks_by_housekeeper': lambda f, rng: (
+        'GET', f"/cleaning_tasks?housekeeper_id={rng.choice(f['housekeeper_ids'])}&status=completed&limit=100", None),
+    'record_checkout': lambda f, rng: (
+        'POST', '/checkouts', {'room_number': rng.choice(f['room_numbers']), 'actual_checkout': later(f, 10)}),
+    'late_checkout_quote': lambda f, rng: (
+        'GET', f"/checkouts/{rng.choice(f['open_checkout_ids'])}/late?requested_time={later(f, 13)}", None),
+    'late_checkout_request': lambda f, rng: (
+        'PUT', f"/checkouts/{rng.choice(f['open_checkout_ids'])}/late", {'requested_time': later(f, 12)}),
+    'late_checkout_approve': lambda f, rng: (
+        'PUT', f"/checkouts/{rng.choice(f['open_checkout_ids'])}/approve_late", {'approved': False}),
+}
+
+
+def load_fixtures(url):
+    """Ids the scenarios pick from."""
+    engine = create_engine(url)
+    with engine.connect() as conn:
+        today = conn.execute(text("SELECT MAX(scheduled_checkout) FROM checkouts")).scalar()
+        if isinstance(today, str):
+            today = datetime.fromisoformat(today)
+        fixtures = {
+            'today': today.replace(hour=0, minute=0, second=0, microsecond=0),
+            'room_ids': [row[0] for row in conn.execute(text("SELECT id FROM rooms"))],
+            'room_numbers': [row[0] for row in conn.execute(text("SELECT room_number FROM rooms"))],
+            'housekeeper_ids': [row[0] for row in conn.execute(text("SELECT id FROM housekeepers"))],
+            'max_task_id': conn.execute(text("SELECT MAX(id) FROM cleaning_tasks")).scalar() or 1,
+            'open_checkout_ids': [row[0] for row in conn.execute(
+                text("SELECT id FROM checkouts WHERE scheduled_checkout >= :today"), {'today': today.replace(hour=0)}
+            )],
+        }
+    engine.dispose()
+    return fixtures
+
+
+def summarize(latencies, elapsed, statements=None):
+    latencies = sorted(latencies)
+    result = {
+        'requests': len(latencies),
+        'throughput_rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(statistics.median(latencies) * 1000, 3),
+        'p99_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 3),
+    }
+    if statements is not None:
+        result['sql_per_request'] = round(statements / len(latencies), 2)
+    return result
+
+
+# --- In-process (Flask test client) ---
+
+def run_client(url, fixtures, scenarios, requests, warmup, seed):
+    os.environ['DATABASE_URL'] = url
+    from app import app  # Imported late so DATABASE_URL is picked up
+
+    statements = [0]
+
+    def count(*args):
+        statements[0] += 1
+
+    event.listen(Engine, 'after_cursor_execute', count)
+    client = app.test_client()
+    results = {}
+    for name in scenarios:
+        rng = random.Random(seed)
+        for _ in range(warmup):
+            method, path, body = SCENARIOS[name](fixtures, rng)
+            client.open(path, method=method, json=body)
+        statements[0] = 0
+        latencies = []
+        started = time.perf_counter()
+        for _ in range(requests):
+            method, path, body = SCENARIOS[name](fixtures, rng)
+            t0 = time.perf_counter()
+            response = client.open(path, method=method, json=body)
+            latencies.append(time.perf_counter() - t0)
+            if response.status_code >= 500:
+                raise RuntimeError(f'{name}: {method} {path} returned {response.status_code}')
+        results[name] = summarize(latencies, time.perf_counter() - started, statements[0])
+    event.remove(Engine, 'after_cursor_execute', count)
+    return results
+
+
+# --- Over HTTP against a local multi-worker server ---
+
+# Stand-in for gunicorn's sync workers: single-threaded werkzeug servers forked off one listening socket
+PREFORK_SERVER = '''
+import os, socket, sys
+sys.path.insert(0, sys.argv[1])
+from werkzeug.serving import make_server
+from app import app
+listener = socket.create_server(('127.0.0.1', int(sys.argv[2])), backlog=1024)
+for _ in range(int(sys.argv[3]) - 1):
+    if os.fork() == 0:
+        break
+make_server('127.0.0.1', int(sys.argv[2]), app, fd=listener.fileno()).serve_forever()
+'''
+
+def server_command(workers, port):
+    """gunicorn sync workers when installed, otherwise forked werkzeug workers."""
+    try:
+        import gunicorn  # noqa: F401
+        return [sys.executable, '-m', 'gunicorn', '-w', str(workers), '-b', f'127.0.0.1:{port}',
+                '--chdir', BACKEND_DIR, '--log-level', 'warning', 'app:app']
+    except ImportError:
+        return [sys.executable, '-c', PREFORK_SERVER, BACKEND_DIR, str(port), str(workers)]
+
+
+def spawn_server(url, workers, port, env=None, command=None):
+    """Start the app on port (or run `command` instead) without waiting for it."""
+    env = dict(os.environ, DATABASE_URL=url, **(env or {}))
+    return subprocess.Popen(command or server_command(workers, port), env=env, cwd=BACKEND_DIR,
+                            start_new_session=True)
+
+
+def start_server(url, workers, port, env=None, command=None):
+    """Start the app on port (or run `command` instead) and wait until it answers."""
+    process = spawn_server(url, workers, port, env, command)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            connection.request('GET', '/rooms?view=summary&limit=1')
+            connection.getresponse().read()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    stop_server(process)
+    raise RuntimeError('Server did not start within 30 s')
+
+
+def stop_server(process):
+    os.killpg(process.pid, signal.SIGTERM)  # The server and every worker it forked
+    process.wait(timeout=10)
+
+
+def run_server(url, fixtures, scenarios, requests, warmup, seed, workers, concurrency, port):
+    process = start_server(url, workers, port)
+    try:
+        results = {}
+        for name in scenarios:
+            per_thread = max(requests // concurrency, 1)
+            latencies = []
+            lock = threading.Lock()
+
+            def worker(thread_index):
+                rng = random.Random(seed + thread_index)
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+                local = []
+                for i in range(warmup // concurrency + per_thread):
+                    method, path, body = SCENARIOS[name](fixtures, rng)
+                    payload = json.dumps(body) if body is not None else None
+                    headers = {'Content-Type': 'application/json'} if body is not None else {}
+                    t0 = time.perf_counter()
+                    connection.request(method, path, body=payload, headers=headers)
+                    response = connection.getresponse()
+                    response.read()
+                    if response.status >= 500:
+                        raise RuntimeError(f'{name}: {method} {path} returned {response.status}')
+                    if i >= warmup // concurrency:
+                        local.append(time.perf_counter() - t0)
+                connection.close()
+                with lock:
+                    latencies.extend(local)
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(concurrency) as pool:
+                list(pool.map(worker, range(concurrency)))
+            results[name] = summarize(latencies, time.perf_counter() - started)
+        return results
+    finally:
+        stop_server(process)
+
+
+# --- Baselines ---
+
+def compare(results, baseline, tolerance):
+    """Return a list of regression messages."""
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        if result['p50_ms'] > previous['p50_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: p50 {result['p50_ms']} ms vs baseline {previous['p50_ms']} ms")
+        if result['throughput_rps'] < previous['throughput_rps'] * (1 - tolerance):
+            regressions.append(f"{name}: {result['throughput_rps']} req/s vs baseline {previous['throughput_rps']} req/s")
+        if 'sql_per_request' in result and 'sql_per_request' in previous \
+                and result['sql_per_request'] > previous['sql_per_request'] + 0.01:
+            regressions.append(f"{name}: {result['sql_per_request']} SQL statements/request "
+                               f"vs baseline {previous['sql_per_request']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mode', choices=['client', 'server'], default='client')
+    parser.add_argument('--url', help='Existing database URL (default: generate a fresh SQLite hotel)')
+    parser.add_argument('--rooms', type=int, default=1000)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--requests', type=int, default=300, help='Measured requests per scenario')
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS), help='Run only these scenarios')
+    parser.add_argument('--workers', type=int, default=4, help='Server workers (--mode server)')
+    parser.add_argument('--concurrency', type=int, default=8, help='Client threads (--mode server)')
+    parser.add_argument('--port', type=int, default=5099)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--save-baseline', metavar='PATH')
+    parser.add_argument('--compare', metavar='PATH')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed relative slowdown')
+    args = parser.parse_args()
+
+    url = args.url
+    if not url:
+        url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'load_test.db')}"
+        t0 = time.perf_counter()
+        counts = datagen.generate(url, args.rooms, args.days, seed=args.seed)
+        print(f"Generated {counts['rooms']} rooms, {counts['checkouts']} checkouts, "
+              f"{counts['cleaning_tasks']} tasks in {time.perf_counter() - t0:.1f}s")
+    fixtures = load_fixtures(url)
+    scenarios = args.scenario or list(SCENARIOS)
+
+    if args.mode == 'client':
+        results = run_client(url, fixtures, scenarios, args.requests, args.warmup, args.seed)
+    else:
+        results = run_server(url, fixtures, scenarios, args.requests, args.warmup, args.seed,
+                             args.workers, args.concurrency, args.port)
+
+    print(f"{'scenario':32} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'sql/req':>8}")
+    for name, result in results.items():
+        print(f"{name:32} {result['throughput_rps']:>9} {result['p50_ms']:>9} {result['p99_ms']:>9} "
+              f"{result.get('sql_per_request', '-'):>8}")
+
+    key = f'{args.mode}:{args.rooms}'
+    if args.save_baseline:
+        stored = {}
+        if os.path.exists(args.save_baseline):
+            with open(args.save_baseline) as f:
+                stored = json.load(f)
+        stored[key] = results
+        with open(args.save_baseline, 'w') as f:
+            json.dump(stored, f, indent=2, sort_keys=True)
+        print(f'Saved baseline {key} to {args.save_baseline}')
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f).get(key, {})
+        if not baseline:
+            print(f'No baseline for {key} in {args.compare}')
+        regressions = compare(results, baseline, args.tolerance)
+        for message in regressions:
+            print('REGRESSION', message)
+        if regressions:
+            sys.exit(1)
+        print('No regressions against baseline')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,52 +1,242 @@
 # backend/models.py (Recommended to separate models into their own file)
+from contextvars import ContextVar
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+from sqlalchemy.orm import declared_attr
 from datetime import datetime
 
-db = SQLAlchemy()  # Initialize SQLAlchemy outside of the app context
+DEFAULT_PROPERTY_ID = 1  # Created by migration 0006; owns all single-hotel data
+current_property = ContextVar('current_property', default=None)  # tenancy.PropertyContext being served
+
+def current_property_id():
+    """Property new rows belong to: the one being served, else the default property."""
+    context = current_property.get()
+    return context.id if context is not None else DEFAULT_PROPERTY_ID
+
+class PropertySession(Session):
+    """Session that uses the current property's own engine when properties are partitioned."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        context = current_property.get()
+        if bind is None and context is not None and context.engine is not None:
+            return context.engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+db = SQLAlchemy(session_options={'class_': PropertySession})  # Initialize SQLAlchemy outside of the app context
 
 # --- Data Models ---
 
-class Room(db.Model):
+def room_floor(room_number):
+    """Floor of a room, taken from its number (e.g. '412' -> '4', '1203' -> '12')."""
+    return room_number[:-2] or '0'
+
+class Property(db.Model):
+    """One hotel of the chain."""
+    __tablename__ = 'properties'  # Explicit table name
+    id = db.Column(db.Integer, primary_key=True)
+    code = db.Column(db.String(20), unique=True, nullable=False)  # Used in /properties/<code>/... URLs
+    name = db.Column(db.String(120), nullable=False)
+
+    def __repr__(self):
+        return f"<Property {self.code}>"
+
+OPEN_TASK_CONDITION = "status IN ('pending', 'in_progress')"
+
+class PropertyScoped:
+    """Rows that belong to one property. Queries only see the current property's rows (see tenancy.py)."""
+
+    @declared_attr
+    def property_id(cls):
+        return db.Column(db.Integer, db.ForeignKey('properties.id'), nullable=False,
+                         default=current_property_id, server_default='1')
+
+class Room(PropertyScoped, db.Model):
     __tablename__ = 'rooms'  # Explicit table name
+    __table_args__ = (
+        db.UniqueConstraint('property_id', 'room_number', name='uq_rooms_property_id_room_number'),
+        db.Index('ix_rooms_property_id_status', 'property_id', 'status'),  # Room board status filters
+    )
     id = db.Column(db.Integer, primary_key=True)
-    room_number = db.Column(db.String(10), unique=True, nullable=False)
+    room_number = db.Column(db.String(10), nullable=False)  # Unique within its property
     status = db.Column(db.String(20), default='occupied')  # occupied, checked_out, cleaning, clean
     last_cleaned = db.Column(db.DateTime)
+    sync_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Set by sync.py on change
+    __mapper_args__ = {'version_id_col': sync_version, 'version_id_generator': False}  # Optimistic locking
     checkouts = db.relationship('Checkout', backref='room', lazy=True)
     cleaning_tasks = db.relationship('CleaningTask', backref='room', lazy=True) # Added relationship
+    reservations = db.relationship('Reservation', backref='room', lazy=True)
+
+    @property
+    def floor(self):
+        return room_floor(self.room_number)
 
     def __repr__(self):
         return f"<Room {self.room_number}>"
 
-class Checkout(db.Model):
+class Checkout(PropertyScoped, db.Model):
     __tablename__ = 'checkouts' # Explicit table name
+    __table_args__ = (
+        db.Index('ix_checkouts_room_id_scheduled_checkout', 'room_id', 'scheduled_checkout'),  # Latest checkout per room
+        db.Index('ix_checkouts_property_id_scheduled_checkout', 'property_id', 'scheduled_checkout'),  # Date ranges
+    )
     id = db.Column(db.Integer, primary_key=True)
     room_id = db.Column(db.Integer, db.ForeignKey('rooms.id'), nullable=False)
     scheduled_checkout = db.Column(db.DateTime, nullable=False)
     actual_checkout = db.Column(db.DateTime)
     late_checkout_approved = db.Column(db.Boolean, default=False)
     late_checkout_time = db.Column(db.DateTime)
+    late_checkout_fee = db.Column(db.Numeric(10, 2))  # Quoted when the late checkout is requested
 
     def __repr__(self):
         return f"<Checkout for Room {self.room_id} at {self.scheduled_checkout}>"
 
-class Housekeeper(db.Model):
+class Housekeeper(PropertyScoped, db.Model):
     __tablename__ = 'housekeepers' # Explicit table name
+    __table_args__ = (
+        db.Index('ix_housekeepers_property_id', 'property_id'),  # Staff list per property
+    )
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(80), nullable=False)
+    open_tasks = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Kept by workload.py
+    in_progress_tasks = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     assigned_rooms = db.relationship('CleaningTask', backref='housekeeper', lazy=True)
 
     def __repr__(self):
         return f"<Housekeeper {self.name}>"
 
-class CleaningTask(db.Model):
+class CleaningTask(PropertyScoped, db.Model):
     __tablename__ = 'cleaning_tasks'  # Explicit table name
+    __table_args__ = (
+        db.Index('ix_cleaning_tasks_room_id_status', 'room_id', 'status'),  # Open task check per room
+        db.Index('ix_cleaning_tasks_property_id_status', 'property_id', 'status'),  # Task lists per property
+        db.Index('ix_cleaning_tasks_housekeeper_id_status', 'housekeeper_id', 'status'),  # One housekeeper's tasks
+        db.Index('uq_cleaning_tasks_open_room_id', 'room_id', unique=True,  # One open task per room
+                 sqlite_where=db.text(OPEN_TASK_CONDITION), postgresql_where=db.text(OPEN_TASK_CONDITION)),
+    )
     id = db.Column(db.Integer, primary_key=True)
     room_id = db.Column(db.Integer, db.ForeignKey('rooms.id'), nullable=False)
     housekeeper_id = db.Column(db.Integer, db.ForeignKey('housekeepers.id'), nullable=False)
     status = db.Column(db.String(20), default='pending')  # pending, in_progress, completed
     started_at = db.Column(db.DateTime)
     completed_at = db.Column(db.DateTime)
+    sync_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Set by sync.py on change
+    __mapper_args__ = {'version_id_col': sync_version, 'version_id_generator': False}  # Optimistic locking
 
     def __repr__(self):
         return f"<Cleaning Task for Room {self.room_id} by {self.housekeeper_id}>"
+
+class Reservation(PropertyScoped, db.Model):
+    __tablename__ = 'reservations'  # Explicit table name
+    __table_args__ = (
+        db.Index('ix_reservations_room_id_arrival_time', 'room_id', 'arrival_time'),  # Next arrival per room
+        db.Index('ix_reservations_property_id_arrival_time', 'property_id', 'arrival_time'),  # Arrivals per property
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    room_id = db.Column(db.Integer, db.ForeignKey('rooms.id'), nullable=False)
+    guest_name = db.Column(db.String(120))
+    arrival_time = db.Column(db.DateTime, nullable=False)
+    departure_time = db.Column(db.DateTime)
+    vip = db.Column(db.Boolean, default=False)
+
+    def __repr__(self):
+        return f"<Reservation for Room {self.room_id} arriving {self.arrival_time}>"
+
+class Rollup(PropertyScoped, db.Model):
+    """Pre-aggregated report bucket (see backend/analytics.py)."""
+    __tablename__ = 'rollups'  # Explicit table name
+    __table_args__ = (
+        db.UniqueConstraint('property_id', 'metric', 'granularity', 'bucket_start', 'floor', 'housekeeper_id',
+                            name='uq_rollups_bucket'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    metric = db.Column(db.String(20), nullable=False)  # cleaning, turnaround, checkouts
+    granularity = db.Column(db.String(5), nullable=False)  # hour, day
+    bucket_start = db.Column(db.DateTime, nullable=False)
+    floor = db.Column(db.String(10), nullable=False)
+    housekeeper_id = db.Column(db.Integer, nullable=False, default=0)  # 0 when not tied to a housekeeper
+    count = db.Column(db.Integer, nullable=False, default=0)
+    total_minutes = db.Column(db.Float, nullable=False, default=0.0)
+    histogram = db.Column(db.String(400), nullable=False, default='')  # Comma separated counts per bin
+    min_minutes = db.Column(db.Float)  # Shortest and longest observation; None before any, or before 0013
+    max_minutes = db.Column(db.Float)
+
+    def __repr__(self):
+        return f"<Rollup {self.metric}/{self.granularity} {self.bucket_start} floor {self.floor}>"
+
+class ChangeLog(PropertyScoped, db.Model):
+    """One change to a synced room or cleaning task, in version order (see backend/sync.py)."""
+    __tablename__ = 'change_log'  # Explicit table name
+    __table_args__ = (
+        db.UniqueConstraint('property_id', 'version', name='uq_change_log_property_id_version'),  # Delta pulls
+        db.Index('ix_change_log_property_id_op_id', 'property_id', 'op_id'),  # Replayed push detection
+        db.Index('ix_change_log_version', 'version'),  # Gap checks across properties
+        db.Index('ix_change_log_changed_at', 'changed_at'),  # Recent changes; pruning
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False)  # From the sync_versions sequence; increasing, not in commit order
+    entity = db.Column(db.String(20), nullable=False)  # room, cleaning_task
+    entity_id = db.Column(db.Integer, nullable=False)
+    op = db.Column(db.String(10), nullable=False)  # upsert, delete, or skip for a rolled back version
+    changed_at = db.Column(db.DateTime, nullable=False)
+    op_id = db.Column(db.String(64))  # Client operation id when the change came from POST /sync
+
+    def __repr__(self):
+        return f"<ChangeLog {self.version} {self.op} {self.entity} {self.entity_id}>"
+
+class OutboxMessage(PropertyScoped, db.Model):
+    """A message for the hotel PMS, written in the same transaction as the change it reports (see backend/outbox.py)."""
+    __tablename__ = 'outbox_messages'  # Explicit table name
+    __table_args__ = (
+        db.Index('ix_outbox_messages_property_id_status_id', 'property_id', 'status', 'id'),  # Oldest pending first
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    topic = db.Column(db.String(30), nullable=False)  # room_ready, checkout, late_checkout
+    payload = db.Column(db.Text, nullable=False)  # JSON
+    idempotency_key = db.Column(db.String(64), unique=True, nullable=False)  # Lets the PMS drop redeliveries
+    status = db.Column(db.String(10), nullable=False, default='pending')  # pending, sent, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+    last_error = db.Column(db.String(500))
+
+    def __repr__(self):
+        return f"<OutboxMessage {self.id} {self.topic} {self.status}>"
+
+class RoomEvent(PropertyScoped, db.Model):
+    """One room, checkout or cleaning task transition; append-only (see backend/history.py)."""
+    __tablename__ = 'room_events'  # Explicit table name
+    __table_args__ = (
+        db.Index('ix_room_events_room_id_ts', 'room_id', 'ts'),  # History of one room
+        db.Index('ix_room_events_property_id_ts', 'property_id', 'ts'),  # Replays and compaction
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    room_id = db.Column(db.Integer, nullable=False)  # No foreign key: kept as long as the history is
+    ts = db.Column(db.DateTime, nullable=False)
+    kind = db.Column(db.SmallInteger, nullable=False)  # history.KINDS code
+    status = db.Column(db.SmallInteger)  # history.STATUSES code
+    ref_id = db.Column(db.Integer)  # Checkout or cleaning task id
+    housekeeper_id = db.Column(db.Integer)
+    last_cleaned = db.Column(db.DateTime)  # room_cleaned: the value written, which may be earlier than ts
+
+    def __repr__(self):
+        return f"<RoomEvent {self.kind} for Room {self.room_id} at {self.ts}>"
+
+class RoomSnapshot(PropertyScoped, db.Model):
+    """State of one room at a point in time, the starting point for replaying events (see backend/history.py)."""
+    __tablename__ = 'room_snapshots'  # Explicit table name
+    __table_args__ = (
+        db.UniqueConstraint('room_id', 'ts', name='uq_room_snapshots_room_id_ts'),
+        db.Index('ix_room_snapshots_property_id_ts', 'property_id', 'ts'),  # Latest snapshot before a time
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    room_id = db.Column(db.Integer, nullable=False)
+    ts = db.Column(db.DateTime, nullable=False)
+    status = db.Column(db.SmallInteger)  # history.STATUSES code
+    last_cleaned = db.Column(db.DateTime)
+    task_id = db.Column(db.Integer)  # Latest cleaning task of the room
+    task_status = db.Column(db.SmallInteger)
+    housekeeper_id = db.Column(db.Integer)
+
+    def __repr__(self):
+        return f"<RoomSnapshot for Room {self.room_id} at {self.ts}>"
@@ -9,23 +9,75 @@ CleaningTask: Tracks cleaning assignments for specific rooms and housekeepers, a
 API Endpoints (Flask):
 
 /rooms:
-GET: Retrieves a list of all rooms with their status.
-GET /{room_id}: Retrieves details of a specific room, including checkout history.
-PUT /{room_id}: Updates the status of a room (e.g., checked_out, cleaning, clean).
+GET: Retrieves a list of all rooms with their status. ?view=summary returns only id, room_number, status and last_cleaned. ?status= filters and ?limit=/?after= page by id.
+GET ?as_of=<ISO datetime>: The room board as it was then (status, last_cleaned and the room's latest cleaning task), rebuilt from the room history; combines with ?status=.
+GET /{room_id}: Retrieves details of a specific room, including checkout history. Its ETag ("room-<id>-v<version>.<board version>") changes whenever the room, its checkouts or its tasks do.
+GET /{room_id}/history: Every transition of the room, its checkouts and its cleaning tasks, oldest first: status changes, cleanings (with the last_cleaned time they set), checkouts, late checkout requests and decisions, task assignments, status changes and deletions. ?start=&end= limit the time range; 100 per page (?limit=, ?after=<next_cursor>).
+PUT /{room_id}: Updates the status of a room along occupied -> checked_out -> cleaning -> clean -> occupied (also checked_out -> clean, cleaning -> checked_out and clean -> checked_out). Other changes return 409. Send the ETag as If-Match to get 412 instead of overwriting someone else's change.
 /checkouts:
 POST: Records the actual checkout time for a room.
+/checkouts/batch:
+POST: Records many checkouts in one transaction from a JSON array or NDJSON body of {room_number, actual_checkout}. Returns a result per record (207 if some failed).
 /checkouts/{checkout_id}/late:
-PUT: Allows a guest to request a late checkout.
+PUT: Allows a guest to request a late checkout. The request is checked against upcoming reservations (plus a cleaning buffer) and priced from the fee tiers in LATE_CHECKOUT_POLICY; unavailable times return 409 with the latest available time. A decision that takes longer than the policy's budget_ms answers 503 with Retry-After instead.
+GET: Quotes ?requested_time= without requesting it (feasible, latest_available, fee).
 /checkouts/{checkout_id}/approve_late:
-PUT: Allows staff to approve or deny a late checkout request.
+PUT: Allows staff to approve or deny a late checkout request. Approval re-checks availability.
 /housekeepers:
-GET: Retrieves a list of all housekeepers.
+GET: Retrieves a list of all housekeepers. Supports ?limit= and ?after= cursor pagination.
+GET /{housekeeper_id}/tasks: The housekeeper's open tasks (or ?status=, where completed means completed today) with room_number and floor, in walking order: floor by floor, along each corridor in room number order, alternating direction per floor. Includes workload counters: open and in_progress tasks, kept up to date with every task change (`flask workload-rebuild` recounts them), and cleaned_today and avg_minutes_today from the cleaning rollups.
 /cleaning_tasks:
+GET: Retrieves cleaning tasks 100 at a time (?limit= up to 1000, ?after=<next_cursor>), filterable by status, housekeeper_id, room_id, completed_after and completed_before. This replaces the old unpaginated list: clients that read only the first response must follow the cursor, and every page that is not the last says so with "truncated": true, a "next" URL and a Link: rel="next" header (other paginated lists answer the same way).
 POST: Assigns a cleaning task to a housekeeper for a specific room.
 /cleaning_tasks/{task_id}:
-PUT: Updates the status of a cleaning task (pending, in_progress, completed).
+PUT: Updates the status of a cleaning task, forward only: pending -> in_progress -> completed (or pending -> completed). Supports If-Match like rooms; DELETE does too.
+Concurrency: rooms and cleaning tasks carry a version, and every update is an UPDATE ... WHERE version = <the version read>, so of two racing writers the second gets 409 instead of silently overwriting the first (backend/transitions.py). A room can only have one pending or in-progress task, enforced by a unique index.
 Basic Functionality: The code provides basic endpoints for retrieving room information, updating room status, recording checkouts, handling late checkout requests, managing housekeepers, and assigning/updating cleaning tasks.
 
+Room Cache: GET /rooms (unfiltered) and GET /rooms/{room_id} are served from an in-process cache that mutating endpoints update write-through. A room gets a new version whenever it or one of its checkouts or cleaning tasks changes, so an update that finishes late never overwrites a newer one. Responses carry a strong ETag; send it back in If-None-Match to get 304 Not Modified. Set ROOM_CACHE_REDIS_URL to share the cache version between gunicorn workers.
+
+/reservations:
+POST: Records an incoming arrival (room_number, arrival_time, optional departure_time, guest_name, vip).
+GET: Lists reservations, filterable by room_id and arriving_after.
+/dispatch/run:
+POST: Automatically assigns every checked-out room without an open task, most urgent first (next arrival, VIP, approved late checkout), balancing housekeeper load and keeping staff on the same floor. {"dry_run": true} only returns the plan. Rooms whose status changed after planning are left alone and listed under "skipped".
+/dispatch/preview:
+GET: Same plan as a dry run.
+
+/reports/turnaround, /reports/housekeepers, /reports/floors:
+GET: Turnaround (checkout to clean) and cleaning-time reports with average, p50 and p90 over ?start=&end= (default: last 7 days). They read hourly/daily rollups that are updated when tasks complete and checkouts are recorded; `flask rollups-rebuild --since <date>` recomputes them from the raw rows. Buckets are whole hours or days, so a range that starts mid-bucket includes all of that bucket. Percentiles are interpolated within the histogram bins, bounded by each bucket's shortest and longest time; for rollups written before migration 0013 those bounds come back after a rebuild.
+
+/exports/{checkouts|cleaning_tasks}:
+GET: Streams a bulk export as CSV (default) or, with pyarrow installed, ?format=arrow / ?format=parquet, limited by ?start=&end=. `flask export <dataset> --format ... --out <file>` does the same from the command line.
+
+/metrics:
+GET: Prometheus metrics: request latency histograms, request counts by status, and SQL statement counts and time per route. Requests slower than SLOW_REQUEST_SECONDS are logged with their slowest statements.
+
+/sync:
+GET: Offline sync for handsets. ?since=<version> returns the rooms and cleaning tasks changed after that version, the ids of deleted ones and the version to send next time (has_more means pull again). since=0, or a version older than the pruned change log, returns a full snapshot with "reset": true. ?housekeeper_id= limits tasks to one housekeeper's. Add ?wait=<seconds> (up to 60) to long-poll until something changes after since. Versions come from a database sequence (an AUTOINCREMENT table on SQLite), so writers never queue on a shared counter. They increase but can commit out of order, so a pull stops just before a version that is still in flight; a rolled back one is logged as skipped.
+POST: Applies a batch of changes queued offline in one transaction: {"housekeeper_id": 1, "base_version": 42, "changes": [{"op_id": "<unique>", "type": "task_status", "task_id": 7, "status": "completed", "at": "2024-08-01T10:30:00"}, {"op_id": "...", "type": "room_status", "room_id": 3, "status": "clean", "at": "..."}]}. Changes are applied in the order of "at"; each gets a result (applied, conflict, stale, duplicate, not_found, rejected or invalid) and the response carries what changed since base_version. Task statuses only move forward, replayed op_ids are ignored, and a room the front desk changed after base_version keeps its status if it was marked occupied, otherwise the later change wins. `flask sync-prune --days 30` trims the change log.
+
+/events:
+GET: Server-Sent Events stream of room, checkout and task changes published by every mutating endpoint. Filter with ?floor=, ?room_id= or ?housekeeper_id=; resume after a reconnect with the Last-Event-ID header (or ?since=<seq>); a Last-Event-ID that is not a non-negative integer gets a 400. A "resync" event means missed events are gone and the client should reload GET /rooms.
+
+Database Migrations: The schema is managed by versioned scripts in backend/migrations/ (NNNN_description.py with upgrade/downgrade). They are applied by `flask init-db` or `flask db-upgrade`, or with `python migrate.py upgrade --url <database url>`. benchmarks/bench_indexes.py shows query plans and latency before and after the index migration.
+
+Benchmarks: benchmarks/datagen.py builds a seeded hotel of any size (rooms, checkouts, cleaning tasks, reservations) in a database given by --url. benchmarks/load_test.py runs the main endpoints against it, in-process (--mode client, with SQL statements per request) or over HTTP against a multi-worker server (--mode server), and reports throughput, p50 and p99. Save results with --save-baseline and check for regressions with --compare <file> --tolerance 0.25. The app reads its database from DATABASE_URL (default sqlite:///hotel.db).
+
+Properties (multi-hotel): Every route is also served under /properties/<code>/..., e.g. GET /properties/east/rooms; the plain routes serve the default property ("main"). GET /properties lists properties and POST /properties {"code": "east", "name": "East"} adds one. Requests only see their property's rows: rooms, checkouts, housekeepers, cleaning tasks, reservations and report rollups carry a property_id, queries are filtered on it automatically (backend/tenancy.py), and room numbers are unique per property. Set PROPERTY_PARTITIONING=database with PROPERTY_DATABASE_URL=sqlite:///hotel_{code}.db (one database per property) or PROPERTY_PARTITIONING=schema (one PostgreSQL schema per property) to store properties separately; their databases are created and migrated on first use. `flask rollups-rebuild` covers every property and `flask export --property <code>` exports one.
+
+Database Profiles: backend/db_profiles.py configures the engine for the database in DATABASE_URL (or DATABASE_PROFILE=postgresql|sqlite). PostgreSQL gets a sized pool (DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE), pre-ping and a statement timeout (DB_STATEMENT_TIMEOUT_MS). SQLite gets WAL, synchronous=NORMAL, a busy timeout (SQLITE_BUSY_TIMEOUT_MS) and a per-process writer lock so concurrent writers queue instead of failing with "database is locked". The profile is validated at startup and with `flask db-check`. benchmarks/bench_writes.py measures write throughput for 1, 2, 4, 8... workers.
+
+PMS Integration (outbound): Room-ready, checkout and late-checkout decisions are written to an outbox table in the same transaction as the change, and `flask outbox-worker` delivers them to the PMS in the background (backend/outbox.py), so requests never wait on the PMS. Set PMS_URL to POST batches of {"messages": [...]} there, each with an idempotency_key the PMS should use to ignore redeliveries; PMS_ADAPTER=log only logs them and PMS_ADAPTER=package.module:Class plugs in another adapter. Failed batches are retried with exponential backoff (OUTBOX_BASE_DELAY, OUTBOX_MAX_DELAY) up to OUTBOX_MAX_ATTEMPTS, and each property's messages are sent in order. `flask outbox-status` shows the queue, with --retry-failed and --prune-days. backend/mock_pms.py runs a local mock PMS with injectable failures (--fail-rate, --latency, --reject-topics). Without PMS_URL or PMS_ADAPTER nothing is queued.
+
+Serialization and Compression: List endpoints select plain columns and encode them directly (backend/serializers.py) instead of building ORM objects and calling isoformat() per field. JSON is encoded with orjson when it is installed, else with the standard json module; the output is the same either way. Responses over COMPRESS_MIN_BYTES (default 1024) are compressed with brotli when the brotli package is installed and the client accepts it, else gzip; bodies with an ETag (the room board) are compressed once per version. A compressed response's ETag ends in -gzip or -br, so each content-coding has its own strong validator; If-None-Match and If-Match accept any of them.
+
+Room History: Every room, checkout and cleaning task transition is appended to an event log (backend/history.py) in the same transaction as the change, as small fixed-width rows indexed by (room_id, ts). GET /rooms?as_of= replays the events after the latest snapshot. `flask history-compact` (run it daily) snapshots every room at each midnight and deletes events older than HISTORY_RETENTION_DAYS (default 30) and snapshots older than HISTORY_SNAPSHOT_DAYS (default 730); as_of answers for a compacted day give the state at the start of that day. History starts with the snapshot taken by migration 0010.
+
+ASGI Mode: `uvicorn asgi:app --app-dir backend` serves the same API from one process with async handlers for the requests that mostly wait: GET /events streams, GET /sync?wait= long polls, and the cached GET /rooms board and GET /rooms/{room_id}, which read through an async SQLAlchemy session (aiosqlite or asyncpg) on a cache miss. Everything else, including every write, runs on the Flask app in a pool of ASGI_WSGI_THREADS threads (default 20). An idle handset then costs a socket instead of a worker, and every stream sees every change because they share one process's event bus. It needs uvicorn, a2wsgi, greenlet and the async driver; the WSGI app (gunicorn app:app) is unchanged. benchmarks/bench_connections.py compares how many open streams each mode holds and how the board and event delivery hold up under them. The lifespan startup warms the app up like GET /ready, and logs why if it can't.
+
+Startup: backend/app.py builds the app with create_app(config=None); `app:app` is created on first access, so gunicorn and uvicorn work unchanged. Nothing touches the database while importing or creating the app, or when the first request arrives: run `flask --app app init-db` once per deploy to apply migrations (and create per-property databases), with --seed for the example rooms and housekeepers, or `flask seed` on its own. GET /ready answers 503 with the reason until the database is reachable and at the latest migration, then warms the room board into the cache and answers 200 with the warmed steps; point the load balancer's readiness check at it so the first real request doesn't pay for the warm-up. benchmarks/bench_startup.py measures import and create_app() time, time until /ready, and the first requests on a fresh server with and without the probe.
+
 Further Development:
 
 PMS Integration: Implement the crucial integration with the hotel's Property Management System to get real-time checkout data and potentially update stay information. This would likely involve making HTTP requests to the PMS API or interacting with its database.